@@ -0,0 +1,3 @@
+"""
+Reproducible offline benchmarks, run with ``python -m benchmarks``
+"""
@@ -0,0 +1,301 @@
+"""
+Offline benchmarks of Inazuma's hot paths.
+
+The media api and anime provider are replaced by stand-ins that replay a
+recording of the real services, so runs are reproducible and need no
+network. Results are printed (or written) as json with percentiles in
+milliseconds, and can be compared against an earlier run:
+
+    python -m benchmarks run --output before.json
+    python -m benchmarks run --baseline before.json
+
+With --fake-profile the scenarios run against the misbehaving stand-ins of
+`inazuma.core.fake_backend` instead, to see how they hold up under load.
+
+The frames command starts the app offscreen and reports the frame times of
+scripted interactions (scrolling, the media popup, screen switches, paging):
+
+    python -m benchmarks frames --scenario search_results_scrolling
+
+The downloads command times the segmented downloader against a local origin
+that throttles each connection, by number of connections:
+
+    python -m benchmarks downloads --connections 1 --connections 8
+
+The proxy command plays the same origin through the stream proxy, cold and
+from its cache, and checks what it served:
+
+    python -m benchmarks proxy
+
+A new recording of the live services is made with:
+
+    python -m benchmarks record
+
+Every command imports the `inazuma` package, whose `__init__` is the kivymd
+app, so the full app dependencies have to be installed, kivymd included.
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import sys
+import time
+import traceback
+from importlib import metadata
+from pathlib import Path
+
+# keep kivy away from our arguments and from stderr, which the results go to
+os.environ.setdefault("KIVY_NO_ARGS", "1")
+os.environ.setdefault("KIVY_LOG_MODE", "PYTHON")
+
+from .downloads import DEFAULT_CONNECTIONS, run_download_benchmarks
+from .frames import FRAME_SCENARIOS, run_frame_scenarios
+from .proxy import run_proxy_benchmarks
+from .scenarios import SCENARIOS, UI_SCENARIOS, BenchContext
+from .stats import summarize
+
+DEFAULT_RECORDING = Path(__file__).parent / "fixtures" / "recording.json"
+
+
+def _version(distribution: str) -> str:
+    try:
+        return metadata.version(distribution)
+    except metadata.PackageNotFoundError:
+        return "unknown"
+
+
+def _replay_context(
+    recording_path: Path, latency_scale: float, fake_profile: Path | None
+) -> BenchContext:
+    from viu_media.core.config import AppConfig
+
+    from inazuma.core.replay import Recording, ReplayAnimeProvider, ReplayApiClient
+    from inazuma.core.viu import Viu
+
+    viu = Viu(AppConfig())
+    if fake_profile:
+        viu.backend = "fake"
+        viu.fake_backend_profile = fake_profile
+    else:
+        recording = Recording.load(recording_path)
+        viu._media_api = ReplayApiClient(recording, latency_scale)
+        viu._anime_provider = ReplayAnimeProvider(recording, latency_scale)
+    return BenchContext(viu)
+
+
+def run_scenarios(
+    ctx: BenchContext, names: list[str], rounds: int, warmup: int
+) -> dict[str, dict]:
+    results = {}
+    for name in names:
+        try:
+            run = SCENARIOS[name](ctx)
+        except Exception as e:
+            traceback.print_exc()
+            results[name] = {"error": str(e)}
+            continue
+        timings, failures = [], 0
+        for index in range(warmup + rounds):
+            started = time.perf_counter()
+            try:
+                run()
+            except Exception as e:
+                # with a fake backend failing rounds are expected, and how
+                # long a failure takes is part of the result
+                logging.debug(f"{name} failed: {e}")
+                failures += index >= warmup
+            if index >= warmup:
+                timings.append(time.perf_counter() - started)
+        results[name] = {**summarize(timings), "failures": failures}
+        print(f"{name}: p50 {results[name]['p50']}ms", file=sys.stderr)
+    return results
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> bool:
+    """Prints the change of every scenario's p50, returns False on a regression."""
+    ok = True
+    for name, result in results["scenarios"].items():
+        before = baseline.get("scenarios", {}).get(name, {})
+        if "p50" not in result or not before.get("p50"):
+            continue
+        ratio = result["p50"] / before["p50"]
+        regressed = ratio > 1 + threshold
+        ok = ok and not regressed
+        print(
+            f"{name}: {before['p50']}ms -> {result['p50']}ms ({ratio - 1:+.1%})"
+            + (" REGRESSION" if regressed else ""),
+            file=sys.stderr,
+        )
+    return ok
+
+
+def _report(args, scenarios: dict[str, dict]) -> int:
+    """Writes the results out and compares them with the baseline, if any."""
+    results = {
+        "inazuma": _version("inazuma"),
+        "viu_media": _version("viu-media"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "recording": str(args.recording),
+        "latency_scale": args.latency_scale,
+        "fake_profile": str(args.fake_profile) if args.fake_profile else None,
+        "scenarios": scenarios,
+    }
+    output = json.dumps(results, indent=2)
+    if args.output:
+        args.output.write_text(output, encoding="utf-8")
+    else:
+        print(output)
+    if args.baseline:
+        baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+        if not compare(results, baseline, args.threshold):
+            return 1
+    return 0
+
+
+def command_run(args) -> int:
+    names = args.scenario or list(SCENARIOS)
+    ctx = _replay_context(args.recording, args.latency_scale, args.fake_profile)
+    return _report(args, run_scenarios(ctx, names, args.rounds, args.warmup))
+
+
+def command_frames(args) -> int:
+    names = args.scenario or list(FRAME_SCENARIOS)
+    ctx = _replay_context(args.recording, args.latency_scale, args.fake_profile)
+    scenarios = run_frame_scenarios(ctx.viu, names, args.long_frame / 1000)
+    for name, result in scenarios.items():
+        print(
+            f"{name}: p50 {result.get('p50')}ms, {result['long_frames']} long frames",
+            file=sys.stderr,
+        )
+    return _report(args, scenarios)
+
+
+def command_downloads(args) -> int:
+    scenarios = run_download_benchmarks(
+        args.connections or list(DEFAULT_CONNECTIONS), args.rounds
+    )
+    for name, result in scenarios.items():
+        print(
+            f"{name}: p50 {result['p50']}ms, {result['mib_per_second']} MiB/s",
+            file=sys.stderr,
+        )
+    return _report(args, scenarios)
+
+
+def command_proxy(args) -> int:
+    scenarios = run_proxy_benchmarks(args.rounds)
+    for name, result in scenarios.items():
+        print(f"{name}: p50 {result['p50']}ms", file=sys.stderr)
+    return _report(args, scenarios)
+
+
+def command_record(args) -> int:
+    from viu_media.cli.config.loader import ConfigLoader
+    from viu_media.core.constants import USER_CONFIG
+    from viu_media.core.config import AppConfig
+
+    from inazuma.core.replay import (
+        Recording,
+        record_anime_provider,
+        record_media_api,
+    )
+    from inazuma.core.viu import Viu
+
+    config = ConfigLoader().load(allow_setup=False) if USER_CONFIG.exists() else None
+    viu = Viu(config or AppConfig())
+    recording = Recording()
+    viu._media_api = record_media_api(viu.media_api, recording)
+    viu._anime_provider = record_anime_provider(viu.anime_provider, recording)
+    ctx = BenchContext(viu)
+    # one round of every scenario that talks to the services is what they replay
+    for name, setup in SCENARIOS.items():
+        if name in UI_SCENARIOS:
+            continue
+        setup(ctx)()
+    recording.save(args.output)
+    print(f"recorded to {args.output}", file=sys.stderr)
+    return 0
+
+
+def _add_common_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--recording", type=Path, default=DEFAULT_RECORDING)
+    parser.add_argument(
+        "--latency-scale",
+        type=float,
+        default=0,
+        help="replay this fraction of the recorded service latency",
+    )
+    parser.add_argument(
+        "--fake-profile",
+        type=Path,
+        help="run against the fake backend described by this profile instead",
+    )
+    parser.add_argument("--output", type=Path)
+    parser.add_argument("--baseline", type=Path, help="an earlier run to compare with")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.1,
+        help="how much slower a p50 may get before it counts as a regression",
+    )
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="replay the recording and time scenarios")
+    run.add_argument("--scenario", action="append", choices=list(SCENARIOS))
+    run.add_argument("--rounds", type=int, default=30)
+    run.add_argument("--warmup", type=int, default=3)
+    _add_common_arguments(run)
+    run.set_defaults(func=command_run)
+
+    frames = commands.add_parser(
+        "frames", help="time the frames of scripted interactions with the app"
+    )
+    frames.add_argument("--scenario", action="append", choices=list(FRAME_SCENARIOS))
+    frames.add_argument(
+        "--long-frame",
+        type=float,
+        default=50,
+        help="frames longer than this many milliseconds count as long",
+    )
+    _add_common_arguments(frames)
+    frames.set_defaults(func=command_frames)
+
+    downloads = commands.add_parser(
+        "downloads", help="time the segmented downloader against a local origin"
+    )
+    downloads.add_argument("--connections", type=int, action="append")
+    downloads.add_argument("--rounds", type=int, default=3)
+    _add_common_arguments(downloads)
+    downloads.set_defaults(func=command_downloads)
+
+    proxy = commands.add_parser(
+        "proxy", help="play a local origin through the stream proxy"
+    )
+    proxy.add_argument("--rounds", type=int, default=3)
+    _add_common_arguments(proxy)
+    proxy.set_defaults(func=command_proxy)
+
+    record = commands.add_parser("record", help="record the live services")
+    record.add_argument("--output", type=Path, default=DEFAULT_RECORDING)
+    record.set_defaults(func=command_record)
+
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.WARNING)
+    try:
+        import inazuma  # noqa: F401
+    except ImportError as e:
+        parser.exit(
+            2, f"the benchmarks need the app's dependencies, {e.name} is missing\n"
+        )
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,77 @@
+"""
+The segmented downloader against the local origin, by number of connections.
+
+Every run downloads the same progressive file and hls playlist from a
+`LocalOrigin` into a temporary directory and checks the bytes written, so
+the gain of more connections over one is measured on the same throttled
+server each time.
+"""
+
+import tempfile
+import time
+from pathlib import Path
+
+from .origin import LocalOrigin
+from .stats import summarize
+
+DEFAULT_SIZE = 8 * 1024 * 1024
+# what one connection to the origin gets, in bytes per second
+DEFAULT_RATE = 2 * 1024 * 1024
+DEFAULT_SEGMENTS = 32
+DEFAULT_CONNECTIONS = (1, 4, 8)
+
+
+def _download(origin: LocalOrigin, path: str, connections: int, directory: Path):
+    from viu_media.core.config.model import DownloadsConfig
+    from viu_media.core.downloader.params import DownloadParams
+
+    from inazuma.core.segmented_downloader import SegmentedDownloader
+
+    config = DownloadsConfig(downloads_dir=directory)
+    downloader = SegmentedDownloader(config, connections=connections)
+    try:
+        result = downloader.download(
+            DownloadParams(
+                url=f"{origin.url}/{path}",
+                anime_title="bench",
+                episode_title=f"{path}-{connections}",
+                silent=True,
+            )
+        )
+    finally:
+        downloader.client.close()
+    if not result.success or not result.video_path:
+        raise RuntimeError(f"download failed: {result.error_message}")
+    if result.video_path.read_bytes() != origin.body:
+        raise RuntimeError(f"{result.video_path} differs from what was served")
+    result.video_path.unlink()
+
+
+def run_download_benchmarks(
+    connections: list[int],
+    rounds: int,
+    size: int = DEFAULT_SIZE,
+    rate: int = DEFAULT_RATE,
+    segments: int = DEFAULT_SEGMENTS,
+) -> dict[str, dict]:
+    results = {}
+    with (
+        LocalOrigin(size, rate, segments) as origin,
+        tempfile.TemporaryDirectory() as directory,
+    ):
+        for path, kind in (("video.mp4", "ranges"), ("playlist.m3u8", "hls")):
+            for count in connections:
+                timings = []
+                for _ in range(rounds):
+                    started = time.perf_counter()
+                    _download(origin, path, count, Path(directory))
+                    timings.append(time.perf_counter() - started)
+                summary = summarize(timings)
+                summary["mib_per_second"] = round(
+                    size / 1024 / 1024 / (summary["p50"] / 1000), 2
+                )
+                results[f"download_{kind}_{count}_connections"] = summary
+    return results
+
+
+__all__ = ["DEFAULT_CONNECTIONS", "run_download_benchmarks"]
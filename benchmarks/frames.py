@@ -0,0 +1,207 @@
+"""
+Frame times of scripted interactions with the running app.
+
+The app is started in a window nobody sees (SDL's offscreen video driver,
+unless SDL_VIDEODRIVER says otherwise) against the same stand-in services as
+the other benchmarks. A frame scenario is a generator that acts on the app
+and then yields what to wait for before its next step: a number of frames,
+or a predicate that is checked once per frame. Every frame's duration while
+a scenario runs is recorded; the frame rate is uncapped, so a frame takes as
+long as its work does and jank shows up as long frames.
+"""
+
+import logging
+import os
+import time
+from typing import TYPE_CHECKING, Callable, Iterator
+
+from .stats import summarize
+
+if TYPE_CHECKING:
+    from inazuma import Inazuma
+    from inazuma.core.viu import Viu
+    from inazuma.view.SearchScreen.search_screen import SearchScreenView
+
+logger = logging.getLogger(__name__)
+
+Wait = int | Callable[[], bool]
+FrameScenario = Callable[["Inazuma"], Iterator[Wait]]
+
+FRAME_SCENARIOS: dict[str, FrameScenario] = {}
+WINDOW_SIZE = (1280, 800)
+# frames left for layout and images to settle after a step
+SETTLE_FRAMES = 10
+# how long a scenario waits for the app before it counts as failed
+WAIT_TIMEOUT = 30.0
+SCROLL_STEPS = 60
+POPUPS_OPENED = 5
+PAGES_TURNED = 3
+
+
+def frame_scenario(name: str):
+    def _register(func: FrameScenario) -> FrameScenario:
+        FRAME_SCENARIOS[name] = func
+        return func
+
+    return _register
+
+
+def _switch_to(app: "Inazuma", name: str) -> Iterator[Wait]:
+    manager = app.manager_screens
+    if manager.current != name:
+        manager.current = name
+        yield lambda: not manager.transition.is_active
+        yield SETTLE_FRAMES
+
+
+def _search_results(app: "Inazuma") -> Iterator[Wait]:
+    """Goes to the search screen, searching first if it shows no results yet."""
+    yield from _switch_to(app, "search screen")
+    screen: "SearchScreenView" = app.manager_screens.get_screen("search screen")
+    if not screen.search_results_container.data:
+        screen.controller.handle_search_for_anime()
+        yield lambda: bool(screen.search_results_container.data)
+        yield SETTLE_FRAMES
+    return screen
+
+
+@frame_scenario("screen_switching")
+def screen_switching(app: "Inazuma"):
+    """Every screen that needs no anime in turn, through the fade transition."""
+    for name in ("search screen", "my list screen", "downloads screen", "home screen"):
+        yield from _switch_to(app, name)
+
+
+@frame_scenario("search_results_scrolling")
+def search_results_scrolling(app: "Inazuma"):
+    """A page of search results scrolled to the bottom and back up."""
+    from kivy.uix.scrollview import ScrollView
+
+    screen = yield from _search_results(app)
+    # the results grow to their full height, the scroll view around them scrolls
+    scroll_view = screen.search_results_container.parent
+    while not isinstance(scroll_view, ScrollView):
+        scroll_view = scroll_view.parent
+    positions = [1 - step / SCROLL_STEPS for step in range(SCROLL_STEPS + 1)]
+    for scroll_y in positions + positions[::-1]:
+        scroll_view.scroll_y = scroll_y
+        yield 1
+
+
+@frame_scenario("media_popup")
+def media_popup(app: "Inazuma"):
+    """The media popup opened over the first few search results and dismissed."""
+    from inazuma.view.components.media_card.media_card import MediaCard
+
+    screen = yield from _search_results(app)
+    cards = [
+        widget
+        for widget in reversed(screen.ids.results_grid.children)
+        if isinstance(widget, MediaCard)
+    ]
+    popup = app.media_card_popup
+    for card in cards[:POPUPS_OPENED]:
+        card.open()
+        yield lambda: popup._anim_alpha >= 1
+        yield SETTLE_FRAMES
+        popup.dismiss()
+        yield lambda: not popup._is_open
+
+
+@frame_scenario("search_paging")
+def search_paging(app: "Inazuma"):
+    """A few pages of search results forward, then back to the first."""
+    screen = yield from _search_results(app)
+    container = screen.search_results_container
+    pages = list(range(2, PAGES_TURNED + 2))
+    for page in pages + pages[-2::-1] + [1]:
+        data = container.data
+        screen.controller.handle_search_for_anime(page=page)
+        yield lambda data=data: container.data is not data
+        yield SETTLE_FRAMES
+
+
+class FrameRecorder:
+    """Runs the frame scenarios one after another, one step per frame."""
+
+    def __init__(self, app: "Inazuma", names: list[str], long_frame: float):
+        self.app = app
+        self.long_frame = long_frame
+        self.results: dict[str, dict] = {}
+        self._pending = list(names)
+        self._name: str | None = None
+        self._script: Iterator[Wait] | None = None
+        self._wait: Wait = 0
+        self._waiting_since = 0.0
+        self._frames: list[float] = []
+
+    def start(self, *_):
+        from kivy.clock import Clock
+
+        # an interval of 0 runs every frame, with the time since the last one
+        self._event = Clock.schedule_interval(self._on_frame, 0)
+
+    def _on_frame(self, dt: float):
+        if self._script is None:
+            if not self._pending:
+                self._event.cancel()
+                self.app.stop()
+                return
+            self._name = self._pending.pop(0)
+            self._script = FRAME_SCENARIOS[self._name](self.app)
+            self._frames, self._wait = [], 0
+            return
+        self._frames.append(dt)
+        try:
+            if self._ready():
+                self._wait = next(self._script)
+                self._waiting_since = time.monotonic()
+        except StopIteration:
+            self._finish()
+        except Exception as e:
+            logger.exception(f"{self._name} failed")
+            self._finish(str(e))
+
+    def _ready(self) -> bool:
+        if isinstance(self._wait, int):
+            self._wait -= 1
+            return self._wait < 0
+        if self._wait():
+            return True
+        if time.monotonic() - self._waiting_since > WAIT_TIMEOUT:
+            raise TimeoutError(f"waited longer than {WAIT_TIMEOUT}s for the app")
+        return False
+
+    def _finish(self, error: str | None = None):
+        result = summarize(self._frames) if self._frames else {}
+        result["long_frames"] = sum(dt > self.long_frame for dt in self._frames)
+        # summarize counts rounds, here every frame is one
+        result["frames"] = result.pop("rounds", 0)
+        if error:
+            result["error"] = error
+        self.results[self._name] = result  # type: ignore
+        self._script = None
+
+
+def run_frame_scenarios(
+    viu: "Viu", names: list[str], long_frame: float
+) -> dict[str, dict]:
+    """Starts the app offscreen on `viu`, runs the scenarios and stops it again."""
+    os.environ.setdefault("SDL_VIDEODRIVER", "offscreen")
+    from kivy.config import Config
+
+    Config.set("graphics", "maxfps", "0")
+    Config.set("graphics", "width", str(WINDOW_SIZE[0]))
+    Config.set("graphics", "height", str(WINDOW_SIZE[1]))
+
+    from inazuma import Inazuma
+
+    app = Inazuma()
+    app.viu = viu
+    recorder = FrameRecorder(app, names, long_frame)
+    app.bind(on_start=recorder.start)
+    app.run()
+    return recorder.results
+
+
+__all__ = ["FRAME_SCENARIOS", "FrameRecorder", "run_frame_scenarios"]
@@ -0,0 +1,144 @@
+"""
+A local origin that serves byte ranges and hls playlists, throttled per connection.
+
+Streaming CDNs cap what one connection gets rather than what one client
+gets, which is what the segmented downloader and the stream proxy's
+read-ahead make use of. The origin does the same on localhost:
+``/video.mp4`` is `size` deterministic bytes, served with ranges, and
+``/playlist.m3u8`` lists them as `segments` mpeg-ts segments, each at most
+`rate` bytes per second per connection. An origin made with
+`unknown_size` answers ranges with ``Content-Range: bytes a-b/*``.
+"""
+
+import http.server
+import threading
+import time
+
+READ_SIZE = 64 * 1024
+
+
+def content(size: int) -> bytes:
+    """The bytes the origin serves, the same on every run."""
+    pattern = bytes(range(256)) * (READ_SIZE // 256)
+    return (pattern * (size // len(pattern) + 1))[:size]
+
+
+class LocalOrigin:
+    """Serves `content(size)` on 127.0.0.1, see the module docstring."""
+
+    def __init__(
+        self, size: int, rate: int, segments: int = 0, unknown_size: bool = False
+    ):
+        self.body = content(size)
+        self.rate = rate
+        self.segments = segments
+        self.unknown_size = unknown_size
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._server = http.server.ThreadingHTTPServer(
+            ("127.0.0.1", 0), self._handler()
+        )
+        self._server.daemon_threads = True
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    def __enter__(self) -> "LocalOrigin":
+        threading.Thread(
+            target=self._server.serve_forever, daemon=True, name="local-origin"
+        ).start()
+        return self
+
+    def __exit__(self, *_):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def segment_range(self, index: int) -> tuple[int, int]:
+        size = -(-len(self.body) // self.segments)
+        return index * size, min((index + 1) * size, len(self.body)) - 1
+
+    def playlist(self) -> str:
+        lines = ["#EXTM3U", "#EXT-X-VERSION:3", "#EXT-X-TARGETDURATION:4"]
+        for index in range(self.segments):
+            lines += ["#EXTINF:4.0,", f"segment{index}.ts"]
+        return "\n".join([*lines, "#EXT-X-ENDLIST", ""])
+
+    def _handler(self):
+        origin = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                with origin._lock:
+                    origin.requests += 1
+                path = self.path.rpartition("/")[2]
+                if path == "playlist.m3u8":
+                    self._send(200, origin.playlist().encode(), "application/x-mpegurl")
+                elif path.startswith("segment"):
+                    start, end = origin.segment_range(int(path[7:-3]))
+                    self._send(200, origin.body[start : end + 1], "video/mp2t")
+                elif path == "video.mp4":
+                    self._send_range()
+                else:
+                    self._send(404, b"", "text/plain")
+
+            def _send_range(self):
+                total = len(origin.body)
+                header = self.headers.get("Range", "")
+                if not header:
+                    self._send(200, origin.body, "video/mp4")
+                    return
+                first, _, last = header.removeprefix("bytes=").partition("-")
+                start = int(first or 0)
+                end = min(int(last), total - 1) if last else total - 1
+                if start > end:
+                    self._send(
+                        416, b"", "video/mp4", {"Content-Range": f"bytes */{total}"}
+                    )
+                    return
+                self._send(
+                    206,
+                    origin.body[start : end + 1],
+                    "video/mp4",
+                    {
+                        "Content-Range": f"bytes {start}-{end}/"
+                        + ("*" if origin.unknown_size else str(total))
+                    },
+                )
+
+            def _send(
+                self,
+                status: int,
+                body: bytes,
+                content_type: str,
+                headers: dict | None = None,
+            ):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.send_header("Accept-Ranges", "bytes")
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                started = time.monotonic()
+                try:
+                    for sent in range(0, len(body), READ_SIZE):
+                        self.wfile.write(body[sent : sent + READ_SIZE])
+                        # hold the connection to its share of the bandwidth
+                        ahead = (sent + READ_SIZE) / origin.rate - (
+                            time.monotonic() - started
+                        )
+                        if ahead > 0:
+                            time.sleep(ahead)
+                except (BrokenPipeError, ConnectionResetError):
+                    self.close_connection = True
+
+        return Handler
+
+
+__all__ = ["LocalOrigin", "content"]
@@ -0,0 +1,102 @@
+"""
+The stream proxy against the local origin, cold and from its disk cache.
+
+Every round plays the origin's progressive file and hls playlist through a
+`StreamProxy` the way the player does, from a fresh cache and again from the
+filled one, and checks the bytes served. Two cases that once failed are
+played as well: a cache whose info entry of the file was evicted while its
+chunks were kept, and an origin answering ranges without the total size.
+"""
+
+import tempfile
+import time
+from pathlib import Path
+
+from .origin import LocalOrigin
+from .stats import summarize
+
+DEFAULT_SIZE = 8 * 1024 * 1024
+DEFAULT_RATE = 8 * 1024 * 1024
+DEFAULT_SEGMENTS = 16
+DEFAULT_READ_AHEAD = 4 * 1024 * 1024
+
+
+def _play(proxy, client, url: str) -> bytes:
+    response = client.get(proxy.url_for(url))
+    response.raise_for_status()
+    if not url.endswith(".m3u8"):
+        return response.content
+    body = b""
+    for line in response.text.splitlines():
+        if line and not line.startswith("#"):
+            segment = client.get(line)
+            segment.raise_for_status()
+            body += segment.content
+    return body
+
+
+def _check(origin: LocalOrigin, body: bytes, case: str):
+    if body != origin.body:
+        raise RuntimeError(f"the proxy served other bytes than the origin ({case})")
+
+
+def _forget_info(proxy, url: str):
+    key = f"info:{url}"
+    proxy.cache._path(key).unlink()
+    proxy.cache._forget(proxy.cache._path(key))
+
+
+def run_proxy_benchmarks(
+    rounds: int,
+    size: int = DEFAULT_SIZE,
+    rate: int = DEFAULT_RATE,
+    segments: int = DEFAULT_SEGMENTS,
+) -> dict[str, dict]:
+    import httpx
+
+    from inazuma.core.stream_proxy import StreamProxy
+
+    timings: dict[str, list[float]] = {}
+    with (
+        LocalOrigin(size, rate, segments) as origin,
+        LocalOrigin(size, rate, unknown_size=True) as sizeless,
+        httpx.Client(timeout=60) as client,
+    ):
+        cases = [
+            ("ranges", origin, f"{origin.url}/video.mp4"),
+            ("hls", origin, f"{origin.url}/playlist.m3u8"),
+            ("unknown_size", sizeless, f"{sizeless.url}/video.mp4"),
+        ]
+        for _ in range(rounds):
+            for kind, served_by, url in cases:
+                with tempfile.TemporaryDirectory() as directory:
+                    proxy = StreamProxy(Path(directory), 4 * size, DEFAULT_READ_AHEAD)
+                    try:
+                        for state in ("cold", "cached"):
+                            started = time.perf_counter()
+                            _check(served_by, _play(proxy, client, url), kind)
+                            timings.setdefault(f"proxy_{kind}_{state}", []).append(
+                                time.perf_counter() - started
+                            )
+                        if kind == "ranges":
+                            proxy.stop()
+                            proxy.client.close()
+                            # a new session over the cache, without the info
+                            proxy = StreamProxy(
+                                Path(directory), 4 * size, DEFAULT_READ_AHEAD
+                            )
+                            _forget_info(proxy, url)
+                            started = time.perf_counter()
+                            _check(served_by, _play(proxy, client, url), kind)
+                            timings.setdefault("proxy_ranges_info_evicted", []).append(
+                                time.perf_counter() - started
+                            )
+                    finally:
+                        proxy.stop()
+                        # the read ahead must be done with the cache directory
+                        proxy._prefetcher.shutdown(wait=True)
+                        proxy.client.close()
+    return {name: summarize(values) for name, values in timings.items()}
+
+
+__all__ = ["run_proxy_benchmarks"]
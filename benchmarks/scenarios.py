@@ -0,0 +1,189 @@
+"""
+The scenarios the benchmark suite measures.
+
+A scenario takes the `BenchContext` and does its setup, then returns the
+callable that is timed, once per round.
+"""
+
+import functools
+from threading import Thread
+from typing import TYPE_CHECKING, Callable
+
+if TYPE_CHECKING:
+    from inazuma import Inazuma
+    from inazuma.core.viu import Viu
+    from viu_media.libs.media_api.types import MediaItem
+
+Scenario = Callable[["BenchContext"], Callable[[], None]]
+
+SCENARIOS: dict[str, Scenario] = {}
+# scenarios that create widgets and need kivymd and the app's kv rules
+UI_SCENARIOS: set[str] = set()
+# how often the shared setup is retried when a fake backend fails it
+SETUP_ATTEMPTS = 5
+
+
+class BenchContext:
+    """What the scenarios run against: a Viu and, when needed, the app built on it."""
+
+    def __init__(self, viu: "Viu"):
+        self.viu = viu
+
+    @functools.cached_property
+    def app(self) -> "Inazuma":
+        """The app with its screens built, but not running and without a window."""
+        from inazuma import Inazuma
+
+        app = Inazuma()
+        app.viu = self.viu
+        app.build()
+        return app
+
+    @functools.cached_property
+    def media_items(self) -> "list[MediaItem]":
+        from viu_media.libs.media_api.params import MediaSearchParams
+        from viu_media.libs.media_api.types import MediaSort
+
+        for attempt in range(SETUP_ATTEMPTS):
+            try:
+                result = self.viu.media_api.search_media(
+                    MediaSearchParams(sort=MediaSort.TRENDING_DESC)
+                )
+                break
+            except Exception:
+                if attempt == SETUP_ATTEMPTS - 1:
+                    raise
+        if not result or not result.media:
+            raise RuntimeError("the recording has no trending anime")
+        return result.media
+
+
+def scenario(name: str, ui: bool = False):
+    def _register(func: Scenario) -> Scenario:
+        SCENARIOS[name] = func
+        if ui:
+            UI_SCENARIOS.add(name)
+        return func
+
+    return _register
+
+
+@scenario("home_screen_population")
+def home_screen_population(ctx: BenchContext):
+    """The six lists of the home screen, fetched concurrently like the controller does."""
+    from inazuma.model.home_screen import HomeScreenModel
+
+    model = HomeScreenModel(ctx.viu)
+    getters = [
+        model.get_trending_anime,
+        model.get_most_favourite_anime,
+        model.get_most_popular_anime,
+        model.get_most_recently_updated_anime,
+        model.get_most_scored_anime,
+        model.get_upcoming_anime,
+    ]
+
+    def run():
+        errors = []
+
+        def fetch(getter):
+            try:
+                getter()
+            except Exception as e:
+                errors.append(e)
+
+        threads = [Thread(target=fetch, args=(getter,)) for getter in getters]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        if errors:
+            raise errors[0]
+
+    return run
+
+
+@scenario("search_round_trip")
+def search_round_trip(ctx: BenchContext):
+    from inazuma.model.search_screen import SearchScreenModel
+
+    model = SearchScreenModel(ctx.viu)
+
+    def run():
+        model.search_for_anime(
+            ctx.media_items[0].title.english, {"sort": "POPULARITY_DESC", "page": 1}
+        )
+
+    return run
+
+
+@scenario("card_building", ui=True)
+def card_building(ctx: BenchContext):
+    """One page of media cards, as a search result or a home list creates them."""
+    from inazuma.view.components.media_card.media_card import MediaCard
+
+    screen = ctx.app.manager_screens.get_screen("home screen")
+    media_items = ctx.media_items
+
+    def run():
+        for media_item in media_items:
+            MediaCard(media_item, screen)
+
+    return run
+
+
+@scenario("anime_screen_open_to_play")
+def anime_screen_open_to_play(ctx: BenchContext):
+    """From a media item to the link the player opens: match, episodes, streams."""
+    from inazuma.model.anime_screen import AnimeScreenModel
+
+    model = AnimeScreenModel(ctx.viu)
+    media_item = ctx.media_items[0]
+
+    def run():
+        model.open(media_item)
+        anime = model.get_anime_data_from_provider(media_item)
+        if not anime or not anime.episodes.sub:
+            raise RuntimeError("the recording has no provider anime")
+        servers = model.get_episode_streams(anime.episodes.sub[0])
+        quality = ctx.viu.config.stream.quality
+        if not any(
+            link.quality == quality for server in servers for link in server.links
+        ):
+            raise RuntimeError(f"the recording has no {quality}p stream")
+
+    return run
+
+
+@scenario("download_progress_handling", ui=True)
+def download_progress_handling(ctx: BenchContext):
+    """A burst of progress reports for a running download, as its hook sees them."""
+    from viu_media.libs.provider.anime.types import EpisodeStream, Server
+
+    app = ctx.app
+    media_item = ctx.media_items[0]
+    server = Server(name="bench", links=[EpisodeStream(link="http://bench/1.mp4")])
+    controller = app.manager_screens.get_screen("downloads screen").controller
+    controller.new_download_task(media_item, "1", server)
+    task_id = f"{media_item.id}_1"
+    total = 500 * 1024 * 1024
+    reports = [
+        {
+            "status": "downloading",
+            "downloaded_bytes": total * i // 200,
+            "total_bytes": total,
+            "speed": 4 * 1024 * 1024,
+            "eta": 200 - i,
+            "elapsed": i * 0.5,
+        }
+        for i in range(200)
+    ]
+
+    def run():
+        for data in reports:
+            app.on_download_progress(task_id, data)
+
+    return run
+
+
+__all__ = ["SCENARIOS", "UI_SCENARIOS", "BenchContext"]
@@ -0,0 +1,29 @@
+"""
+Percentile summaries of timings, shared by the benchmark commands.
+"""
+
+PERCENTILES = (50, 90, 95, 99)
+
+
+def percentile(samples: list[float], percent: float) -> float:
+    """The linearly interpolated percentile of sorted `samples`."""
+    rank = (len(samples) - 1) * percent / 100
+    low = int(rank)
+    high = min(low + 1, len(samples) - 1)
+    return samples[low] + (samples[high] - samples[low]) * (rank - low)
+
+
+def summarize(timings: list[float]) -> dict:
+    """Percentiles, extremes and mean of `timings` in seconds, as milliseconds."""
+    samples = sorted(timing * 1000 for timing in timings)
+    summary = {f"p{percent}": percentile(samples, percent) for percent in PERCENTILES}
+    summary.update(
+        min=samples[0],
+        max=samples[-1],
+        mean=sum(samples) / len(samples),
+        rounds=len(samples),
+    )
+    return {key: round(value, 3) for key, value in summary.items()}
+
+
+__all__ = ["PERCENTILES", "percentile", "summarize"]
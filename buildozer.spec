@@ -38,7 +38,7 @@ version = 3.2.7
 # comma separated e.g. requirements = sqlite3,kivy
 # Note: lxml removed - fails to compile on Android with Python 3.11 (PyFrameObject changes)
 # Note: python-levenshtein removed - requires C compilation, thefuzz works without it (slower)
-requirements = python3,kivy,pillow,ffpyplayer,httpx,pydantic,click,rich,inquirerpy,prompt_toolkit,thefuzz,yt-dlp,pycryptodomex,plyer,certifi,anyio,sniffio,idna,h11,httpcore
+requirements = python3,kivy,pillow,ffpyplayer,httpx,pydantic,click,rich,inquirerpy,prompt_toolkit,thefuzz,yt-dlp,pycryptodomex,plyer,certifi,anyio,sniffio,idna,h11,httpcore,watchdog
 
 # (str) Custom source folders for requirements
 # Sets custom source for any requirements with recipes
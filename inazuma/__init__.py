@@ -1,6 +1,7 @@
 import json
 import os
 import random
+import time
 
 from kivy.resources import resource_find
 from kivy.uix.screenmanager import FadeTransition, ScreenManager
@@ -9,12 +10,19 @@ from kivymd.app import MDApp
 from inazuma.view.screens import screens
 from inazuma.view.components.media_card.media_card import MediaPopup
 from inazuma.view.components.auth_modal import AuthPopup
+from inazuma.view.components.debug_panel import DebugPanel
+from inazuma.utility.memory import LeakDetector, MemoryMonitor
+from inazuma.utility.events import DownloadProgress, bus
+from inazuma.core.profiler import SamplingProfiler
+from inazuma.core.warmup import Warmup
 from kivy.logger import Logger
 from inazuma.utility.data import themes_available
 from typing import TYPE_CHECKING
 from kivy.uix.settings import SettingOptions
 from kivy.uix.gridlayout import GridLayout
-from kivy.uix.scrollview import ScrollView
+from kivy.uix.recycleview import RecycleView
+from kivy.uix.recycleboxlayout import RecycleBoxLayout
+from kivy.properties import ObjectProperty
 from kivy.uix.widget import Widget
 from kivy.uix.togglebutton import ToggleButton
 from kivy.uix.settings import SettingSpacer
@@ -26,45 +34,77 @@ if TYPE_CHECKING:
     from kivy.uix.settings import Settings
     from viu_media.libs.media_api.types import MediaItem
     from viu_media.libs.provider.anime.types import Server
+    from inazuma.core.postprocess import StepResult
+
+
+# F12 toggles the debug panel with the service telemetry and memory figures
+DEBUG_PANEL_KEY = 293
+# F10 starts the sampling profiler, and stops it and saves the profile
+PROFILER_KEY = 291
+TELEMETRY_EXPORT_INTERVAL = 60
+
+
+class _OptionButton(ToggleButton):
+    """One option of a SettingScrollOptions popup, recycled across options."""
+
+    setting = ObjectProperty(None, allownone=True)
+
+    def on_release(self):
+        if self.setting:
+            self.setting._set_option(self)
 
 
 class SettingScrollOptions(SettingOptions):
+    """Options in a popup that is built once and only lays out the visible ones.
+
+    Some settings, like the theme, have over a hundred options; the popup
+    recycles a screenful of buttons instead of building one per option on
+    every opening.
+    """
+
+    _options_view: RecycleView | None = None
+
     def _create_popup(self, instance):
-        # global oORCA
-        # create the popup
+        if not self.popup:
+            self._build_popup()
+        self._options_view.data = [  # type: ignore
+            {
+                "text": str(option),
+                "state": "down" if option == self.value else "normal",
+                "setting": self,
+            }
+            for option in self.options
+        ]
+        self.popup.open()  # type: ignore
+        # start at the chosen option rather than at the top
+        if self.value in self.options and len(self.options) > 1:
+            index = self.options.index(self.value)
+            self._options_view.scroll_y = 1 - index / (len(self.options) - 1)  # type: ignore
 
+    def _build_popup(self):
         content = GridLayout(cols=1, spacing="5dp")
-        scrollview = ScrollView(do_scroll_x=False)
-        scrollcontent = GridLayout(cols=1, spacing="5dp", size_hint=(None, None))
-        scrollcontent.bind(minimum_height=scrollcontent.setter("height"))  # type: ignore
         self.popup = popup = Popup(
             content=content, title=self.title, size_hint=(0.5, 0.9), auto_dismiss=False
         )
-
-        # we need to open the popup first to get the metrics
-        popup.open()
         # Add some space on top
         content.add_widget(Widget(size_hint_y=None, height=dp(2)))
-        # add all the options
-        uid = str(self.uid)  # type: ignore
-        for option in self.options:
-            state = "down" if option == self.value else "normal"
-            btn = ToggleButton(
-                text=option,
-                state=state,
-                group=uid,
-                size=(popup.width, dp(55)),
-                size_hint=(None, None),
-            )
-            btn.bind(on_release=self._set_option)  # type: ignore
-            scrollcontent.add_widget(btn)
+
+        self._options_view = RecycleView(do_scroll_x=False)
+        layout = RecycleBoxLayout(
+            orientation="vertical",
+            spacing=dp(5),
+            default_size=(None, dp(55)),
+            default_size_hint=(1, None),
+            size_hint_y=None,
+        )
+        layout.bind(minimum_height=layout.setter("height"))  # type: ignore
+        self._options_view.add_widget(layout)
+        self._options_view.viewclass = _OptionButton
+        content.add_widget(self._options_view)
 
         # finally, add a cancel button to return on the previous panel
-        scrollview.add_widget(scrollcontent)
-        content.add_widget(scrollview)
         content.add_widget(SettingSpacer())
-        # btn = Button(text='Cancel', size=((oORCA.iAppWidth/2)-sp(25), dp(50)),size_hint=(None, None))
-        btn = Button(text="Cancel", size=(popup.width, dp(50)), size_hint=(0.9, None))
+        btn = Button(text="Cancel", size_hint=(1, None), height=dp(50))
         btn.bind(on_release=popup.dismiss)  # type: ignore
         content.add_widget(btn)
 
@@ -87,6 +127,12 @@ class Inazuma(MDApp):
             viu_config = AppConfig()
 
         self.viu = Viu(viu_config)
+        if fake_backend_profile := os.environ.get("INAZUMA_FAKE_BACKEND"):
+            from pathlib import Path
+
+            # run against scripted, misbehaving stand-ins instead of the network
+            self.viu.backend = "fake"
+            self.viu.fake_backend_profile = Path(fake_backend_profile)
         if "MEDIA_API_TOKEN" in os.environ:
             if not self.viu.media_api.is_authenticated():
                 self.viu.media_api.authenticate(os.environ["MEDIA_API_TOKEN"])
@@ -111,6 +157,24 @@ class Inazuma(MDApp):
                 self.theme_cls.primary_palette = theme_color
             if theme_style := config.get("Preferences", "theme_style"):
                 self.theme_cls.theme_style = theme_style
+            self.viu.downloader_engine = config.get("Downloads", "engine")
+            self.viu.download_connections = config.getint("Downloads", "connections")
+            self.viu.post_processing_workers = config.getint(
+                "Downloads", "post_processing_workers"
+            )
+            self.viu.min_free_space = (
+                config.getint("Downloads", "min_free_space") * 1024 * 1024
+            )
+            self.viu.stream_cache_size = (
+                config.getint("Player", "stream_cache_size") * 1024 * 1024
+            )
+            self.viu.stream_read_ahead = (
+                config.getint("Player", "stream_read_ahead") * 1024 * 1024
+            )
+            self.viu.quality_mode = config.get("Player", "quality_mode")
+            self.viu.trailer_frame_memory = (
+                config.getint("Player", "trailer_frame_memory") * 1024 * 1024
+            )
 
         return self.manager_screens
 
@@ -121,7 +185,130 @@ class Inazuma(MDApp):
 
     def on_start(self, *args):
         self.media_card_popup = MediaPopup()
+        self.media_card_popup.player.idle_timeout = self.config.getint(
+            "Player", "trailer_idle_timeout"
+        )
         self.auth_popup = AuthPopup()
+        self.debug_panel = DebugPanel()
+        self.memory_monitor = MemoryMonitor(self)
+        if self.config.getboolean("Debug", "memory_tracking"):
+            self.memory_monitor.start()
+        self.leak_detector = LeakDetector(self.manager_screens)
+        if self.config.getboolean("Debug", "leak_check"):
+            self.leak_detector.start()
+        self.profiler = SamplingProfiler(tags=self._profile_tags)
+        if self.config.getboolean("Debug", "profiling"):
+            self.start_profiling()
+        self.viu.library.start()
+        self.warmup = Warmup(self.viu)
+
+        from kivy.clock import Clock
+        from kivy.core.window import Window
+
+        Window.bind(on_keyboard=self._on_keyboard)
+        Window.bind(on_flip=self._on_first_frame)
+        Clock.schedule_interval(
+            self._export_telemetry_in_background, TELEMETRY_EXPORT_INTERVAL
+        )
+
+    def on_stop(self, *args):
+        self.export_telemetry()
+        if self.viu._config_writer:
+            self.viu._config_writer.flush()
+        if self.viu._media_index:
+            self.viu._media_index.flush()
+        if self.profiler.is_running:
+            self.stop_profiling(in_background=False)
+        self.viu.library.stop()
+        if self.viu._post_processor:
+            self.viu._post_processor.shutdown()
+        if self.viu._trailers:
+            self.viu._trailers.stop()
+        if self.viu._stream_proxy:
+            self.viu._stream_proxy.stop()
+        if self.viu._fake_backend:
+            self.viu._fake_backend.stop()
+        if self.viu._http_pool:
+            self.viu._http_pool.close()
+
+    def _on_first_frame(self, window):
+        # the services are warmed up once the app is on screen, not before
+        window.unbind(on_flip=self._on_first_frame)
+        self.warmup.start()
+
+    def _on_keyboard(self, window, key, *args):
+        if key == DEBUG_PANEL_KEY:
+            if self.debug_panel._is_open:
+                self.debug_panel.dismiss()
+            else:
+                self.debug_panel.open()
+            return True
+        if key == PROFILER_KEY:
+            if self.profiler.is_running:
+                self.stop_profiling()
+            else:
+                self.start_profiling()
+            return True
+
+    # ---------------profiling-------------------------
+    def start_profiling(self):
+        self.profiler.interval = (
+            max(1, self.config.getint("Debug", "profiler_interval")) / 1000
+        )
+        self.profiler.start()
+        self.config.set("Debug", "profiling", 1)
+        Logger.info("Inazuma: Sampling profiler started")
+
+    def stop_profiling(self, in_background: bool = True):
+        """Stops the profiler and writes the profile to the profiles folder."""
+        from threading import Thread
+
+        from viu_media.core.constants import APP_DATA_DIR
+
+        self.profiler.stop()
+        self.config.set("Debug", "profiling", 0)
+        profile_format = self.config.get("Debug", "profiler_format")
+        extension = "speedscope.json" if profile_format == "speedscope" else "txt"
+        name = time.strftime("%Y%m%d-%H%M%S")
+        path = APP_DATA_DIR / "profiles" / f"{name}.{extension}"
+
+        def _save():
+            from inazuma.utility.notification import show_notification
+
+            try:
+                if profile_format == "speedscope":
+                    self.profiler.save_speedscope(path)
+                else:
+                    self.profiler.save_collapsed(path)
+            except OSError as e:
+                Logger.error(f"Inazuma: Failed to save the profile: {e}")
+                return
+            show_notification("Profile saved", str(path))
+
+        if in_background:
+            Thread(target=_save, daemon=True).start()
+        else:
+            _save()
+
+    def _profile_tags(self, thread_id: int) -> list[str]:
+        tags = [f"screen:{self.manager_screens.current}"]
+        if operation := self.viu.telemetry.running(thread_id):
+            tags.append(f"op:{operation}")
+        return tags
+
+    def _export_telemetry_in_background(self, *_):
+        from threading import Thread
+
+        Thread(target=self.export_telemetry, daemon=True).start()
+
+    def export_telemetry(self):
+        """Appends the service telemetry and memory snapshots to jsonl files when enabled."""
+        if not self.config.getboolean("Debug", "telemetry_export"):
+            return
+        from viu_media.core.constants import APP_DATA_DIR
+
+        self.viu.telemetry.export(APP_DATA_DIR / "telemetry.jsonl")
+        self.memory_monitor.export(APP_DATA_DIR / "memory.jsonl")
 
     def build_config(self, config):
         # General settings setup
@@ -133,23 +320,64 @@ class Inazuma(MDApp):
                 "downloads_dir": self.viu.config.downloads.downloads_dir,
             },
         )
+        config.setdefaults(
+            "Downloads",
+            {
+                "engine": "viu",
+                "connections": 4,
+                "post_processing": "verify,remux,thumbnail",
+                "post_processing_workers": 1,
+                "min_free_space": 512,
+            },
+        )
+        config.setdefaults(
+            "Player",
+            {
+                "preload_next_episode": 1,
+                "preload_lookahead": 60,
+                "stream_proxy": 1,
+                "stream_cache_size": 1024,
+                "stream_read_ahead": 16,
+                "quality_mode": "fixed",
+                "trailer_idle_timeout": 30,
+                "trailer_frame_memory": 4,
+            },
+        )
+        config.setdefaults(
+            "Debug",
+            {
+                "telemetry_export": 0,
+                "memory_tracking": 0,
+                "leak_check": 0,
+                "profiling": 0,
+                "profiler_interval": 10,
+                "profiler_format": "collapsed",
+            },
+        )
 
         # Viu settings - dynamically extract from AppConfig
         viu_defaults = self._get_viu_config_defaults()
         config.setdefaults("Viu", viu_defaults)
 
+    def _get_viu_config_schema(self) -> list[dict]:
+        from viu_media.core.constants import APP_CACHE_DIR
+        from inazuma.utility.settings_schema import load_schema
+
+        return load_schema(self.viu.config, APP_CACHE_DIR / "settings_schema.json")
+
     def _get_viu_config_defaults(self) -> dict:
-        """Dynamically extract default values from viu.config (AppConfig)."""
+        """Extract default values from viu.config (AppConfig), over the cached schema."""
         from enum import Enum
 
         defaults = {}
         viu_cfg = self.viu.config
 
-        for section_name, section_model in viu_cfg:
-            if section_name in ("fzf", "rofi"):
-                continue
-            for field_name in section_model.model_fields:
-                value = getattr(section_model, field_name)
+        for section in self._get_viu_config_schema():
+            section_model = getattr(viu_cfg, section["name"])
+            for field in section["fields"]:
+                if field["computed"]:
+                    continue
+                value = getattr(section_model, field["name"])
                 # Convert enum to its value
                 if isinstance(value, Enum):
                     value = value.value
@@ -157,101 +385,26 @@ class Inazuma(MDApp):
                 elif hasattr(value, "__fspath__"):
                     value = str(value)
 
-                key = f"{section_name}_{field_name}"
-                defaults[key] = value
+                defaults[field["entry"]["key"]] = value
 
         return defaults
 
     def _get_viu_settings(self) -> list:
-        """Dynamically generate Kivy settings JSON from viu.config (AppConfig)."""
-        import itertools
-
+        """Kivy settings JSON for viu.config (AppConfig), from the cached schema."""
         viu_cfg = self.viu.config
         settings = []
 
-        for section_name, section_model in viu_cfg:
-            if section_name in ("fzf", "rofi"):
-                continue
-
-            # Add section title
-            section_title = section_model.model_config.get(
-                "title", section_name.replace("_", " ").title()
-            )
-            settings.append({"type": "title", "title": section_title})
-
-            for field_name, field_info in itertools.chain(
-                section_model.model_fields.items(),
-                section_model.model_computed_fields.items(),
-            ):
-                field_type = getattr(field_info, "annotation", None) or getattr(
-                    field_info, "return_type", None
-                )
-                field_value = getattr(section_model, field_name)
-
+        for section in self._get_viu_config_schema():
+            section_model = getattr(viu_cfg, section["name"])
+            settings.append({"type": "title", "title": section["title"]})
+            for field in section["fields"]:
                 # Skip None/unset fields
-                if field_value is None:
+                if getattr(section_model, field["name"]) is None:
                     continue
-
-                # Determine Kivy setting type and options
-                setting_type, options = self._get_kivy_setting_type(field_type)
-
-                # Build the setting entry
-                key = f"{section_name}_{field_name}"
-                title = field_name.replace("_", " ").title()
-                desc = field_info.description or ""
-
-                setting_entry = {
-                    "type": setting_type,
-                    "title": title,
-                    "desc": desc,
-                    "section": "Viu",
-                    "key": key,
-                }
-
-                if options:
-                    setting_entry["options"] = options
-
-                settings.append(setting_entry)
+                settings.append(dict(field["entry"]))
 
         return settings
 
-    def _get_kivy_setting_type(self, field_type) -> tuple:
-        """Map Pydantic field type to Kivy setting type and options."""
-        from enum import Enum
-        from pathlib import Path
-        from typing import Literal, get_args, get_origin
-
-        options = None
-
-        # Check for Enum
-        if (
-            field_type is not None
-            and isinstance(field_type, type)
-            and issubclass(field_type, Enum)
-        ):
-            options = [member.value for member in field_type]
-            return ("scrolloptions", options)
-
-        # Check for Literal
-        if get_origin(field_type) is Literal:
-            args = get_args(field_type)
-            if args:
-                options = list(args)
-                return ("scrolloptions", options)
-
-        # Basic types
-        if field_type is bool:
-            return ("bool", None)
-        if field_type in (int, float):
-            return ("numeric", None)
-        if field_type is Path or (
-            hasattr(field_type, "__origin__") and field_type.__origin__ is Path
-        ):
-            return ("path", None)
-
-        # Default to string
-        return ("string", None)
-
     def build_settings(self, settings: "Settings"):
         settings.register_type("scrolloptions", SettingScrollOptions)
         app_settings = [
@@ -279,6 +432,145 @@ class Inazuma(MDApp):
                 "section": "Preferences",
                 "key": "downloads_dir",
             },
+            {"type": "title", "title": "Downloads"},
+            {
+                "type": "options",
+                "title": "Downloader Engine",
+                "desc": "viu uses the downloader set in the viu config, segmented fetches each file over several parallel connections",
+                "section": "Downloads",
+                "key": "engine",
+                "options": ["viu", "segmented"],
+            },
+            {
+                "type": "numeric",
+                "title": "Connections",
+                "desc": "Number of parallel connections used by the segmented downloader",
+                "section": "Downloads",
+                "key": "connections",
+            },
+            {
+                "type": "string",
+                "title": "Post Processing",
+                "desc": "Comma separated steps to run on finished downloads, any of verify, remux and thumbnail",
+                "section": "Downloads",
+                "key": "post_processing",
+            },
+            {
+                "type": "numeric",
+                "title": "Post Processing Workers",
+                "desc": "How many post processing steps may run at the same time",
+                "section": "Downloads",
+                "key": "post_processing_workers",
+            },
+            {
+                "type": "numeric",
+                "title": "Minimum Free Space",
+                "desc": "Space in MB that must stay free on the downloads disk, downloads that would go below it are queued or refused",
+                "section": "Downloads",
+                "key": "min_free_space",
+            },
+            {"type": "title", "title": "Player"},
+            {
+                "type": "bool",
+                "title": "Preload Next Episode",
+                "desc": "Open the next episode in the background near the end of the current one so it starts without a pause",
+                "section": "Player",
+                "key": "preload_next_episode",
+            },
+            {
+                "type": "numeric",
+                "title": "Preload Lookahead",
+                "desc": "How many seconds before the end of an episode the next one starts preloading",
+                "section": "Player",
+                "key": "preload_lookahead",
+            },
+            {
+                "type": "bool",
+                "title": "Caching Stream Proxy",
+                "desc": "Stream through a local proxy that sends each server's headers, caches what was played and reads ahead",
+                "section": "Player",
+                "key": "stream_proxy",
+            },
+            {
+                "type": "numeric",
+                "title": "Stream Cache Size",
+                "desc": "Disk space in MB the stream proxy may use to cache played video",
+                "section": "Player",
+                "key": "stream_cache_size",
+            },
+            {
+                "type": "numeric",
+                "title": "Read Ahead",
+                "desc": "How many MB the stream proxy fetches ahead of the player, this is also what a preloaded next episode buffers",
+                "section": "Player",
+                "key": "stream_read_ahead",
+            },
+            {
+                "type": "options",
+                "title": "Quality Mode",
+                "desc": "Fixed always plays the configured stream quality, adaptive picks the best quality up to it that the measured bandwidth sustains and switches during playback",
+                "section": "Player",
+                "key": "quality_mode",
+                "options": ["fixed", "adaptive"],
+            },
+            {
+                "type": "numeric",
+                "title": "Trailer Idle Timeout",
+                "desc": "Seconds a paused trailer keeps its video decoder open, so hovering back over its card resumes it",
+                "section": "Player",
+                "key": "trailer_idle_timeout",
+            },
+            {
+                "type": "numeric",
+                "title": "Trailer Frame Memory",
+                "desc": "MB a decoded trailer frame may take, trailers are fetched with the yt-dlp format of downloads in the highest resolution that fits",
+                "section": "Player",
+                "key": "trailer_frame_memory",
+            },
+            {"type": "title", "title": "Debug"},
+            {
+                "type": "bool",
+                "title": "Export Telemetry",
+                "desc": "Append what each service call cost to telemetry.jsonl in the app data folder every minute, F12 shows the same figures in the app",
+                "section": "Debug",
+                "key": "telemetry_export",
+            },
+            {
+                "type": "bool",
+                "title": "Memory Tracking",
+                "desc": "Count the widgets of each screen, texture memory, cached anime and observers every minute, shown in the debug panel and exported with the telemetry to memory.jsonl",
+                "section": "Debug",
+                "key": "memory_tracking",
+            },
+            {
+                "type": "bool",
+                "title": "Leak Check",
+                "desc": "Count live objects on every screen visit and warn in the log about types that keep growing when a screen is visited again",
+                "section": "Debug",
+                "key": "leak_check",
+            },
+            {
+                "type": "bool",
+                "title": "Sampling Profiler",
+                "desc": "Sample what every thread is doing, tagged with the screen and service call, turning it off (or F10) saves the profile to the profiles folder in the app data folder",
+                "section": "Debug",
+                "key": "profiling",
+            },
+            {
+                "type": "numeric",
+                "title": "Profiler Interval",
+                "desc": "Milliseconds between samples, shorter is more detailed and costs more",
+                "section": "Debug",
+                "key": "profiler_interval",
+            },
+            {
+                "type": "options",
+                "title": "Profile Format",
+                "desc": "Collapsed stacks work with flamegraph.pl, inferno and speedscope, speedscope json opens at speedscope.app",
+                "section": "Debug",
+                "key": "profiler_format",
+                "options": ["collapsed", "speedscope"],
+            },
         ]
         viu_settings = self._get_viu_settings()
 
@@ -300,37 +592,85 @@ class Inazuma(MDApp):
                 case "theme_style":
                     self.theme_cls.theme_style = value
 
+        elif section == "Downloads":
+            match key:
+                case "engine":
+                    self.viu.downloader_engine = value
+                    self.viu.invalidate("downloader_engine")
+                case "connections":
+                    self.viu.download_connections = max(1, int(value))
+                    self.viu.invalidate("download_connections")
+                case "post_processing_workers":
+                    self.viu.post_processing_workers = max(1, int(value))
+                    self.viu.invalidate("post_processing_workers")
+                case "min_free_space":
+                    self.viu.min_free_space = max(0, int(value)) * 1024 * 1024
+                    self.viu.disk_space.min_free_space = self.viu.min_free_space
+
+        elif section == "Player":
+            match key:
+                case "stream_cache_size":
+                    self.viu.stream_cache_size = max(0, int(value)) * 1024 * 1024
+                    if self.viu._stream_proxy:
+                        self.viu._stream_proxy.cache.max_bytes = (
+                            self.viu.stream_cache_size
+                        )
+                case "stream_read_ahead":
+                    self.viu.stream_read_ahead = max(0, int(value)) * 1024 * 1024
+                    if self.viu._stream_proxy:
+                        self.viu._stream_proxy.read_ahead = self.viu.stream_read_ahead
+                case "quality_mode":
+                    self.viu.quality_mode = value
+                case "trailer_idle_timeout":
+                    self.media_card_popup.player.idle_timeout = max(0, int(value))
+                case "trailer_frame_memory":
+                    self.viu.trailer_frame_memory = max(1, int(value)) * 1024 * 1024
+
+        elif section == "Debug":
+            match key:
+                case "memory_tracking":
+                    if int(value):
+                        self.memory_monitor.start()
+                    else:
+                        self.memory_monitor.stop()
+                case "leak_check":
+                    if int(value):
+                        self.leak_detector.start()
+                    else:
+                        self.leak_detector.stop()
+                case "profiling":
+                    if int(value) and not self.profiler.is_running:
+                        self.start_profiling()
+                    elif not int(value) and self.profiler.is_running:
+                        self.stop_profiling()
+
         elif section == "Viu":
-            self._apply_viu_config_change(key, value)
+            changed = self._apply_viu_config_change(key, value)
             self._write_viu_config()
-            self.viu.reset()
+            if changed and (rebuilt := self.viu.invalidate(changed)):
+                rebuilt = ", ".join(sorted(rebuilt))
+                Logger.info(f"Inazuma Settings: Rebuilding {rebuilt}")
 
     def _write_viu_config(self):
-        from viu_media.cli.config.generate import generate_config_toml_from_app_model
-        from viu_media.core.constants import USER_CONFIG
-        from viu_media.core.utils.file import AtomicWriter
-
-        config_toml = generate_config_toml_from_app_model(self.viu.config)
-        with AtomicWriter(USER_CONFIG, mode="w", encoding="utf-8") as f:
-            f.write(config_toml)
-
-    def _apply_viu_config_change(self, key: str, value):
-        """Apply a config change to viu.config dynamically."""
+        # batched with the changes that follow, and skipped if nothing differs
+        self.viu.config_writer.schedule()
 
-        # Key format is "{section_name}_{field_name}"
-        parts = key.split("_", 1)
-        if len(parts) != 2:
-            Logger.warning(f"Inazuma Settings: Invalid Viu config key format: {key}")
-            return
+    def _apply_viu_config_change(self, key: str, value) -> str | None:
+        """Apply a config change to viu.config dynamically.
 
-        section_name, field_name = parts
+        Returns the "section.field" that changed, if it did.
+        """
 
-        # Get the section model from viu.config
-        if not hasattr(self.viu.config, section_name):
-            Logger.warning(
-                f"Inazuma Settings: Unknown Viu config section: {section_name}"
-            )
+        # Key format is "{section_name}_{field_name}", and section names such as
+        # media_registry contain underscores themselves, so the longest wins
+        sections = sorted(type(self.viu.config).model_fields, key=len, reverse=True)
+        section_name = next(
+            (section for section in sections if key.startswith(f"{section}_")), None
+        )
+        if not section_name:
+            Logger.warning(f"Inazuma Settings: Unknown Viu config section in: {key}")
             return
+        field_name = key[len(section_name) + 1 :]
 
         section_model = getattr(self.viu.config, section_name)
 
@@ -357,6 +697,7 @@ class Inazuma(MDApp):
             Logger.info(
                 f"Inazuma Settings: Updated {section_name}.{field_name} = {converted_value}"
             )
+            return f"{section_name}.{field_name}"
         except (ValueError, TypeError) as e:
             Logger.warning(
                 f"Inazuma Settings: Failed to convert value for {section_name}.{field_name}: {e}"
@@ -420,6 +761,13 @@ class Inazuma(MDApp):
         search_screen = self.manager_screens.get_screen("search screen")
         search_screen.controller.handle_search_for_anime(search_field, **kwargs)
 
+    def search_locally(self, text: str):
+        """Shows the local matches of the search bar's text, as it is typed."""
+        if self.manager_screens.current != "search screen" or not text.strip():
+            return
+        search_screen = self.manager_screens.get_screen("search screen")
+        search_screen.controller.show_local_matches(text)
+
     def show_anime_screen(self, media_item: "MediaItem", caller_screen_name: str):
         self.manager_screens.current = anime_screen_name = "anime screen"
         self.manager_screens.get_screen(anime_screen_name).controller.update_anime_view(
@@ -431,7 +779,7 @@ class Inazuma(MDApp):
         url: str,
         episode: str,
         media_item: "MediaItem",
-        server: "Server",
+        server: "Server | None",
     ):
         from viu_media.libs.player.params import PlayerParams
         from threading import Thread
@@ -445,7 +793,8 @@ class Inazuma(MDApp):
                     title=episode_title,
                     episode=episode,
                     query=media_item.title.romaji or media_item.title.english,
-                    headers=server.headers,
+                    # local files from the library have no server
+                    headers=server.headers if server else {},
                 ),
             ),
             daemon=True,
@@ -462,6 +811,13 @@ class Inazuma(MDApp):
         # Create unique identifier for this download task
         task_id = f"{media_item.id}_{episode}"
 
+        if self.viu.library.has(media_item.id, episode):
+            show_notification(
+                "Already Downloaded",
+                f"{media_item.title.english}; Episode {episode} is already in your library",
+            )
+            return
+
         # Check if already downloading
         if task_id in self.active_downloads:
             show_notification(
@@ -478,7 +834,7 @@ class Inazuma(MDApp):
 
         # Create progress hook that includes task_id
         def progress_hook(data):
-            download_screen.controller.on_episode_download_progress(task_id, data)
+            self.on_download_progress(task_id, data)
 
         download_thread = Thread(
             target=self._add_media_to_download_queue,
@@ -491,6 +847,13 @@ class Inazuma(MDApp):
             "New Download", f"{media_item.title.english}; Episode {episode}"
         )
 
+    def on_download_progress(self, task_id: str, data: dict):
+        """Handles a progress report of a running download, on its thread."""
+        self.viu.disk_space.update(task_id, data)
+        self.viu.bandwidth.add_progress(task_id, data.get("downloaded_bytes") or 0)
+        # the downloads screen shows the latest report of each task once a frame
+        bus.publish(DownloadProgress(task_id, dict(data)))
+
     def _add_media_to_download_queue(
         self,
         task_id: str,
@@ -498,53 +861,151 @@ class Inazuma(MDApp):
         episode: str,
         media_item: "MediaItem",
         server: "Server",
-        progress_hooks=[],
+        progress_hooks=None,
     ):
         from viu_media.core.downloader import DownloadParams
+        from inazuma.core.postprocess import parse_steps
+        from inazuma.core.segmented_downloader import SegmentedDownloader
         from inazuma.utility.notification import show_notification
 
+        progress_hooks = progress_hooks or []
+        download_screen = self.manager_screens.get_screen("downloads screen")
+        steps = parse_steps(self.config.get("Downloads", "post_processing"))
+        # handed on to post processing, which ends the download when it is done
+        processing = False
         try:
             episode_title = f"{media_item.title.english}; Episode {episode}"
-            download_result = self.viu.downloader.download(
-                DownloadParams(
-                    url=url,
-                    anime_title=media_item.title.english,
-                    episode_title=episode_title,
-                    silent=True,
-                    headers=server.headers,
-                    progress_hooks=progress_hooks,
-                    logger=Logger,
-                )
+            params = DownloadParams(
+                url=url,
+                anime_title=media_item.title.english,
+                episode_title=episode_title,
+                silent=True,
+                headers=server.headers,
+                progress_hooks=progress_hooks,
+                logger=Logger,
             )
+            downloader = self.viu.downloader
+            if isinstance(downloader, SegmentedDownloader):
+                # it knows the size before writing, from the probe it makes anyway
+                download_result = downloader.download(
+                    params,
+                    reserve=lambda size: self._reserve_disk_space(
+                        task_id, url, size, steps
+                    ),
+                )
+            else:
+                # viu's downloaders are accounted for from their progress reports
+                download_result = downloader.download(params)
+
+            if download_result and not download_result.success:
+                raise ValueError(download_result.error_message or "Download failed")
 
             # Handle completion
             if download_result:
-                show_notification(
-                    "Download Complete",
-                    f"{media_item.title.english}; Episode {episode}",
-                )
-
-                # Update download screen to show completion
-                download_screen = self.manager_screens.get_screen("downloads screen")
-                download_screen.controller.on_download_complete(
-                    task_id, download_result
+                if not (steps and download_result.video_path):
+                    self._on_download_finished(
+                        task_id, episode, media_item, download_result
+                    )
+                    return
+
+                download_screen.controller.on_post_processing_started(task_id, steps)
+                processing = True
+                self.viu.post_processor.submit(
+                    download_result.video_path,
+                    steps,
+                    on_step=lambda step_result: download_screen.controller.on_post_processing_step(
+                        task_id, step_result
+                    ),
+                    on_done=lambda video_path, step_results: self._on_download_processed(
+                        task_id,
+                        episode,
+                        media_item,
+                        download_result.model_copy(update={"video_path": video_path}),
+                        step_results,
+                    ),
                 )
         except Exception as e:
+            processing = False
             show_notification(
                 "Download Failed",
                 f"{media_item.title.english}; Episode {episode}: {str(e)}",
             )
-            download_screen = self.manager_screens.get_screen("downloads screen")
             download_screen.controller.on_download_error(task_id, str(e))
         finally:
-            # Remove from active downloads
-            if task_id in self.active_downloads:
-                del self.active_downloads[task_id]
+            if not processing:
+                self._end_download(task_id)
+
+    def _end_download(self, task_id: str):
+        """Forgets a download once it is in the library or has failed."""
+        # Remove from active downloads
+        if task_id in self.active_downloads:
+            del self.active_downloads[task_id]
+        # the space reserved for remuxing stays reserved until it is done
+        self.viu.disk_space.release(task_id)
+        self.viu.bandwidth.forget(task_id)
+
+    def _reserve_disk_space(
+        self, task_id: str, url: str, size: int | None, steps: list[str]
+    ):
+        """Waits until the download fits on disk, raises if it never will."""
+        from inazuma.core.segmented_downloader import is_hls_url
+
+        # remuxing writes a second copy of the file before deleting the first
+        headroom = size if size and "remux" in steps and is_hls_url(url) else 0
+        download_screen = self.manager_screens.get_screen("downloads screen")
+
+        def _on_queued(needed: int, available: int):
+            download_screen.controller.on_download_queued(task_id, needed, available)
+
+        if self.viu.disk_space.acquire(
+            task_id,
+            self.viu.config.downloads.downloads_dir,
+            size,
+            headroom,
+            on_queued=_on_queued,
+        ):
+            download_screen.controller.on_download_started(task_id)
+
+    def _on_download_processed(
+        self,
+        task_id: str,
+        episode: str,
+        media_item: "MediaItem",
+        download_result,
+        step_results: list["StepResult"],
+    ):
+        from inazuma.utility.notification import show_notification
+
+        try:
+            if failed := [r for r in step_results if r.status == "failed"]:
+                error_message = f"{failed[0].name} failed: {failed[0].message}"
+                show_notification(
+                    "Post Processing Failed",
+                    f"{media_item.title.english}; Episode {episode}: {error_message}",
+                )
+                download_screen = self.manager_screens.get_screen("downloads screen")
+                download_screen.controller.on_download_error(task_id, error_message)
+                return
+            self._on_download_finished(task_id, episode, media_item, download_result)
+        finally:
+            self._end_download(task_id)
+
+    def _on_download_finished(
+        self, task_id: str, episode: str, media_item: "MediaItem", download_result
+    ):
+        from inazuma.utility.notification import show_notification
+
+        if download_result.video_path:
+            self.viu.library.add(media_item.id, episode, download_result.video_path)
+        show_notification(
+            "Download Complete",
+            f"{media_item.title.english}; Episode {episode}",
+        )
+
+        # Update download screen to show completion
+        download_screen = self.manager_screens.get_screen("downloads screen")
+        download_screen.controller.on_download_complete(task_id, download_result)
 
-    # def on_stop(self):
-    #     pass
-    #
-    #
     def add_anime_to_user_anime_list(self, id: int):
         from inazuma.utility.notification import show_notification
         from viu_media.libs.media_api.params import UpdateUserMediaListEntryParams
@@ -1,4 +1,10 @@
-from inazuma import main
-
 if __name__ == "__main__":
+    import multiprocessing
+
+    # frozen builds start their post processing workers through this entry point,
+    # which must hand them over before the app, and kivy with it, is imported
+    multiprocessing.freeze_support()
+
+    from inazuma import main
+
     main()
@@ -1,3 +1,4 @@
+from threading import Thread
 from typing import TYPE_CHECKING
 
 from kivy.cache import Cache
@@ -22,30 +23,43 @@ class AnimeScreenController:
         return self.view
 
     def fetch_streams(self, episode="1"):
+        """Fetches the servers of `episode`, the view plays it once they are in."""
         if not self.model.current_state.provider_anime:
             Logger.warning("No provider anime data available to fetch streams.")
             return
 
-        if current_servers := self.model.get_episode_streams(episode):
-            Logger.debug(
-                f"current servers {[server.name for server in current_servers]}"
-            )
-            self.view.current_servers = current_servers
-        else:
-            Logger.warning(
-                f"No servers found for {self.model.current_state.provider_anime.title}"
-            )
+        Thread(
+            target=self.model.get_episode_streams, args=(episode,), daemon=True
+        ).start()
 
         # TODO: add auto start
         #
         # self.view.current_link = self.view.current_links[0]["gogoanime"][0]
 
+    def preload_episode_streams(self, episode: str):
+        """Fetches the streams of an upcoming episode for the view to preload"""
+        Thread(
+            target=self.model.get_episode_streams, args=(episode, True), daemon=True
+        ).start()
+
     def update_anime_view(self, media_item: "MediaItem", caller_screen_name):
-        self.model.get_anime_data_from_provider(media_item)
-        self.view.current_media_item = media_item
-        self.view.current_anime_data = self.model.current_state.provider_anime
         self.view.current_title = media_item.title.romaji or media_item.title.english
         self.view.caller_screen_name = caller_screen_name
+        # nothing of the previous anime may be played for this one
+        self.model.open(media_item)
+        self.view.current_servers = []
+        self.view.current_media_item = media_item
+        if local_episodes := self.model.get_local_episodes(media_item.id):
+            # downloaded episodes play right away, even offline; the provider
+            # lookup only completes the episode list
+            self.view.show_local_episodes(local_episodes)
+
+        # the model publishes what the provider has to the view
+        Thread(
+            target=self.model.get_anime_data_from_provider,
+            args=(media_item,),
+            daemon=True,
+        ).start()
 
 
 __all__ = ["AnimeScreenController"]
@@ -6,8 +6,11 @@ from typing import TYPE_CHECKING
 if TYPE_CHECKING:
     from viu_media.libs.provider.anime.types import Server
     from viu_media.libs.media_api.types import MediaItem
+    from inazuma.core.postprocess import StepResult
 from kivy.utils import format_bytes_to_human
 
+from inazuma.utility.events import DownloadProgress, bus
+
 
 class DownloadsScreenController:
     """The controller for the download screen"""
@@ -17,6 +20,7 @@ class DownloadsScreenController:
         self.view = DownloadsScreenView(controller=self, model=self.model)
         # Track task cards by task_id
         self.task_cards = {}
+        bus.subscribe(DownloadProgress, self._on_download_progress)
 
     def get_view(self) -> DownloadsScreenView:
         return self.view
@@ -30,6 +34,9 @@ class DownloadsScreenController:
         self.task_cards[task_id] = task_card
         return task_card
 
+    def _on_download_progress(self, event: DownloadProgress):
+        self.on_episode_download_progress(event.task_id, event.data)
+
     def on_episode_download_progress(self, task_id: str, data: dict):
         """Update progress for a specific download task"""
         percentage_completion = 0
@@ -62,6 +69,34 @@ class DownloadsScreenController:
         # Update overall progress bar with aggregate stats
         self._update_overall_progress()
 
+    def on_download_queued(self, task_id: str, needed: int, available: int):
+        """Show that a task waits for other downloads to free disk space"""
+        if task_id in self.task_cards:
+            self.task_cards[task_id].mark_queued(
+                f"Waiting for disk space: needs {format_bytes_to_human(needed)}, "
+                f"{format_bytes_to_human(max(0, available))} available"
+            )
+
+        self._update_overall_progress()
+
+    def on_download_started(self, task_id: str):
+        """Handle a queued task getting its disk space"""
+        if task_id in self.task_cards:
+            self.task_cards[task_id].mark_downloading()
+
+        self._update_overall_progress()
+
+    def refresh_free_space(self):
+        """Show the free space of the downloads disk in the status bar"""
+        from inazuma.core.disk_space import free_space
+
+        viu = self.model.viu
+        free = free_space(viu.config.downloads.downloads_dir)
+        free_space_text = f"{format_bytes_to_human(free)} free"
+        if reserved := viu.disk_space.reserved:
+            free_space_text += f" • {format_bytes_to_human(reserved)} reserved"
+        self.view.update_free_space(free_space_text)
+
     def _update_overall_progress(self):
         """Calculate and update overall download progress across all tasks"""
         if not self.task_cards:
@@ -72,6 +107,8 @@ class DownloadsScreenController:
         completed_count = 0
         error_count = 0
         downloading_count = 0
+        processing_count = 0
+        queued_count = 0
 
         for task_card in self.task_cards.values():
             total_progress += task_card.progress
@@ -81,6 +118,10 @@ class DownloadsScreenController:
                 error_count += 1
             elif task_card.status == "downloading":
                 downloading_count += 1
+            elif task_card.status == "processing":
+                processing_count += 1
+            elif task_card.status == "queued":
+                queued_count += 1
 
         avg_progress = round(total_progress / len(self.task_cards))
         total_tasks = len(self.task_cards)
@@ -88,6 +129,10 @@ class DownloadsScreenController:
         status_parts = []
         if downloading_count > 0:
             status_parts.append(f"{downloading_count} downloading")
+        if processing_count > 0:
+            status_parts.append(f"{processing_count} processing")
+        if queued_count > 0:
+            status_parts.append(f"{queued_count} waiting for space")
         if completed_count > 0:
             status_parts.append(f"{completed_count} completed")
         if error_count > 0:
@@ -100,6 +145,18 @@ class DownloadsScreenController:
 
         self.view.update_download_progress(avg_progress, progress_text)
 
+    def on_post_processing_started(self, task_id: str, steps: list[str]):
+        """Switch a finished download over to its post processing steps"""
+        if task_id in self.task_cards:
+            self.task_cards[task_id].mark_processing(steps)
+
+        self._update_overall_progress()
+
+    def on_post_processing_step(self, task_id: str, result: "StepResult"):
+        """Show the outcome and timing of a finished post processing step"""
+        if task_id in self.task_cards:
+            self.task_cards[task_id].update_step(result)
+
     def on_download_complete(self, task_id: str, result):
         """Handle download completion for a specific task"""
         if task_id in self.task_cards:
@@ -111,6 +168,7 @@ class DownloadsScreenController:
 
         # Update overall progress
         self._update_overall_progress()
+        self.refresh_free_space()
 
     def on_download_error(self, task_id: str, error_message: str):
         """Handle download error for a specific task"""
@@ -1,4 +1,3 @@
-from kivy.clock import Clock
 from threading import Thread
 from kivy.logger import Logger
 
@@ -23,30 +22,12 @@ class HomeScreenController:
         self.view = HomeScreenView(controller=self, model=self.model)
 
         self._discover_anime_list = [
-            {
-                "list_name": "Trending",
-                "data_getter": self.model.get_trending_anime,
-            },
-            {
-                "list_name": "Most Favourite",
-                "data_getter": self.model.get_most_favourite_anime,
-            },
-            {
-                "list_name": "Most Popular",
-                "data_getter": self.model.get_most_popular_anime,
-            },
-            {
-                "list_name": "Recently Updated",
-                "data_getter": self.model.get_most_recently_updated_anime,
-            },
-            {
-                "list_name": "Most Scored",
-                "data_getter": self.model.get_most_scored_anime,
-            },
-            {
-                "list_name": "Upcoming",
-                "data_getter": self.model.get_upcoming_anime,
-            },
+            self.model.get_trending_anime,
+            self.model.get_most_favourite_anime,
+            self.model.get_most_popular_anime,
+            self.model.get_most_recently_updated_anime,
+            self.model.get_most_scored_anime,
+            self.model.get_upcoming_anime,
         ]
 
     def get_all_anime_lists(self):
@@ -65,14 +46,9 @@ class HomeScreenController:
         return self.view
 
     def get_more_anime(self):
-        task = self._discover_anime_list.pop()
-        Thread(target=self._process_anime_list, args=(task,)).start()
-
-    def _process_anime_list(self, task):
-        anime_list = task["data_getter"]()
-        Clock.schedule_once(
-            lambda dt: self.view.add_new_anime_list(task["list_name"], anime_list)
-        )
+        data_getter = self._discover_anime_list.pop()
+        # the model publishes the list to the view once it is fetched
+        Thread(target=data_getter).start()
 
 
 __all__ = ["HomeScreenController"]
@@ -1,4 +1,3 @@
-from kivy.clock import Clock
 from threading import Thread
 from kivy.logger import Logger
 
@@ -20,30 +19,12 @@ class MyListScreenController:
         self.view = MyListScreenView(controller=self, model=self.model)
 
         self._discover_anime_list = [
-            {
-                "list_name": "Watching",
-                "data_getter": self.model.get_watching,
-            },
-            {
-                "list_name": "Repeating",
-                "data_getter": self.model.get_repeating,
-            },
-            {
-                "list_name": "Paused",
-                "data_getter": self.model.get_paused,
-            },
-            {
-                "list_name": "Planning",
-                "data_getter": self.model.get_planning,
-            },
-            {
-                "list_name": "Completed",
-                "data_getter": self.model.get_completed,
-            },
-            {
-                "list_name": "Dropped",
-                "data_getter": self.model.get_dropped,
-            },
+            self.model.get_watching,
+            self.model.get_repeating,
+            self.model.get_paused,
+            self.model.get_planning,
+            self.model.get_completed,
+            self.model.get_dropped,
         ]
     def get_all_anime_lists(self):
         if not self._discover_anime_list:
@@ -61,14 +42,9 @@ class MyListScreenController:
         return self.view
 
     def get_more_anime(self):
-        task = self._discover_anime_list.pop()
-        Thread(target=self._process_anime_list, args=(task,)).start()
-
-    def _process_anime_list(self, task):
-        anime_list = task["data_getter"]()
-        Clock.schedule_once(
-            lambda dt: self.view.add_new_anime_list(task["list_name"], anime_list)
-        )
+        data_getter = self._discover_anime_list.pop()
+        # the model publishes the list to the view once it is fetched
+        Thread(target=data_getter).start()
 
 
 __all__ = ["MyListScreenController"]
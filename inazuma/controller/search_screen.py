@@ -1,6 +1,5 @@
 from threading import Thread
 
-from kivy.clock import Clock
 from kivy.logger import Logger
 
 from ..model.search_screen import SearchScreenModel
@@ -16,6 +15,9 @@ class SearchScreenController:
     def __init__(self, model: SearchScreenModel):
         self.model = model
         self.view = SearchScreenView(controller=self, model=self.model)
+        # counts what was put on screen, local matches included, so the remote
+        # results of a search are dropped if something newer was shown meanwhile
+        self.generation = 0
 
     def get_view(self) -> SearchScreenView:
         return self.view
@@ -32,7 +34,24 @@ class SearchScreenController:
             self.search_term = search_term
             filters = self.view.filters.filters.copy()
             filters["page"] = page if page else 1
-            Thread(target=self._process_search, args=(search_term, filters)).start()
+            local_matches = []
+            if search_term and filters["page"] == 1:
+                local_matches = self.show_local_matches(search_term, filters)
+            self.generation += 1
+            Thread(
+                target=self._process_search,
+                args=(search_term, filters, local_matches, self.generation),
+            ).start()
+
+    def show_local_matches(self, search_term, filters=None) -> list:
+        """Shows the anime in the local index matching `search_term` right away."""
+        if filters is None:
+            filters = self.view.filters.filters
+        local_matches = self.model.search_locally(search_term, filters)
+        if local_matches:
+            self.generation += 1
+            self.view.show_local_matches(local_matches)
+        return local_matches
 
     def apply_filters(self):
         """Apply filters and search with current search term."""
@@ -41,21 +60,18 @@ class SearchScreenController:
     def add_or_update_trending(self):
         Thread(target=self._process_trending).start()
 
-    def _process_search(self, anime_title, filters={}):
-        media_list = self.model.search_for_anime(anime_title, filters)
-        if not media_list:
+    def _process_search(
+        self, anime_title, filters=None, local_matches=None, generation=None
+    ):
+        # the model publishes the results to the view
+        if not self.model.search_for_anime(
+            anime_title, filters, local_matches, generation
+        ):
             Logger.error(f"Search Screen:Failed to search for {anime_title}")
-            return
-        Clock.schedule_once(
-            lambda dt: self.view.add_or_update_search_results(media_list)
-        )
 
     def _process_trending(self):
-        media_list = self.model.get_trending()
-        if not media_list:
+        if not self.model.get_trending():
             Logger.error("Search Screen:Failed to get trending anime")
-            return
-        Clock.schedule_once(lambda dt: self.view.add_or_update_trending(media_list))
 
 
 __all__ = ["SearchScreenController"]
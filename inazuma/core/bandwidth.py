@@ -0,0 +1,116 @@
+"""
+Throughput estimation for adaptive stream quality.
+
+Samples come from the stream proxy (what playback actually fetched) and
+from running downloads. They are folded into two exponentially weighted
+moving averages, a fast one that reacts to drops and a slow one that
+ignores short bursts; the estimate is the lower of the two so quality goes
+down quickly and only comes back up once the bandwidth has held.
+"""
+
+import threading
+import time
+
+# samples this small are dominated by latency rather than bandwidth
+MIN_SAMPLE_BYTES = 16 * 1024
+FAST_HALF_LIFE = 3.0
+SLOW_HALF_LIFE = 10.0
+# the bandwidth a quality needs, in bytes per second, before headroom
+QUALITY_BITRATES = {
+    "360": 100_000,
+    "480": 190_000,
+    "720": 375_000,
+    "1080": 750_000,
+}
+# how much more than a quality's bitrate must be available to pick it
+HEADROOM = 1.5
+
+
+class _Ewma:
+    def __init__(self, half_life: float):
+        self.half_life = half_life
+        self._estimate = 0.0
+        self._total_weight = 0.0
+
+    def add(self, weight: float, value: float):
+        alpha = 0.5 ** (weight / self.half_life)
+        self._estimate = value * (1 - alpha) + alpha * self._estimate
+        self._total_weight += weight
+
+    @property
+    def estimate(self) -> float:
+        # corrects the bias towards zero of an average that started at zero
+        zero_factor = 1 - 0.5 ** (self._total_weight / self.half_life)
+        return self._estimate / zero_factor
+
+
+class BandwidthEstimator:
+    """Estimates the available throughput in bytes per second."""
+
+    def __init__(self):
+        self._fast = _Ewma(FAST_HALF_LIFE)
+        self._slow = _Ewma(SLOW_HALF_LIFE)
+        self._samples = 0
+        self._progress: dict[str, tuple[int, float]] = {}
+        self._lock = threading.Lock()
+
+    def add_sample(self, size: int, seconds: float):
+        if size < MIN_SAMPLE_BYTES or seconds <= 0:
+            return
+        with self._lock:
+            self._fast.add(seconds, size / seconds)
+            self._slow.add(seconds, size / seconds)
+            self._samples += 1
+
+    def add_progress(self, key: str, downloaded_bytes: int):
+        """Samples a running transfer from its cumulative byte count."""
+        now = time.monotonic()
+        with self._lock:
+            last_bytes, last_time = self._progress.setdefault(
+                key, (downloaded_bytes, now)
+            )
+        size = downloaded_bytes - last_bytes
+        if size < MIN_SAMPLE_BYTES:
+            return
+        with self._lock:
+            self._progress[key] = (downloaded_bytes, now)
+        self.add_sample(size, now - last_time)
+
+    def forget(self, key: str):
+        with self._lock:
+            self._progress.pop(key, None)
+
+    def estimate(self) -> float | None:
+        with self._lock:
+            if not self._samples:
+                return None
+            return min(self._fast.estimate, self._slow.estimate)
+
+
+def _quality_key(quality: str) -> int:
+    return int(quality) if quality.isdigit() else 0
+
+
+def choose_quality(
+    available: list[str], throughput: float | None, ceiling: str
+) -> str | None:
+    """Picks the best quality up to `ceiling` that `throughput` sustains with headroom.
+
+    Without a throughput estimate the ceiling is kept, and when nothing fits
+    the lowest quality is used.
+    """
+    qualities = sorted(set(available), key=_quality_key)
+    if not qualities:
+        return None
+    allowed = [q for q in qualities if _quality_key(q) <= _quality_key(ceiling)]
+    if throughput is None:
+        return ceiling if ceiling in qualities else (allowed or qualities)[-1]
+    fitting = [
+        quality
+        for quality in allowed
+        if QUALITY_BITRATES.get(quality, 0) * HEADROOM <= throughput
+    ]
+    return fitting[-1] if fitting else qualities[0]
+
+
+__all__ = ["BandwidthEstimator", "choose_quality"]
@@ -0,0 +1,104 @@
+"""
+Saving viu's config file without rewriting it on every settings change.
+
+A change only schedules a write. Changes made within `WRITE_DELAY` of each
+other are saved together by a background thread, but never later than
+`MAX_WRITE_DELAY` after the first one, so dragging a slider writes a few
+times rather than once per step. The config is rendered to toml when the
+write is due and the file is only replaced when the text differs from what
+was last written, atomically as before.
+"""
+
+import logging
+import threading
+import time
+from pathlib import Path
+from typing import Callable
+
+logger = logging.getLogger(__name__)
+
+# how long after the last change the config is written
+WRITE_DELAY = 0.5
+# and how long a stream of changes can put a write off at most
+MAX_WRITE_DELAY = 3.0
+
+
+class ConfigWriter:
+    """Writes the text `render` returns to `path`, see the module docstring."""
+
+    def __init__(
+        self,
+        path: Path,
+        render: Callable[[], str],
+        delay: float = WRITE_DELAY,
+        max_delay: float = MAX_WRITE_DELAY,
+    ):
+        self.path = path
+        self.render = render
+        self.delay = delay
+        self.max_delay = max_delay
+        self.writes = 0
+        self.skipped = 0
+        try:
+            self._written: str | None = path.read_text(encoding="utf-8")
+        except OSError:
+            self._written = None
+        self._first_change: float | None = None
+        self._due: float | None = None
+        self._condition = threading.Condition()
+        self._write_lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+
+    def schedule(self):
+        """Saves the config shortly, together with whatever else changes meanwhile."""
+        now = time.monotonic()
+        with self._condition:
+            if self._first_change is None:
+                self._first_change = now
+            self._due = min(now + self.delay, self._first_change + self.max_delay)
+            if not self._thread:
+                self._thread = threading.Thread(
+                    target=self._run, name="config-writer", daemon=True
+                )
+                self._thread.start()
+            self._condition.notify()
+
+    def flush(self):
+        """Writes a pending change now, on the calling thread."""
+        with self._condition:
+            pending = self._due is not None
+            self._due = self._first_change = None
+        if pending:
+            self._write()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while self._due is None:
+                    self._condition.wait()
+                remaining = self._due - time.monotonic()
+                if remaining > 0:
+                    self._condition.wait(remaining)
+                    continue
+                self._due = self._first_change = None
+            self._write()
+
+    def _write(self):
+        from viu_media.core.utils.file import AtomicWriter
+
+        with self._write_lock:
+            try:
+                content = self.render()
+                if content == self._written:
+                    self.skipped += 1
+                    return
+                with AtomicWriter(self.path, mode="w", encoding="utf-8") as f:
+                    f.write(content)
+            except Exception as e:
+                logger.error(f"Failed to save the config to {self.path}: {e}")
+                return
+            self._written = content
+            self.writes += 1
+
+
+__all__ = ["ConfigWriter"]
@@ -0,0 +1,145 @@
+"""
+Disk space accounting for downloads.
+
+The segmented downloader hands over the size it resolved (the content range of
+a progressive file, or the advertised bandwidth times the duration of an hls
+playlist) before it writes anything, and that size is checked against the free
+space of the downloads directory minus what the downloads already running
+still need. A task that cannot fit next to them waits until space frees up,
+one that cannot fit on the disk at all is refused, so downloads no longer fail
+late after most of the file has been transferred. Downloads by viu's own
+downloaders are accounted for from their first progress report instead.
+"""
+
+import logging
+import shutil
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable
+
+logger = logging.getLogger(__name__)
+
+# how often a waiting task rechecks the disk, space may be freed by other apps
+RECHECK_INTERVAL = 30.0
+
+
+class InsufficientSpaceError(Exception):
+    """Raised when a download cannot fit on the disk."""
+
+
+def free_space(path: Path) -> int:
+    """Returns the free bytes on the filesystem holding `path`, which may not exist yet."""
+    path = Path(path)
+    while not path.exists() and path != path.parent:
+        path = path.parent
+    return shutil.disk_usage(path).free
+
+
+@dataclass
+class _Reservation:
+    size: int
+    written: int = 0
+
+    @property
+    def remaining(self) -> int:
+        return max(0, self.size - self.written)
+
+
+class DiskSpaceGuard:
+    """Reserves space for running downloads so they never overcommit the disk."""
+
+    def __init__(self, min_free_space: int = 0):
+        self.min_free_space = min_free_space
+        """bytes that must stay free once every running download is done"""
+        self._reservations: dict[str, _Reservation] = {}
+        self._condition = threading.Condition()
+
+    @property
+    def reserved(self) -> int:
+        """Bytes the running downloads still have to write."""
+        with self._condition:
+            return sum(
+                reservation.remaining for reservation in self._reservations.values()
+            )
+
+    def acquire(
+        self,
+        task_id: str,
+        directory: Path,
+        size: int | None,
+        headroom: int = 0,
+        on_queued: Callable[[int, int], None] | None = None,
+    ) -> bool:
+        """Blocks until `size` bytes (plus `headroom` for post processing) fit.
+
+        `on_queued` is called with the needed and the available bytes if the
+        task has to wait for other downloads. Raises InsufficientSpaceError if
+        the task can never fit. An unknown size is let through unchecked.
+        Returns whether the task had to wait.
+        """
+        if not size:
+            return False
+        from kivy.utils import format_bytes_to_human
+
+        needed = size + headroom + self.min_free_space
+        queued = False
+        while True:
+            with self._condition:
+                free = free_space(directory)
+                available = free - sum(
+                    reservation.remaining for reservation in self._reservations.values()
+                )
+                if needed <= available:
+                    # the headroom stays reserved once the download is written
+                    self._reservations[task_id] = _Reservation(size + headroom)
+                    return queued
+                if needed > free:
+                    # even if every other download failed there would be no room
+                    raise InsufficientSpaceError(
+                        f"needs {format_bytes_to_human(needed)} but only "
+                        f"{format_bytes_to_human(free)} is free"
+                    )
+                if queued or not on_queued:
+                    queued = True
+                    self._condition.wait(RECHECK_INTERVAL)
+                    continue
+            # outside the lock, the callback may ask for `reserved`
+            queued = True
+            on_queued(needed, available)
+
+    def update(self, task_id: str, data: dict):
+        """Accounts for the bytes a download has written, from its progress dict.
+
+        A download that reserved nothing up front, because its downloader could
+        not tell its size before starting, is reserved from the first report
+        that carries a total; it is running already, so it neither waits nor is
+        refused.
+        """
+        with self._condition:
+            reservation = self._reservations.get(task_id)
+            if not reservation:
+                total = data.get("total_bytes") or data.get("total_bytes_estimate")
+                # a finished or failed download has nothing left to write
+                if data.get("status") != "downloading" or not total:
+                    return
+                reservation = self._reservations[task_id] = _Reservation(total)
+            reservation.written = max(
+                data.get("downloaded_bytes") or 0,
+                data.get("preallocated_bytes") or 0,
+            )
+            # a waiting task rechecks against the disk, whose free space has
+            # shrunk by what this one wrote
+            self._condition.notify_all()
+
+    def release(self, task_id: str):
+        with self._condition:
+            if self._reservations.pop(task_id, None):
+                self._condition.notify_all()
+
+
+__all__ = [
+    "DiskSpaceGuard",
+    "InsufficientSpaceError",
+    "free_space",
+]
@@ -0,0 +1,429 @@
+"""
+A stand-in for viu's services that misbehaves on purpose.
+
+The fake media api and anime provider answer from a recording (see
+`inazuma.core.replay`), the fake downloader writes throttled filler bytes and
+the fake player pretends to play; each of them goes through a
+`FaultInjector` first, which adds latency drawn from a distribution, fails a
+share of the calls the way the network does and answers with 429s once a
+rate limit is exceeded. Stream links are pointed at a local server that
+sends bytes as slowly and unreliably as configured, which exercises the
+stream proxy, its read-ahead and the download queue without a network.
+
+The backend is described by a json profile, every key but ``recording`` is
+optional:
+
+    {
+        "recording": "benchmarks/fixtures/recording.json",
+        "seed": 1,
+        "media_api": {"latency": "lognormal:0.4,0.6", "error_rate": 0.05,
+                      "rate_limit": 90},
+        "anime_provider": {"latency": "uniform:0.5,2", "error_rate": 0.1},
+        "downloader": {"latency": "0.5", "error_rate": 0.2,
+                       "bytes_per_second": 2000000, "size": 50000000},
+        "player": {"latency": "const:1", "error_rate": 0},
+        "streams": {"bytes_per_second": 1500000, "error_rate": 0.02,
+                    "size": 200000000}
+    }
+
+Latencies are in seconds: a number, ``const:s``, ``uniform:low,high``,
+``normal:mean,sd``, ``lognormal:median,sigma``, ``exp:mean`` or a scripted
+``seq:a,b,c`` that is cycled through.
+"""
+
+import hashlib
+import http.server
+import itertools
+import json
+import logging
+import math
+import random
+import subprocess
+import sys
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import TYPE_CHECKING, Callable
+
+import httpx
+from viu_media.core.downloader.base import BaseDownloader
+from viu_media.core.downloader.model import DownloadResult
+from viu_media.libs.player.base import BasePlayer
+from viu_media.libs.player.types import PlayerResult
+
+from .replay import Recording, ReplayAnimeProvider, ReplayApiClient
+
+if TYPE_CHECKING:
+    from viu_media.core.config import AppConfig, DownloadsConfig, StreamConfig
+    from viu_media.core.downloader.params import DownloadParams
+    from viu_media.libs.player.params import PlayerParams
+
+logger = logging.getLogger(__name__)
+
+STREAM_CHUNK_SIZE = 64 * 1024
+RATE_LIMIT_WINDOW = 60.0
+
+
+def parse_latency(spec: str | float, rng: random.Random) -> Callable[[], float]:
+    """Turns a latency spec like ``uniform:0.1,0.5`` into a sampler of seconds."""
+    kind, _, args = str(spec).partition(":")
+    if not args:
+        kind, args = "const", kind
+    values = [float(value) for value in args.split(",") if value.strip()]
+    match kind, values:
+        case "const", [seconds]:
+            return lambda: seconds
+        case "uniform", [low, high]:
+            return lambda: rng.uniform(low, high)
+        case "normal", [mean, sd]:
+            return lambda: max(0.0, rng.gauss(mean, sd))
+        case "lognormal", [median, sigma]:
+            return lambda: rng.lognormvariate(math.log(median), sigma)
+        case "exp", [mean]:
+            return lambda: rng.expovariate(1 / mean) if mean > 0 else 0.0
+        case "seq", [_, *_]:
+            sequence = itertools.cycle(values)
+            return lambda: next(sequence)
+    raise ValueError(f"Invalid latency: {spec}")
+
+
+class FaultInjector:
+    """Delays, fails and rate limits the calls of one fake service."""
+
+    def __init__(
+        self,
+        name: str,
+        rng: random.Random,
+        latency: str | float = 0,
+        error_rate: float = 0.0,
+        rate_limit: int = 0,
+        bytes_per_second: int = 0,
+        size: int = 100 * 1024 * 1024,
+    ):
+        self.name = name
+        self.rng = rng
+        self.latency = parse_latency(latency, rng)
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit
+        """calls allowed per minute, 0 for no limit"""
+        self.bytes_per_second = bytes_per_second
+        """how fast bytes are streamed, 0 for as fast as possible"""
+        self.size = size
+        """the size of the files the service streams"""
+        self._calls: deque[float] = deque()
+        self._lock = threading.Lock()
+
+    def before_call(self, operation: str, fail: bool = True):
+        """Waits out the latency, then raises like the network would, or not.
+
+        Streams pass `fail=False` and break off midway instead.
+        """
+        time.sleep(self.latency())
+        self._check_rate_limit(operation)
+        if fail and self.should_fail():
+            raise httpx.ConnectError(f"fake {self.name} failed {operation}")
+
+    def should_fail(self) -> bool:
+        return self.rng.random() < self.error_rate
+
+    def _check_rate_limit(self, operation: str):
+        if not self.rate_limit:
+            return
+        now = time.monotonic()
+        with self._lock:
+            while self._calls and now - self._calls[0] > RATE_LIMIT_WINDOW:
+                self._calls.popleft()
+            if len(self._calls) < self.rate_limit:
+                self._calls.append(now)
+                return
+            retry_after = math.ceil(RATE_LIMIT_WINDOW - (now - self._calls[0]))
+        request = httpx.Request("POST", f"https://{self.name}.fake/{operation}")
+        response = httpx.Response(
+            429, headers={"Retry-After": str(retry_after)}, request=request
+        )
+        raise httpx.HTTPStatusError(
+            f"fake {self.name} rate limited {operation}",
+            request=request,
+            response=response,
+        )
+
+    def throttle(self, sent: int, started: float):
+        """Sleeps until `sent` bytes since `started` match the configured rate."""
+        if self.bytes_per_second > 0:
+            delay = sent / self.bytes_per_second - (time.monotonic() - started)
+            if delay > 0:
+                time.sleep(delay)
+
+
+# ---------------media api and anime provider-------------------------
+class FakeApiClient(ReplayApiClient):
+    def __init__(self, recording: Recording, faults: FaultInjector):
+        super().__init__(recording)
+        self.faults = faults
+
+    def _replay(self, method: str, params=None):
+        self.faults.before_call(method)
+        return super()._replay(method, params)
+
+
+class FakeAnimeProvider(ReplayAnimeProvider):
+    def __init__(
+        self,
+        recording: Recording,
+        faults: FaultInjector,
+        stream_server: "SlowStreamServer | None" = None,
+    ):
+        super().__init__(recording)
+        self.faults = faults
+        self.stream_server = stream_server
+
+    def _replay(self, method: str, params):
+        self.faults.before_call(method)
+        return super()._replay(method, params)
+
+    def episode_streams(self, params):
+        servers = super().episode_streams(params)
+        if servers is None or not self.stream_server:
+            return servers
+        stream_server = self.stream_server
+        return iter(
+            [
+                server.model_copy(
+                    update={
+                        "links": [
+                            link.model_copy(
+                                update={"link": stream_server.url_for(link.link)}
+                            )
+                            for link in server.links
+                        ]
+                    }
+                )
+                for server in servers
+            ]
+        )
+
+
+# ---------------downloader and player-------------------------
+class FakeDownloader(BaseDownloader):
+    """Writes `faults.size` filler bytes per episode at the configured rate."""
+
+    def __init__(self, config: "DownloadsConfig", faults: FaultInjector):
+        super().__init__(config)
+        self.faults = faults
+
+    def download(self, params: "DownloadParams") -> DownloadResult:
+        from viu_media.core.utils.file import sanitize_filename
+
+        from .segmented_downloader import _ProgressReporter
+
+        dest_dir = self.config.downloads_dir / sanitize_filename(params.anime_title)
+        output_path = dest_dir / f"{sanitize_filename(params.episode_title)}.mp4"
+        size = self.faults.size
+        # a failing download breaks off somewhere in the middle
+        fail_at = self.faults.rng.randrange(size) if self.faults.should_fail() else -1
+        reporter = _ProgressReporter(params.progress_hooks, str(output_path), size)
+        try:
+            self.faults.before_call("download", fail=False)
+            dest_dir.mkdir(parents=True, exist_ok=True)
+            chunk = bytes(STREAM_CHUNK_SIZE)
+            with open(output_path, "wb") as f:
+                while reporter.downloaded_bytes < size:
+                    if 0 <= fail_at < reporter.downloaded_bytes:
+                        raise httpx.ReadError("fake downloader lost the connection")
+                    part = chunk[: size - reporter.downloaded_bytes]
+                    f.write(part)
+                    reporter.advance(len(part))
+                    self.faults.throttle(reporter.downloaded_bytes, reporter.started_at)
+        except (httpx.HTTPError, OSError) as e:
+            logger.error(f"Download failed: {e}")
+            return DownloadResult(
+                success=False,
+                error_message=str(e),
+                anime_title=params.anime_title,
+                episode_title=params.episode_title,
+            )
+        reporter.report("finished")
+        return DownloadResult(
+            success=True,
+            video_path=output_path,
+            anime_title=params.anime_title,
+            episode_title=params.episode_title,
+        )
+
+
+class FakePlayer(BasePlayer):
+    """Plays for the drawn latency and reports having watched it all."""
+
+    def __init__(self, config: "StreamConfig", faults: FaultInjector):
+        super().__init__(config)
+        self.faults = faults
+
+    def play(self, params: "PlayerParams") -> PlayerResult:
+        self.faults.before_call("play")
+        return PlayerResult(
+            episode=params.episode, stop_time="00:24:00", total_time="00:24:00"
+        )
+
+    def play_with_ipc(self, params: "PlayerParams", socket_path: str):
+        self.faults.before_call("play_with_ipc")
+        return subprocess.Popen(
+            [sys.executable, "-c", "import time; time.sleep(24 * 60)"]
+        )
+
+
+# ---------------slow streams-------------------------
+class SlowStreamServer:
+    """Serves filler bytes on localhost, throttled and failing per its injector.
+
+    The bytes are not a playable video; they are meant for the stream proxy,
+    read-ahead and downloads, which only care about how they arrive.
+    """
+
+    def __init__(self, faults: FaultInjector):
+        self.faults = faults
+        self._server: http.server.ThreadingHTTPServer | None = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._server:
+                return
+            self._server = http.server.ThreadingHTTPServer(
+                ("127.0.0.1", 0), _make_stream_handler(self.faults)
+            )
+            self._server.daemon_threads = True
+            threading.Thread(
+                target=self._server.serve_forever, daemon=True, name="slow-streams"
+            ).start()
+
+    def stop(self):
+        with self._lock:
+            if self._server:
+                self._server.shutdown()
+                self._server.server_close()
+                self._server = None
+
+    def url_for(self, url: str) -> str:
+        self.start()
+        assert self._server
+        digest = hashlib.sha1(url.encode()).hexdigest()[:12]
+        return f"http://127.0.0.1:{self._server.server_address[1]}/{digest}.mp4"
+
+
+def _make_stream_handler(faults: FaultInjector):
+    class Handler(http.server.BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            logger.debug(format % args)
+
+        def do_GET(self):
+            try:
+                faults.before_call(self.path, fail=False)
+            except httpx.HTTPStatusError as e:
+                self._fail(429, e.response.headers["Retry-After"])
+                return
+            # half of the failures are refused requests, the others break off
+            failing = faults.should_fail()
+            if failing and faults.rng.random() < 0.5:
+                self._fail(503)
+                return
+            start, end = 0, faults.size - 1
+            if header := self.headers.get("Range", ""):
+                first, _, last = header.removeprefix("bytes=").partition("-")
+                start = int(first or 0)
+                end = min(int(last), end) if last else end
+                if start > end:
+                    self.send_response(416)
+                    self.send_header("Content-Range", f"bytes */{faults.size}")
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                self.send_response(206)
+                self.send_header("Content-Range", f"bytes {start}-{end}/{faults.size}")
+            else:
+                self.send_response(200)
+            length = end - start + 1
+            self.send_header("Content-Type", "video/mp4")
+            self.send_header("Accept-Ranges", "bytes")
+            self.send_header("Content-Length", str(length))
+            self.end_headers()
+            self._send_body(length, failing)
+
+        def _send_body(self, length: int, failing: bool):
+            fail_at = faults.rng.randrange(length) if failing else -1
+            chunk = bytes(STREAM_CHUNK_SIZE)
+            sent, started = 0, time.monotonic()
+            try:
+                while sent < length:
+                    if 0 <= fail_at < sent:
+                        self.close_connection = True
+                        return
+                    part = chunk[: length - sent]
+                    self.wfile.write(part)
+                    sent += len(part)
+                    faults.throttle(sent, started)
+            except (BrokenPipeError, ConnectionResetError):
+                self.close_connection = True
+
+        def _fail(self, status: int, retry_after: str | None = None):
+            self.send_response(status)
+            if retry_after:
+                self.send_header("Retry-After", retry_after)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+    return Handler
+
+
+class FakeBackend:
+    """Creates the fake services of a profile, see the module docstring."""
+
+    def __init__(self, profile: dict, base_dir: Path | None = None):
+        if "recording" not in profile:
+            raise ValueError("A fake backend profile needs a recording")
+        recording_path = Path(profile["recording"])
+        if base_dir and not recording_path.is_absolute():
+            recording_path = base_dir / recording_path
+        self.recording = Recording.load(recording_path)
+        self.profile = profile
+        self.rng = random.Random(profile.get("seed"))
+        self.stream_server = SlowStreamServer(self.injector("streams"))
+
+    @classmethod
+    def load(cls, path: Path) -> "FakeBackend":
+        profile = json.loads(Path(path).read_text(encoding="utf-8"))
+        return cls(profile, Path(path).parent)
+
+    def injector(self, service: str) -> FaultInjector:
+        return FaultInjector(service, self.rng, **self.profile.get(service, {}))
+
+    def media_api(self) -> FakeApiClient:
+        return FakeApiClient(self.recording, self.injector("media_api"))
+
+    def anime_provider(self) -> FakeAnimeProvider:
+        return FakeAnimeProvider(
+            self.recording, self.injector("anime_provider"), self.stream_server
+        )
+
+    def downloader(self, config: "AppConfig") -> FakeDownloader:
+        return FakeDownloader(config.downloads, self.injector("downloader"))
+
+    def player(self, config: "AppConfig") -> FakePlayer:
+        return FakePlayer(config.stream, self.injector("player"))
+
+    def stop(self):
+        self.stream_server.stop()
+
+
+__all__ = [
+    "FakeAnimeProvider",
+    "FakeApiClient",
+    "FakeBackend",
+    "FakeDownloader",
+    "FakePlayer",
+    "FaultInjector",
+    "SlowStreamServer",
+    "parse_latency",
+]
@@ -0,0 +1,266 @@
+"""
+One pool of http connections shared by the services Viu hands out.
+
+The media api, the anime provider, the downloader and the stream proxy each
+get their own ``httpx.Client`` (their headers and timeouts differ) but all
+of them send through the same transport, so a connection opened by one is
+kept alive and reused by the others instead of every service repeating the
+TCP and TLS handshakes to the same hosts. HTTP/2 is spoken when the h2
+package is installed.
+
+On top of httpx's pool the transport caps the requests in flight per host,
+and resolves each host once per `DNS_TTL` instead of once per connection.
+The clients of the downloader and the stream proxy are not capped: their
+parallel range requests are sized by the connections and read-ahead
+settings, and a cap below those would only make them time out.
+It counts the requests, new connections, TLS handshakes and DNS lookups per
+host, which is what the reuse ratio shown in the debug panel comes from.
+"""
+
+import importlib.util
+import socket
+import threading
+import time
+from collections import defaultdict
+from dataclasses import asdict, dataclass
+
+import httpcore
+import httpx
+
+MAX_CONNECTIONS = 100
+# requests in flight to one host, for the clients that are capped
+MAX_CONNECTIONS_PER_HOST = 16
+KEEPALIVE_EXPIRY = 60.0
+# how long a resolved address is used before the host is looked up again
+DNS_TTL = 5 * 60
+# connection attempts on connect errors, like viu's downloader does
+CONNECT_RETRIES = 3
+PRECONNECT_TIMEOUT = 10.0
+
+
+@dataclass
+class HostStats:
+    requests: int = 0
+    connections: int = 0
+    tls_handshakes: int = 0
+    dns_lookups: int = 0
+
+
+class _Counters:
+    def __init__(self):
+        self.hosts: dict[str, HostStats] = defaultdict(HostStats)
+        self.lock = threading.Lock()
+
+    def add(self, host: str, name: str):
+        with self.lock:
+            stats = self.hosts[host]
+            setattr(stats, name, getattr(stats, name) + 1)
+
+
+# ---------------network backend-------------------------
+class _CountingStream(httpcore.NetworkStream):
+    def __init__(self, stream: httpcore.NetworkStream, host: str, counters: _Counters):
+        self._stream = stream
+        self._host = host
+        self._counters = counters
+
+    def read(self, max_bytes: int, timeout: float | None = None) -> bytes:
+        return self._stream.read(max_bytes, timeout)
+
+    def write(self, buffer: bytes, timeout: float | None = None) -> None:
+        self._stream.write(buffer, timeout)
+
+    def close(self) -> None:
+        self._stream.close()
+
+    def start_tls(self, ssl_context, server_hostname=None, timeout=None):
+        self._counters.add(self._host, "tls_handshakes")
+        stream = self._stream.start_tls(ssl_context, server_hostname, timeout)
+        return _CountingStream(stream, self._host, self._counters)
+
+    def get_extra_info(self, info: str):
+        return self._stream.get_extra_info(info)
+
+
+class _CachingBackend(httpcore.SyncBackend):
+    """Connects to cached addresses and counts the connections it makes."""
+
+    def __init__(self, counters: _Counters):
+        self._counters = counters
+        self._addresses: dict[tuple[str, int], tuple[float, list[str]]] = {}
+        self._lock = threading.Lock()
+
+    def _resolve(self, host: str, port: int) -> list[str]:
+        with self._lock:
+            cached = self._addresses.get((host, port))
+        if cached and time.monotonic() - cached[0] < DNS_TTL:
+            return cached[1]
+        self._counters.add(host, "dns_lookups")
+        infos = socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+        addresses = list(dict.fromkeys(info[4][0] for info in infos))
+        with self._lock:
+            self._addresses[(host, port)] = (time.monotonic(), addresses)
+        return addresses
+
+    def connect_tcp(
+        self, host, port, timeout=None, local_address=None, socket_options=None
+    ):
+        try:
+            addresses = self._resolve(host, port)
+        except OSError as e:
+            raise httpcore.ConnectError(e) from e
+        error: Exception | None = None
+        for address in addresses:
+            try:
+                stream = super().connect_tcp(
+                    address, port, timeout, local_address, socket_options
+                )
+            except httpcore.ConnectError as e:
+                error = e
+                continue
+            self._counters.add(host, "connections")
+            return _CountingStream(stream, host, self._counters)
+        # the host may have moved, look it up again next time
+        with self._lock:
+            self._addresses.pop((host, port), None)
+        raise error or httpcore.ConnectError(f"No address for {host}")
+
+
+# ---------------transport-------------------------
+class _ReleasingStream(httpx.SyncByteStream):
+    """A response body that gives its host slot back once it is closed."""
+
+    def __init__(self, stream: httpx.SyncByteStream, release):
+        self._stream = stream
+        self._release = release
+
+    def __iter__(self):
+        yield from self._stream
+
+    def close(self):
+        try:
+            self._stream.close()
+        finally:
+            self._release()
+
+
+class PooledTransport(httpx.HTTPTransport):
+    """httpx's transport over the shared pool, with a cap per host unless None."""
+
+    def __init__(
+        self,
+        counters: _Counters,
+        http2: bool,
+        per_host: int | None,
+        pool: httpcore.ConnectionPool | None = None,
+    ):
+        limits = httpx.Limits(
+            max_connections=MAX_CONNECTIONS,
+            max_keepalive_connections=MAX_CONNECTIONS,
+            keepalive_expiry=KEEPALIVE_EXPIRY,
+        )
+        super().__init__(limits=limits, http2=http2, retries=CONNECT_RETRIES)
+        # httpx takes no network backend, so its pool is rebuilt around ours
+        replaced = self._pool
+        self._pool = pool or httpcore.ConnectionPool(
+            ssl_context=replaced._ssl_context,
+            max_connections=limits.max_connections,
+            max_keepalive_connections=limits.max_keepalive_connections,
+            keepalive_expiry=limits.keepalive_expiry,
+            http2=http2,
+            retries=CONNECT_RETRIES,
+            network_backend=_CachingBackend(counters),
+        )
+        replaced.close()
+        self._counters = counters
+        self._per_host = per_host
+        self._slots: dict[str, threading.BoundedSemaphore] = {}
+        self._lock = threading.Lock()
+
+    def _slot(self, host: str) -> threading.BoundedSemaphore:
+        with self._lock:
+            if host not in self._slots:
+                self._slots[host] = threading.BoundedSemaphore(self._per_host)
+            return self._slots[host]
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        host = request.url.host
+        if self._per_host is None:
+            self._counters.add(host, "requests")
+            return super().handle_request(request)
+        slot = self._slot(host)
+        timeout = request.extensions.get("timeout", {}).get("pool")
+        if not slot.acquire(timeout=timeout):
+            raise httpx.PoolTimeout(f"Too many requests to {host}", request=request)
+        self._counters.add(host, "requests")
+        released = threading.Event()
+
+        def _release():
+            if not released.is_set():
+                released.set()
+                slot.release()
+
+        try:
+            response = super().handle_request(request)
+        except BaseException:
+            _release()
+            raise
+        response.stream = _ReleasingStream(response.stream, _release)  # type: ignore
+        return response
+
+    def close(self):
+        # a service closing its client must not close the pool under the others
+        pass
+
+    def shutdown(self):
+        super().close()
+
+
+class HttpPool:
+    """Hands out clients sharing one pooled transport, see the module docstring."""
+
+    def __init__(self, per_host: int = MAX_CONNECTIONS_PER_HOST):
+        self.http2 = importlib.util.find_spec("h2") is not None
+        self._counters = _Counters()
+        self.transport = PooledTransport(self._counters, self.http2, per_host)
+        self._uncapped = PooledTransport(
+            self._counters, self.http2, None, pool=self.transport._pool
+        )
+
+    def client(self, capped: bool = True, **kwargs) -> httpx.Client:
+        """A client over the pool; `kwargs` are those of ``httpx.Client``.
+
+        Clients that are not `capped` skip the limit of requests per host.
+        """
+        transport = self.transport if capped else self._uncapped
+        return httpx.Client(transport=transport, **kwargs)
+
+    def preconnect(self, url: str, timeout: float = PRECONNECT_TIMEOUT):
+        """Opens a connection to the host of `url`, kept alive for what comes next."""
+        # closing the client leaves the connection in the shared pool
+        with self.client(timeout=timeout) as client:
+            client.head(url)
+
+    def close(self):
+        self.transport.shutdown()
+
+    def snapshot(self) -> dict:
+        """The counts per host, and the share of requests that reused a connection."""
+        with self._counters.lock:
+            hosts = {
+                host: asdict(stats) for host, stats in self._counters.hosts.items()
+            }
+        requests = sum(stats["requests"] for stats in hosts.values())
+        connections = sum(stats["connections"] for stats in hosts.values())
+        return {
+            "http2": self.http2,
+            "requests": requests,
+            "connections": connections,
+            "tls_handshakes": sum(stats["tls_handshakes"] for stats in hosts.values()),
+            "dns_lookups": sum(stats["dns_lookups"] for stats in hosts.values()),
+            "reuse_ratio": round(1 - connections / requests, 3) if requests else 0.0,
+            "hosts": hosts,
+        }
+
+
+__all__ = ["HostStats", "HttpPool"]
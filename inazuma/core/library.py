@@ -0,0 +1,269 @@
+"""
+An index of the episodes that already exist in the downloads directory.
+
+The directory is scanned once on start up and then kept current from
+filesystem change notifications (via watchdog), so the index never has to
+rescan the whole tree. Downloaded files are laid out by viu as
+``<downloads_dir>/<anime title>/<anime title>; Episode <n>.<ext>``; the only
+thing that cannot be recovered from that layout is the media id, so the
+title directory -> media id mapping is persisted alongside the app data.
+Directories it does not know yet, like those of episodes downloaded with the
+viu cli or before the manifest existed, are looked up in the titles that
+`known_titles` returns, which Viu takes from viu's media registry.
+
+viu's downloaders write some files under their final name, so a file that
+appears or grows is only added once it has not changed for `SETTLE_DELAY`
+seconds, or once its writer closed it; a file renamed into place is final.
+"""
+
+import json
+import logging
+import re
+import threading
+from pathlib import Path
+from typing import Callable
+
+logger = logging.getLogger(__name__)
+
+VIDEO_EXTENSIONS = {".mp4", ".mkv", ".ts", ".webm", ".avi", ".mov", ".m4v"}
+EPISODE_PATTERN = re.compile(r"Episode ([\w.]+)$")
+# how long a file has to stay unchanged before it counts as downloaded
+SETTLE_DELAY = 5.0
+
+# called with (media_id, episode, path) where path is None once the file is gone
+LibraryListener = Callable[[int, str, "Path | None"], None]
+
+
+def parse_episode(path: Path) -> str | None:
+    """Returns the episode number encoded in a downloaded file's name."""
+    if path.suffix.lower() not in VIDEO_EXTENSIONS:
+        return None
+    if match := EPISODE_PATTERN.search(path.stem):
+        return match.group(1)
+    return None
+
+
+class Library:
+    """Tracks which episodes of which media are available on disk."""
+
+    def __init__(
+        self,
+        downloads_dir: Path,
+        manifest_path: Path,
+        known_titles: Callable[[], dict[str, int]] | None = None,
+    ):
+        self.downloads_dir = downloads_dir
+        self.manifest_path = manifest_path
+        self.known_titles = known_titles
+        self._titles: dict[str, int] = {}
+        # title directories that were looked up without success
+        self._unknown: set[str] = set()
+        self._settling: dict[Path, threading.Timer] = {}
+        self._episodes: dict[int, dict[str, Path]] = {}
+        self._paths: dict[Path, tuple[int, str]] = {}
+        self._listeners: list[LibraryListener] = []
+        self._lock = threading.RLock()
+        self._observer = None
+        self._load_manifest()
+
+    # ---------------queries-------------------------
+    def get(self, media_id: int, episode: str) -> Path | None:
+        with self._lock:
+            return self._episodes.get(media_id, {}).get(str(episode))
+
+    def has(self, media_id: int, episode: str) -> bool:
+        return self.get(media_id, episode) is not None
+
+    def episodes(self, media_id: int) -> set[str]:
+        with self._lock:
+            return set(self._episodes.get(media_id, {}))
+
+    # ---------------listeners-------------------------
+    @property
+    def listeners(self) -> list[LibraryListener]:
+        return list(self._listeners)
+
+    def add_listener(self, listener: LibraryListener):
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener: LibraryListener):
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def _notify(self, media_id: int, episode: str, path: Path | None):
+        for listener in list(self._listeners):
+            try:
+                listener(media_id, episode, path)
+            except Exception as e:
+                logger.warning(f"Library listener failed: {e}")
+
+    # ---------------lifecycle-------------------------
+    def start(self):
+        """Scans the downloads directory and starts watching it in the background."""
+        threading.Thread(target=self._start, daemon=True, name="library").start()
+
+    def _start(self):
+        self.scan()
+        self._watch()
+
+    def stop(self):
+        if self._observer:
+            self._observer.stop()
+            self._observer = None
+        with self._lock:
+            timers, self._settling = list(self._settling.values()), {}
+        for timer in timers:
+            timer.cancel()
+
+    def scan(self):
+        if not self.downloads_dir.exists():
+            return
+        with self._lock:
+            self._unknown.clear()
+        for title_dir in self.downloads_dir.iterdir():
+            if title_dir.is_dir() and self._media_id(title_dir.name) is not None:
+                for path in title_dir.iterdir():
+                    self._add_path(path)
+
+    def _watch(self):
+        try:
+            from watchdog.observers import Observer
+        except ImportError:
+            logger.warning(
+                "watchdog is not installed, the library only tracks downloads made in this session"
+            )
+            return
+        self.downloads_dir.mkdir(parents=True, exist_ok=True)
+        observer = Observer()
+        observer.schedule(
+            _LibraryEventHandler(self), str(self.downloads_dir), recursive=True
+        )
+        observer.daemon = True
+        observer.start()
+        self._observer = observer
+
+    # ---------------updates-------------------------
+    def add(self, media_id: int, episode: str, path: Path):
+        """Records a finished download, remembering which media its directory holds."""
+        path = Path(path)
+        with self._lock:
+            title_dir = path.parent.name
+            self._unknown.discard(title_dir)
+            if self._titles.get(title_dir) != media_id:
+                self._titles[title_dir] = media_id
+                self._save_manifest()
+        self._set(media_id, str(episode), path)
+
+    def _add_path(self, path: Path):
+        if not path.is_file() or (episode := parse_episode(path)) is None:
+            return
+        if (media_id := self._media_id(path.parent.name)) is not None:
+            self._set(media_id, episode, path)
+
+    def _add_when_settled(self, path: Path):
+        """Adds `path` once it has not been written to for `SETTLE_DELAY`."""
+        if parse_episode(path) is None:
+            return
+        timer = threading.Timer(SETTLE_DELAY, self._on_settled, args=(path,))
+        timer.daemon = True
+        with self._lock:
+            if previous := self._settling.get(path):
+                previous.cancel()
+            self._settling[path] = timer
+        timer.start()
+
+    def _on_settled(self, path: Path):
+        with self._lock:
+            if self._settling.get(path) is not threading.current_thread():
+                return
+            del self._settling[path]
+        self._add_path(path)
+
+    def _add_final(self, path: Path):
+        with self._lock:
+            if timer := self._settling.pop(path, None):
+                timer.cancel()
+        self._add_path(path)
+
+    def _media_id(self, title: str) -> int | None:
+        with self._lock:
+            if (media_id := self._titles.get(title)) is not None:
+                return media_id
+            if title in self._unknown or not self.known_titles:
+                return None
+        try:
+            known = self.known_titles()
+        except Exception as e:
+            logger.warning(f"Could not look up the titles of the library: {e}")
+            known = {}
+        with self._lock:
+            learned = {t: id for t, id in known.items() if t not in self._titles}
+            self._titles.update(learned)
+            if title not in self._titles:
+                # looked up again on the next scan, not on every file in it
+                self._unknown.add(title)
+            if learned:
+                self._save_manifest()
+            return self._titles.get(title)
+
+    def _set(self, media_id: int, episode: str, path: Path):
+        with self._lock:
+            if self._episodes.get(media_id, {}).get(episode) == path:
+                return
+            self._episodes.setdefault(media_id, {})[episode] = path
+            self._paths[path] = (media_id, episode)
+        self._notify(media_id, episode, path)
+
+    def _remove_path(self, path: Path):
+        with self._lock:
+            # a removed directory takes every episode below it along
+            removed = [
+                known for known in self._paths if known == path or path in known.parents
+            ]
+            keys = [self._paths.pop(known) for known in removed]
+            for media_id, episode in keys:
+                self._episodes.get(media_id, {}).pop(episode, None)
+        for media_id, episode in keys:
+            self._notify(media_id, episode, None)
+
+    # ---------------persistence-------------------------
+    def _load_manifest(self):
+        try:
+            data = json.loads(self.manifest_path.read_text(encoding="utf-8"))
+            self._titles = {title: int(id) for title, id in data["titles"].items()}
+        except FileNotFoundError:
+            pass
+        except (ValueError, KeyError) as e:
+            logger.warning(f"Ignoring corrupt library manifest: {e}")
+
+    def _save_manifest(self):
+        from viu_media.core.utils.file import AtomicWriter
+
+        self.manifest_path.parent.mkdir(parents=True, exist_ok=True)
+        with AtomicWriter(self.manifest_path, mode="w", encoding="utf-8") as f:
+            json.dump({"titles": self._titles}, f)
+
+
+class _LibraryEventHandler:
+    """Translates watchdog events into library updates."""
+
+    def __init__(self, library: Library):
+        self.library = library
+
+    def dispatch(self, event):
+        src_path = Path(event.src_path)
+        match event.event_type:
+            case "created" | "modified":
+                # possibly still being written under its final name
+                self.library._add_when_settled(src_path)
+            case "closed":
+                self.library._add_final(src_path)
+            case "deleted":
+                self.library._remove_path(src_path)
+            case "moved":
+                # downloads land by renaming their .part file into place
+                self.library._remove_path(src_path)
+                self.library._add_final(Path(event.dest_path))
+
+
+__all__ = ["Library", "parse_episode"]
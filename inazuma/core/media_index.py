@@ -0,0 +1,212 @@
+"""
+A local full-text index of every anime the app has been sent.
+
+The models add the `MediaItem`s of every media api response to the index:
+the home carousels, searches, trending and the user's lists. Their titles,
+synonyms, genres and tags are split into trigrams, with two spaces before
+each word so that the start of a word is a trigram of its own and a query
+still being typed matches as a prefix. Looking a query up adds the weights
+of the fields each of its trigrams was found in, so a title match ranks
+above a tag match, and takes the items that have most of the trigrams;
+popularity breaks ties. That takes about a millisecond, which is what lets
+the search screen show local matches while the remote search is in flight.
+
+The index keeps the `MAX_ITEMS` most recently seen items and is saved as
+json in the cache directory, written in the background a while after the
+last change like the config is. It is loaded on first use, normally by the
+warmup.
+"""
+
+import json
+import logging
+import math
+import threading
+import unicodedata
+from collections import OrderedDict, defaultdict
+from pathlib import Path
+from typing import TYPE_CHECKING, Iterable
+
+from .config_writer import ConfigWriter
+
+if TYPE_CHECKING:
+    from viu_media.libs.media_api.types import MediaItem
+
+logger = logging.getLogger(__name__)
+
+MAX_ITEMS = 3000
+# how many matches a lookup returns at most
+LOOKUP_LIMIT = 30
+# the share of the query's trigrams an item needs to match
+MIN_MATCH = 0.6
+# how long after the last change the index is saved, and at most
+SAVE_DELAY = 5.0
+MAX_SAVE_DELAY = 30.0
+
+TITLE_WEIGHT = 3
+SYNONYM_WEIGHT = 2
+KEYWORD_WEIGHT = 1
+
+# per user and per episode, so stale by the time the index is loaded again
+NOT_SAVED = {"user_status", "streaming_episodes", "next_airing"}
+
+
+def normalize(text: str) -> str:
+    """`text` folded to lowercase without accents, its words separated by spaces."""
+    text = unicodedata.normalize("NFKD", text.casefold())
+    return "".join(
+        char if char.isalnum() else " "
+        for char in text
+        if not unicodedata.combining(char)
+    )
+
+
+def trigrams(text: str) -> set[str]:
+    grams = set()
+    for word in normalize(text).split():
+        padded = f"  {word}"
+        grams.update(padded[i : i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def _fields(item: "MediaItem") -> Iterable[tuple[str, int]]:
+    title = item.title
+    for text in (title.english, title.romaji, title.native):
+        if text:
+            yield text, TITLE_WEIGHT
+    for synonym in item.synonymns:
+        yield synonym, SYNONYM_WEIGHT
+    for genre in item.genres:
+        yield genre.value, KEYWORD_WEIGHT
+    for tag in item.tags:
+        yield tag.name.value, KEYWORD_WEIGHT
+
+
+class MediaIndex:
+    """The media items seen so far, searchable by text, see the module docstring."""
+
+    def __init__(self, path: Path, max_items: int = MAX_ITEMS):
+        self.path = path
+        self.max_items = max_items
+        # least recently seen first
+        self._items: OrderedDict[int, "MediaItem"] = OrderedDict()
+        # trigram -> item id -> the weight of the best field it is in
+        self._postings: dict[str, dict[int, int]] = defaultdict(dict)
+        self._grams: dict[int, dict[str, int]] = {}
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._load_lock = threading.Lock()
+        self._writer = ConfigWriter(
+            path, self._render, delay=SAVE_DELAY, max_delay=MAX_SAVE_DELAY
+        )
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def add(self, items: Iterable["MediaItem"]):
+        """Indexes `items`, replacing what was known about them before."""
+        with self._lock:
+            for item in items:
+                self._insert(item)
+            self._evict()
+        self._writer.schedule()
+
+    def search(self, query: str, limit: int = LOOKUP_LIMIT) -> list["MediaItem"]:
+        """The best matches of `query`, best first."""
+        self.load()
+        grams = trigrams(query)
+        if not grams:
+            return []
+        needed = math.ceil(len(grams) * MIN_MATCH)
+        hits: dict[int, int] = defaultdict(int)
+        weights: dict[int, int] = defaultdict(int)
+        with self._lock:
+            for gram in grams:
+                for item_id, weight in self._postings.get(gram, {}).items():
+                    hits[item_id] += 1
+                    weights[item_id] += weight
+            matches = [
+                self._items[item_id]
+                for item_id, count in hits.items()
+                if count >= needed
+            ]
+        matches.sort(key=lambda item: (weights[item.id], item.popularity or 0))
+        return matches[::-1][:limit]
+
+    def load(self):
+        """Reads the saved index, once; the items added meanwhile are kept."""
+        with self._load_lock:
+            if self._loaded:
+                return
+            self._loaded = True
+            items = self._read()
+        with self._lock:
+            current = self._items
+            self._items = OrderedDict()
+            for item in items:
+                if item.id not in current:
+                    self._insert(item)
+            for item in current.values():
+                self._items[item.id] = item
+            self._evict()
+
+    def flush(self):
+        self._writer.flush()
+
+    def _insert(self, item: "MediaItem"):
+        self._remove(item.id)
+        grams: dict[str, int] = {}
+        for text, weight in _fields(item):
+            for gram in trigrams(text):
+                grams[gram] = max(weight, grams.get(gram, 0))
+        for gram, weight in grams.items():
+            self._postings[gram][item.id] = weight
+        self._grams[item.id] = grams
+        self._items[item.id] = item
+
+    def _remove(self, item_id: int):
+        self._items.pop(item_id, None)
+        for gram in self._grams.pop(item_id, {}):
+            postings = self._postings[gram]
+            postings.pop(item_id, None)
+            if not postings:
+                del self._postings[gram]
+
+    def _evict(self):
+        while len(self._items) > self.max_items:
+            self._remove(next(iter(self._items)))
+
+    # ---------------persistence-------------------------
+    def _read(self) -> list["MediaItem"]:
+        from pydantic import ValidationError
+        from viu_media.libs.media_api.types import MediaItem
+
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return []
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring corrupt media index: {e}")
+            return []
+        items = []
+        for entry in data if isinstance(data, list) else []:
+            try:
+                items.append(MediaItem.model_validate(entry))
+            except ValidationError:
+                # written by a viu_media whose MediaItem differed
+                continue
+        return items
+
+    def _render(self) -> str:
+        # items added before the saved ones were read must not replace them
+        self.load()
+        with self._lock:
+            items = list(self._items.values())
+        return json.dumps(
+            [
+                item.model_dump(mode="json", exclude=NOT_SAVED, exclude_none=True)
+                for item in items
+            ]
+        )
+
+
+__all__ = ["MediaIndex", "normalize", "trigrams"]
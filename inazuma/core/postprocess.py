@@ -0,0 +1,365 @@
+"""
+Post download processing.
+
+Finished downloads go through a configurable chain of steps (integrity check,
+remux, thumbnail extraction). Each step runs in a fresh interpreter that
+executes this file as a script, so the work never competes with the Kivy
+main thread for the GIL, and nothing is forked from the threaded gui process.
+Frozen builds have no interpreter for the script and spawn multiprocessing
+workers instead; on android, where no process can be started, the steps run on
+a thread and skip the pure python integrity checks.
+"""
+
+import json
+import logging
+import multiprocessing
+import os
+import shutil
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import (
+    Executor,
+    Future,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+)
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Callable, Literal
+
+logger = logging.getLogger(__name__)
+
+TS_PACKET_SIZE = 188
+TS_SYNC_BYTE = 0x47
+READ_SIZE = 1024 * 1024
+
+
+@dataclass(frozen=True)
+class StepResult:
+    name: str
+    status: Literal["done", "skipped", "failed"]
+    seconds: float
+    path: str
+    """the video file after the step ran, remuxing changes it"""
+    message: str = ""
+
+
+class SkipStep(Exception):
+    """Raised by a step that does not apply to a file."""
+
+
+# ---------------steps, these run inside the worker processes-------------------------
+def verify(path: Path) -> tuple[Path, str]:
+    """Checks that the container is structurally complete."""
+    if path.stat().st_size == 0:
+        raise ValueError("file is empty")
+    if ffprobe := shutil.which("ffprobe"):
+        process = subprocess.run(
+            [ffprobe, "-v", "error", "-show_entries", "format=duration", str(path)],
+            capture_output=True,
+            text=True,
+            check=False,
+        )
+        # ffprobe also reports recoverable glitches, only its exit status counts
+        if process.returncode != 0:
+            raise ValueError(process.stderr.strip() or "ffprobe could not read file")
+        return path, "probed"
+    match path.suffix.lower():
+        case ".ts":
+            _verify_ts(path)
+        case ".mp4" | ".m4v" | ".mov":
+            _verify_mp4(path)
+        case _:
+            raise SkipStep("no checker for this container")
+    return path, "structure ok"
+
+
+def _verify_ts(path: Path):
+    size = path.stat().st_size
+    if size % TS_PACKET_SIZE:
+        raise ValueError("truncated mpeg-ts packet")
+    with open(path, "rb") as f:
+        offset = 0
+        while data := f.read(READ_SIZE - READ_SIZE % TS_PACKET_SIZE):
+            for index, byte in enumerate(data[::TS_PACKET_SIZE]):
+                if byte != TS_SYNC_BYTE:
+                    position = offset + index * TS_PACKET_SIZE
+                    raise ValueError(f"lost mpeg-ts sync at byte {position}")
+            offset += len(data)
+
+
+def _verify_mp4(path: Path):
+    size = path.stat().st_size
+    boxes = set()
+    with open(path, "rb") as f:
+        offset = 0
+        while offset < size:
+            f.seek(offset)
+            header = f.read(16)
+            if len(header) < 8:
+                raise ValueError(f"truncated box header at byte {offset}")
+            box_size = int.from_bytes(header[:4], "big")
+            boxes.add(header[4:8])
+            if box_size == 1:
+                box_size = int.from_bytes(header[8:16], "big")
+            elif box_size == 0:
+                box_size = size - offset
+            if box_size < 8 or offset + box_size > size:
+                raise ValueError(f"box {header[4:8]!r} overruns the file")
+            offset += box_size
+    if b"moov" not in boxes:
+        raise ValueError("missing moov box")
+
+
+def remux(path: Path) -> tuple[Path, str]:
+    """Copies mpeg-ts streams into an mp4 container, which seeks far better."""
+    if path.suffix.lower() != ".ts":
+        raise SkipStep("already in a seekable container")
+    ffmpeg = shutil.which("ffmpeg")
+    if not ffmpeg:
+        raise SkipStep("ffmpeg not found")
+    output = path.with_suffix(".mp4")
+    temp_output = output.with_name(output.stem + ".remux.mp4")
+    subprocess.run(
+        [
+            ffmpeg,
+            "-hide_banner",
+            "-v",
+            "error",
+            "-y",
+            "-i",
+            str(path),
+            "-c",
+            "copy",
+            "-movflags",
+            "+faststart",
+            str(temp_output),
+        ],
+        check=True,
+        capture_output=True,
+    )
+    temp_output.replace(output)
+    path.unlink()
+    return output, "remuxed to mp4"
+
+
+def extract_thumbnail(path: Path) -> tuple[Path, str]:
+    ffmpeg = shutil.which("ffmpeg")
+    if not ffmpeg:
+        raise SkipStep("ffmpeg not found")
+    thumbnail = path.with_suffix(".jpg")
+    subprocess.run(
+        [
+            ffmpeg,
+            "-hide_banner",
+            "-v",
+            "error",
+            "-y",
+            "-i",
+            str(path),
+            # pick a representative frame rather than a black intro frame
+            "-vf",
+            "thumbnail,scale=320:-2",
+            "-frames:v",
+            "1",
+            str(thumbnail),
+        ],
+        check=True,
+        capture_output=True,
+    )
+    return path, thumbnail.name
+
+
+STEPS: dict[str, Callable[[Path], tuple[Path, str]]] = {
+    "verify": verify,
+    "remux": remux,
+    "thumbnail": extract_thumbnail,
+}
+
+
+def run_step(name: str, path: str) -> StepResult:
+    started_at = time.perf_counter()
+    try:
+        output, message = STEPS[name](Path(path))
+        return StepResult(
+            name, "done", time.perf_counter() - started_at, str(output), message
+        )
+    except SkipStep as e:
+        return StepResult(
+            name, "skipped", time.perf_counter() - started_at, path, str(e)
+        )
+    except subprocess.CalledProcessError as e:
+        message = (e.stderr or b"").decode(errors="replace").strip() or str(e)
+        return StepResult(
+            name, "failed", time.perf_counter() - started_at, path, message
+        )
+    except Exception as e:
+        return StepResult(
+            name, "failed", time.perf_counter() - started_at, path, str(e)
+        )
+
+
+def parse_steps(value: str) -> list[str]:
+    """Parses a comma separated step list, dropping unknown step names."""
+    steps = []
+    for name in value.split(","):
+        name = name.strip().lower()
+        if not name:
+            continue
+        if name not in STEPS:
+            logger.warning(f"Ignoring unknown post processing step: {name}")
+            continue
+        steps.append(name)
+    return steps
+
+
+def run_step_isolated(name: str, path: str) -> StepResult:
+    """Runs a step in a new interpreter executing this file, see `__main__` below."""
+    # multiprocessing's spawn and forkserver workers would import the app's main
+    # module, and with it kivy; as a script this file only imports the stdlib
+    started_at = time.perf_counter()
+    process = subprocess.run(
+        [sys.executable, "-I", __file__, name, path],
+        capture_output=True,
+        text=True,
+        check=False,
+    )
+    try:
+        return StepResult(**json.loads(process.stdout))
+    except (ValueError, TypeError):
+        message = process.stderr.strip().splitlines()[-1:] or ["worker failed"]
+        return StepResult(
+            name, "failed", time.perf_counter() - started_at, path, message[0]
+        )
+
+
+def run_step_in_thread(name: str, path: str) -> StepResult:
+    """Runs a step on a thread of the gui process, for where no process can be started."""
+    if name == "verify" and not shutil.which("ffprobe"):
+        # the pure python checkers would hold the GIL away from the gui for the
+        # whole file, ffprobe at least runs as a process of its own
+        return StepResult(name, "skipped", 0, path, "no ffprobe to verify with")
+    return run_step(name, path)
+
+
+def can_isolate() -> bool:
+    # frozen builds have no interpreter to run a script with, and android apps
+    # cannot start processes of their own
+    return bool(
+        sys.executable
+        and not getattr(sys, "frozen", False)
+        and "ANDROID_ARGUMENT" not in os.environ
+    )
+
+
+def can_spawn() -> bool:
+    # frozen desktop builds start multiprocessing workers through their own
+    # executable, whose entry point hands them over with freeze_support
+    return bool(getattr(sys, "frozen", False) and "ANDROID_ARGUMENT" not in os.environ)
+
+
+# ---------------scheduling, this runs in the gui process-------------------------
+class PostProcessor:
+    """Runs post processing chains with at most `max_workers` steps at a time."""
+
+    def __init__(self, max_workers: int = 1):
+        self.max_workers = max(1, max_workers)
+        self._executor: Executor | None = None
+        self._closed = False
+        self._lock = threading.Lock()
+
+    @property
+    def executor(self) -> Executor:
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("post processor is shut down")
+            if not self._executor:
+                self._executor = self._create_executor()
+            return self._executor
+
+    def _create_executor(self) -> Executor:
+        if can_spawn():
+            return ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        # each thread waits on the process running its step, or on android runs
+        # the step itself, whose heavy lifting is done by ffmpeg there anyway
+        return ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix="post-process"
+        )
+
+    @staticmethod
+    def _runner() -> Callable[[str, str], StepResult]:
+        if can_isolate():
+            return run_step_isolated
+        if can_spawn():
+            return run_step
+        return run_step_in_thread
+
+    def submit(
+        self,
+        path: Path,
+        steps: list[str],
+        on_step: Callable[[StepResult], None],
+        on_done: Callable[[Path, list[StepResult]], None],
+    ):
+        """Runs `steps` on `path` one after another.
+
+        `on_step` and `on_done` are called from a background thread. A failed
+        step ends the chain. Raises `RuntimeError` once the processor is shut down.
+        """
+        results: list[StepResult] = []
+        remaining = list(steps)
+        run = self._runner()
+        executor = self.executor
+
+        def _next(current_path: str):
+            if not remaining:
+                on_done(Path(current_path), results)
+                return
+            name = remaining.pop(0)
+            try:
+                future = executor.submit(run, name, current_path)
+            except RuntimeError:
+                # shut down while the chain was running, the rest is cancelled
+                result = StepResult(name, "failed", 0, current_path, "cancelled")
+                results.append(result)
+                on_step(result)
+                on_done(Path(current_path), results)
+                return
+            future.add_done_callback(
+                lambda future: _on_step_done(name, current_path, future)
+            )
+
+        def _on_step_done(name: str, current_path: str, future: Future):
+            try:
+                result: StepResult = future.result()
+            except Exception as e:
+                # the worker itself died, e.g. it was killed by the os
+                result = StepResult(name, "failed", 0, current_path, str(e))
+            results.append(result)
+            on_step(result)
+            if result.status == "failed":
+                remaining.clear()
+            _next(result.path)
+
+        _next(str(path))
+
+    def shutdown(self):
+        """Cancels the queued steps, the processor takes no new work after this."""
+        with self._lock:
+            self._closed = True
+            if self._executor:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+
+__all__ = ["PostProcessor", "StepResult", "parse_steps"]
+
+
+if __name__ == "__main__":
+    # the entry of the step processes: the step and the file, the result as json
+    print(json.dumps(asdict(run_step(sys.argv[1], sys.argv[2]))))
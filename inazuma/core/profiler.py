@@ -0,0 +1,142 @@
+"""
+A sampling profiler for a running session.
+
+A daemon thread wakes up every `interval` seconds and records the stack of
+every other thread from ``sys._current_frames()``, so the main thread and the
+worker threads are covered without tracing every call; the overhead is one
+walk over a few stacks per sample. Each sample can be tagged, the app tags
+them with the active screen and the service operation the thread is in,
+and the tags become the outermost frames so they group the flamegraph.
+
+Profiles are written as collapsed stacks (``a;b;c count`` lines, for
+flamegraph.pl, inferno or speedscope) or as speedscope json.
+"""
+
+import json
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Callable
+
+DEFAULT_INTERVAL = 0.01
+# frames deeper than this are cut off, runaway recursion would bloat a profile
+MAX_DEPTH = 128
+
+Stack = tuple[str, ...]
+TagGetter = Callable[[int], list[str]]
+
+
+def _frame_name(code) -> str:
+    return f"{code.co_qualname} ({Path(code.co_filename).name}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    """Samples the stacks of all threads until stopped, see the module docstring."""
+
+    def __init__(
+        self, interval: float = DEFAULT_INTERVAL, tags: TagGetter | None = None
+    ):
+        self.interval = interval
+        self.tags = tags
+        """returns the tags of a sample of the thread with the given id"""
+        self.samples: Counter[Stack] = Counter()
+        self.started_at = 0.0
+        self.duration = 0.0
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    @property
+    def is_running(self) -> bool:
+        return self._thread is not None
+
+    def start(self):
+        if self._thread:
+            return
+        self.samples.clear()
+        self._stop.clear()
+        self.started_at = time.time()
+        self._thread = threading.Thread(
+            target=self._run, name="sampling-profiler", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        if not self._thread:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        self.duration = time.time() - self.started_at
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None and len(stack) < MAX_DEPTH:
+                    stack.append(_frame_name(frame.f_code))
+                    frame = frame.f_back
+                stack.reverse()
+                tags = self._tags(thread_id)
+                thread = names.get(thread_id, str(thread_id))
+                self.samples[(*tags, thread, *stack)] += 1
+
+    def _tags(self, thread_id: int) -> list[str]:
+        if not self.tags:
+            return []
+        try:
+            return self.tags(thread_id)
+        except Exception:
+            # a sample is worth more than its tags
+            return []
+
+    # ---------------export-------------------------
+    def save_collapsed(self, path: Path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        lines = [
+            f"{';'.join(frame.replace(';', ':') for frame in stack)} {count}"
+            for stack, count in self.samples.most_common()
+        ]
+        path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+    def save_speedscope(self, path: Path, name: str = "inazuma"):
+        """Writes one sampled profile, weighted in seconds, in speedscope's format."""
+        frames: list[dict] = []
+        indices: dict[str, int] = {}
+        samples, weights = [], []
+        for stack, count in self.samples.items():
+            sample = []
+            for frame in stack:
+                if frame not in indices:
+                    indices[frame] = len(frames)
+                    frames.append({"name": frame})
+                sample.append(indices[frame])
+            samples.append(sample)
+            weights.append(count * self.interval)
+        profile = {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": name,
+            "exporter": "inazuma",
+            "shared": {"frames": frames},
+            "profiles": [
+                {
+                    "type": "sampled",
+                    "name": name,
+                    "unit": "seconds",
+                    "startValue": 0,
+                    "endValue": sum(weights),
+                    "samples": samples,
+                    "weights": weights,
+                }
+            ],
+        }
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(profile), encoding="utf-8")
+
+
+__all__ = ["SamplingProfiler"]
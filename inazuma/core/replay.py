@@ -0,0 +1,286 @@
+"""
+Recording and replaying of media api and anime provider responses.
+
+A recording captures what the real services answered, keyed by the method
+and its parameters, together with how long each call took. The replay
+stand-ins implement `BaseApiClient` and `BaseAnimeProvider` on top of a
+recording, so the app (or a benchmark) can be pointed at them through
+`Viu._media_api` and `Viu._anime_provider` and run without a network.
+"""
+
+import functools
+import json
+import logging
+import threading
+import time
+from dataclasses import asdict
+from enum import Enum
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+from viu_media.libs.media_api.base import BaseApiClient
+from viu_media.libs.provider.anime.base import BaseAnimeProvider
+
+if TYPE_CHECKING:
+    from viu_media.libs.media_api.types import MediaSearchResult
+
+logger = logging.getLogger(__name__)
+
+MEDIA_API_METHODS = (
+    "authenticate",
+    "is_authenticated",
+    "get_viewer_profile",
+    "search_media",
+    "search_media_list",
+    "update_list_entry",
+    "delete_list_entry",
+    "get_recommendation_for",
+    "get_characters_of",
+    "get_related_anime_for",
+    "get_airing_schedule_for",
+    "get_reviews_for",
+    "get_notifications",
+)
+ANIME_PROVIDER_METHODS = ("search", "get", "episode_streams")
+
+
+def _json_default(value):
+    if isinstance(value, Enum):
+        return value.value
+    raise TypeError(f"{type(value).__name__} is not json serializable")
+
+
+def params_key(params: Any) -> str:
+    """A stable key for the parameters of a call, a dataclass or a plain value."""
+    if hasattr(params, "__dataclass_fields__"):
+        params = asdict(params)
+    return json.dumps(params, default=_json_default, sort_keys=True)
+
+
+@functools.cache
+def _adapter(service: str, method: str):
+    """Validates and dumps what `method` returns."""
+    from pydantic import TypeAdapter
+
+    if service == "media_api":
+        from viu_media.libs.media_api import types as t
+
+        result_types = {
+            "authenticate": t.UserProfile | None,
+            "is_authenticated": bool,
+            "get_viewer_profile": t.UserProfile | None,
+            "search_media": t.MediaSearchResult | None,
+            "search_media_list": t.MediaSearchResult | None,
+            "update_list_entry": bool,
+            "delete_list_entry": bool,
+            "get_recommendation_for": list[t.MediaItem] | None,
+            "get_characters_of": t.CharacterSearchResult | None,
+            "get_related_anime_for": list[t.MediaItem] | None,
+            "get_airing_schedule_for": t.AiringScheduleResult | None,
+            "get_reviews_for": list[t.MediaReview] | None,
+            "get_notifications": list[t.Notification] | None,
+        }
+    else:
+        from viu_media.libs.provider.anime import types as t
+
+        result_types = {
+            "search": t.SearchResults | None,
+            "get": t.Anime | None,
+            "episode_streams": list[t.Server] | None,
+        }
+    return TypeAdapter(result_types[method])
+
+
+class Recording:
+    """The calls made to the services and what they returned."""
+
+    def __init__(self, calls: dict[str, dict[str, list[dict]]] | None = None):
+        # service -> method -> [{"params": key, "result": json, "elapsed": s}]
+        self.calls = calls or {"media_api": {}, "anime_provider": {}}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path: Path) -> "Recording":
+        return cls(json.loads(Path(path).read_text(encoding="utf-8"))["calls"])
+
+    def save(self, path: Path):
+        from viu_media.core.utils.file import AtomicWriter
+
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with AtomicWriter(path, mode="w", encoding="utf-8") as f:
+            json.dump({"calls": self.calls}, f, indent=1)
+
+    def record(
+        self, service: str, method: str, params: Any, result: Any, elapsed: float
+    ):
+        dumped = _adapter(service, method).dump_python(result, mode="json")
+        with self._lock:
+            self.calls[service].setdefault(method, []).append(
+                {"params": params_key(params), "result": dumped, "elapsed": elapsed}
+            )
+
+    def find(self, service: str, method: str, params: Any) -> dict | None:
+        """The call recorded with these parameters, else the first one of the method.
+
+        Falling back lets a replay answer calls nobody recorded, like a search
+        for another title, with a realistic response.
+        """
+        calls = self.calls[service].get(method) or []
+        key = params_key(params)
+        for call in calls:
+            if call["params"] == key:
+                return call
+        return calls[0] if calls else None
+
+    def replay(self, service: str, method: str, params: Any, latency_scale: float):
+        call = self.find(service, method, params)
+        if call is None:
+            logger.debug(f"Nothing recorded for {service}.{method}")
+            return None
+        if latency_scale > 0:
+            time.sleep(call["elapsed"] * latency_scale)
+        return _adapter(service, method).validate_python(call["result"])
+
+
+# ---------------replay-------------------------
+class ReplayApiClient(BaseApiClient):
+    """A media api that answers from a recording.
+
+    `latency_scale` sleeps for that fraction of each call's recorded duration,
+    0 answers at once and 1 as slowly as the real service did.
+    """
+
+    def __init__(self, recording: Recording, latency_scale: float = 0):
+        super().__init__(None, None)  # type: ignore
+        self.recording = recording
+        self.latency_scale = latency_scale
+
+    def _replay(self, method: str, params: Any = None):
+        return self.recording.replay("media_api", method, params, self.latency_scale)
+
+    def authenticate(self, token):
+        return self._replay("authenticate")
+
+    def is_authenticated(self):
+        return bool(self._replay("is_authenticated"))
+
+    def get_viewer_profile(self):
+        return self._replay("get_viewer_profile")
+
+    def search_media(self, params):
+        return self._replay("search_media", params)
+
+    def search_media_list(self, params):
+        return self._replay("search_media_list", params)
+
+    def update_list_entry(self, params):
+        return bool(self._replay("update_list_entry", params))
+
+    def delete_list_entry(self, media_id):
+        return bool(self._replay("delete_list_entry", media_id))
+
+    def get_recommendation_for(self, params):
+        return self._replay("get_recommendation_for", params)
+
+    def get_characters_of(self, params):
+        return self._replay("get_characters_of", params)
+
+    def get_related_anime_for(self, params):
+        return self._replay("get_related_anime_for", params)
+
+    def get_airing_schedule_for(self, params):
+        return self._replay("get_airing_schedule_for", params)
+
+    def get_reviews_for(self, params):
+        return self._replay("get_reviews_for", params)
+
+    def get_notifications(self):
+        return self._replay("get_notifications")
+
+    def transform_raw_search_data(self, raw_data) -> "MediaSearchResult | None":
+        return None
+
+
+class ReplayAnimeProvider(BaseAnimeProvider):
+    """An anime provider that answers from a recording, see ReplayApiClient."""
+
+    HEADERS = {}
+
+    def __init__(self, recording: Recording, latency_scale: float = 0):
+        super().__init__(None)  # type: ignore
+        self.recording = recording
+        self.latency_scale = latency_scale
+
+    def _replay(self, method: str, params: Any):
+        return self.recording.replay(
+            "anime_provider", method, params, self.latency_scale
+        )
+
+    def search(self, params):
+        return self._replay("search", params)
+
+    def get(self, params):
+        return self._replay("get", params)
+
+    def episode_streams(self, params):
+        servers = self._replay("episode_streams", params)
+        return iter(servers) if servers is not None else None
+
+
+# ---------------recording-------------------------
+class _Recorder:
+    def __init__(self, service: str, target, recording: Recording):
+        self._service = service
+        self._target = target
+        self._recording = recording
+
+    def __getattr__(self, name: str):
+        attribute = getattr(self._target, name)
+        methods = (
+            MEDIA_API_METHODS
+            if self._service == "media_api"
+            else ANIME_PROVIDER_METHODS
+        )
+        if name not in methods or not callable(attribute):
+            return attribute
+
+        def _call(params=None, *args, **kwargs):
+            started = time.monotonic()
+            if params is None:
+                result = attribute(*args, **kwargs)
+            else:
+                result = attribute(params, *args, **kwargs)
+            if name == "episode_streams" and result is not None:
+                result = list(result)
+            elapsed = time.monotonic() - started
+            # never write the user's token into a recording
+            recorded_params = None if name == "authenticate" else params
+            self._recording.record(
+                self._service, name, recorded_params, result, elapsed
+            )
+            return iter(result) if name == "episode_streams" and result else result
+
+        return _call
+
+
+def record_media_api(media_api: BaseApiClient, recording: Recording) -> BaseApiClient:
+    """Wraps a real media api so every call it answers is added to `recording`."""
+    return _Recorder("media_api", media_api, recording)  # type: ignore
+
+
+def record_anime_provider(
+    provider: BaseAnimeProvider, recording: Recording
+) -> BaseAnimeProvider:
+    """Wraps a real anime provider so every call it answers is added to `recording`."""
+    return _Recorder("anime_provider", provider, recording)  # type: ignore
+
+
+__all__ = [
+    "Recording",
+    "ReplayAnimeProvider",
+    "ReplayApiClient",
+    "params_key",
+    "record_anime_provider",
+    "record_media_api",
+]
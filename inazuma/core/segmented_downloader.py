@@ -0,0 +1,553 @@
+"""
+A multi-connection downloader engine for viu.
+
+Progressive files (mp4, mkv, ...) are split into byte ranges and HLS playlists
+into their media segments, which are then fetched over several parallel
+connections. Anything it cannot handle (torrents, encrypted hls, servers that
+ignore range requests) is handed to viu's own downloader.
+"""
+
+import logging
+import os
+import threading
+import time
+import urllib.parse
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Callable
+
+from viu_media.core.downloader.base import BaseDownloader
+from viu_media.core.downloader.model import DownloadResult
+
+if TYPE_CHECKING:
+    import httpx
+    from viu_media.core.config.model import DownloadsConfig
+    from viu_media.core.downloader.params import DownloadParams
+
+logger = logging.getLogger(__name__)
+
+MIN_CHUNK_SIZE = 256 * 1024
+MAX_CHUNK_SIZE = 16 * 1024 * 1024
+INITIAL_CHUNK_SIZE = 1024 * 1024
+# how long a single ranged request should roughly take once the chunk size settles
+TARGET_CHUNK_SECONDS = 2.0
+# minimum delay between two progress hook calls
+PROGRESS_INTERVAL = 0.25
+READ_SIZE = 64 * 1024
+# how many segments each connection may fetch ahead of the one written last;
+# the finished ones wait in memory until every segment before them is written
+SEGMENTS_AHEAD_PER_CONNECTION = 4
+
+
+@dataclass
+class HlsSegment:
+    url: str
+    byte_range: tuple[int, int] | None = None
+
+
+@dataclass
+class HlsPlaylist:
+    segments: list[HlsSegment]
+    init_segment: HlsSegment | None = None
+    encrypted: bool = False
+    duration: float = 0.0
+    bandwidth: int | None = None
+    """the bandwidth the master playlist advertised for this variant"""
+
+    @property
+    def extension(self) -> str:
+        # fragmented mp4 playlists declare an init section, mpeg-ts ones do not
+        return ".mp4" if self.init_segment else ".ts"
+
+    @property
+    def estimated_size(self) -> int | None:
+        """The size of the stream in bytes, exact when every segment is a byte range."""
+        segments = [*self.segments, *([self.init_segment] if self.init_segment else [])]
+        if segments and all(segment.byte_range for segment in segments):
+            return sum(
+                end - start + 1 for start, end in (s.byte_range for s in segments)
+            )
+        if self.bandwidth and self.duration:
+            return round(self.bandwidth * self.duration / 8)
+        return None
+
+
+def is_hls_url(url: str) -> bool:
+    return urllib.parse.urlparse(url).path.endswith(".m3u8")
+
+
+def _parse_attributes(line: str) -> dict[str, str]:
+    attributes = {}
+    _, _, attribute_list = line.partition(":")
+    for part in _split_attribute_list(attribute_list):
+        key, _, value = part.partition("=")
+        attributes[key.strip()] = value.strip().strip('"')
+    return attributes
+
+
+def _split_attribute_list(attribute_list: str) -> list[str]:
+    parts, current, quoted = [], [], False
+    for char in attribute_list:
+        if char == '"':
+            quoted = not quoted
+        if char == "," and not quoted:
+            parts.append("".join(current))
+            current = []
+        else:
+            current.append(char)
+    if current:
+        parts.append("".join(current))
+    return parts
+
+
+def _parse_byte_range(value: str, previous_end: int) -> tuple[int, int]:
+    length, _, offset = value.partition("@")
+    start = int(offset) if offset else previous_end
+    return start, start + int(length) - 1
+
+
+def parse_master_playlist(text: str, base_url: str) -> list[tuple[int, str]]:
+    """Returns the (bandwidth, url) of every variant in a master playlist."""
+    variants = []
+    bandwidth = None
+    for line in text.splitlines():
+        line = line.strip()
+        if line.startswith("#EXT-X-STREAM-INF"):
+            bandwidth = int(_parse_attributes(line).get("BANDWIDTH", 0))
+        elif line and not line.startswith("#") and bandwidth is not None:
+            variants.append((bandwidth, urllib.parse.urljoin(base_url, line)))
+            bandwidth = None
+    return variants
+
+
+def parse_media_playlist(text: str, base_url: str) -> HlsPlaylist:
+    playlist = HlsPlaylist(segments=[])
+    byte_range = None
+    range_end = 0
+    for line in text.splitlines():
+        line = line.strip()
+        if line.startswith("#EXT-X-KEY"):
+            method = _parse_attributes(line).get("METHOD", "NONE")
+            playlist.encrypted = playlist.encrypted or method != "NONE"
+        elif line.startswith("#EXT-X-MAP"):
+            attributes = _parse_attributes(line)
+            init_range = None
+            if "BYTERANGE" in attributes:
+                init_range = _parse_byte_range(attributes["BYTERANGE"], 0)
+            playlist.init_segment = HlsSegment(
+                urllib.parse.urljoin(base_url, attributes["URI"]), init_range
+            )
+        elif line.startswith("#EXTINF"):
+            duration = line.partition(":")[2].partition(",")[0]
+            try:
+                playlist.duration += float(duration)
+            except ValueError:
+                pass
+        elif line.startswith("#EXT-X-BYTERANGE"):
+            byte_range = _parse_byte_range(line.partition(":")[2], range_end)
+            range_end = byte_range[1] + 1
+        elif line and not line.startswith("#"):
+            playlist.segments.append(
+                HlsSegment(urllib.parse.urljoin(base_url, line), byte_range)
+            )
+            byte_range = None
+    return playlist
+
+
+def probe(client: "httpx.Client", url: str, headers: dict) -> tuple[int | None, str]:
+    """Returns the size of the resource if the server honours ranges, and its type."""
+    with client.stream(
+        "GET", url, headers={**headers, "Range": "bytes=0-0"}
+    ) as response:
+        response.raise_for_status()
+        content_type = response.headers.get("content-type", "")
+        content_range = response.headers.get("content-range", "")
+        if response.status_code != 206 or "/" not in content_range:
+            return None, content_type
+        total = content_range.rpartition("/")[2]
+        return (int(total) if total.isdigit() else None), content_type
+
+
+def resolve_playlist(
+    client: "httpx.Client", url: str, headers: dict
+) -> tuple[HlsPlaylist, str]:
+    """Fetches a playlist, following a master playlist to its best variant."""
+    response = client.get(url, headers=headers)
+    response.raise_for_status()
+    text, base_url = response.text, str(response.url)
+    bandwidth = None
+    if variants := parse_master_playlist(text, base_url):
+        bandwidth, base_url = max(variants)
+        response = client.get(base_url, headers=headers)
+        response.raise_for_status()
+        text = response.text
+    playlist = parse_media_playlist(text, base_url)
+    playlist.bandwidth = bandwidth or None
+    return playlist, base_url
+
+
+class _ProgressReporter:
+    """Aggregates bytes from all connections into yt-dlp style progress dicts."""
+
+    def __init__(
+        self, hooks: list[Callable], filename: str, total_bytes: int | None = None
+    ):
+        self.hooks = hooks
+        self.filename = filename
+        self.total_bytes = total_bytes
+        self.downloaded_bytes = 0
+        self.preallocated_bytes = 0
+        self.started_at = time.monotonic()
+        self._last_report = 0.0
+        self._lock = threading.Lock()
+
+    def advance(self, size: int):
+        with self._lock:
+            # retries take back what a failed request had counted
+            self.downloaded_bytes = max(0, self.downloaded_bytes + size)
+            now = time.monotonic()
+            if now - self._last_report < PROGRESS_INTERVAL:
+                return
+            self._last_report = now
+        self.report("downloading")
+
+    def report(self, status: str, **extra):
+        elapsed = time.monotonic() - self.started_at
+        speed = self.downloaded_bytes / elapsed if elapsed > 0 else 0
+        eta = None
+        if self.total_bytes and speed:
+            eta = round((self.total_bytes - self.downloaded_bytes) / speed)
+        info = {
+            "status": status,
+            "filename": self.filename,
+            "downloaded_bytes": self.downloaded_bytes,
+            "total_bytes": self.total_bytes or 0,
+            "elapsed": elapsed,
+            "speed": speed,
+            "eta": eta,
+            # lets the disk space accounting know the bytes are already reserved
+            "preallocated_bytes": self.preallocated_bytes,
+            **extra,
+        }
+        for hook in self.hooks:
+            try:
+                hook(info)
+            except Exception as e:
+                logger.warning(f"Progress hook failed: {e}")
+
+
+class _ChunkScheduler:
+    """Hands out byte ranges whose size adapts to each connection's throughput."""
+
+    def __init__(self, total_size: int):
+        self.total_size = total_size
+        self._offset = 0
+        self._lock = threading.Lock()
+
+    def next_range(self, chunk_size: int) -> tuple[int, int] | None:
+        with self._lock:
+            if self._offset >= self.total_size:
+                return None
+            start = self._offset
+            self._offset = min(start + chunk_size, self.total_size)
+            return start, self._offset - 1
+
+
+def next_chunk_size(chunk_size: int, size: int, seconds: float) -> int:
+    """Resize a chunk so the next request takes about TARGET_CHUNK_SECONDS."""
+    if seconds <= 0:
+        return MAX_CHUNK_SIZE
+    throughput = size / seconds
+    # move halfway towards the target to avoid oscillating on noisy samples
+    target = (chunk_size + throughput * TARGET_CHUNK_SECONDS) / 2
+    return int(min(MAX_CHUNK_SIZE, max(MIN_CHUNK_SIZE, target)))
+
+
+class SegmentedDownloader(BaseDownloader):
+    """Downloads a file over several parallel connections."""
+
+    def __init__(
+        self,
+        config: "DownloadsConfig",
+        connections: int = 4,
+        fallback: BaseDownloader | None = None,
+    ):
+        super().__init__(config)
+        self.connections = max(1, connections)
+        self._fallback = fallback
+
+    @property
+    def fallback(self) -> BaseDownloader:
+        if not self._fallback:
+            from viu_media.core.downloader import create_downloader
+
+            self._fallback = create_downloader(self.config)
+        return self._fallback
+
+    def download(
+        self,
+        params: "DownloadParams",
+        reserve: Callable[[int | None], None] | None = None,
+    ) -> DownloadResult:
+        """Downloads `params.url`, falling back to viu's downloader where it must.
+
+        `reserve` is called with the size the download resolved (None if it is
+        unknown) once it is sure to write the file itself, before any byte is
+        written; raising from it fails the download.
+        """
+        from viu_media.core.patterns import TORRENT_REGEX
+
+        if TORRENT_REGEX.match(params.url) or params.subtitles:
+            return self.fallback.download(params)
+        reserve = reserve or (lambda size: None)
+        try:
+            if is_hls_url(params.url):
+                video_path = self._download_hls(params, reserve)
+            else:
+                video_path = self._download_ranges(params, reserve)
+        except Exception as e:
+            logger.error(f"Download failed: {e}")
+            return DownloadResult(
+                success=False,
+                error_message=str(e),
+                anime_title=params.anime_title,
+                episode_title=params.episode_title,
+            )
+        if video_path is None:
+            logger.info(f"Falling back to viu downloader for {params.url}")
+            return self.fallback.download(params)
+        return DownloadResult(
+            success=True,
+            video_path=video_path,
+            anime_title=params.anime_title,
+            episode_title=params.episode_title,
+        )
+
+    def get_output_path(self, params: "DownloadParams", extension: str) -> Path:
+        from viu_media.core.utils.file import sanitize_filename
+
+        dest_dir = self.config.downloads_dir / sanitize_filename(params.anime_title)
+        dest_dir.mkdir(parents=True, exist_ok=True)
+        return dest_dir / f"{sanitize_filename(params.episode_title)}{extension}"
+
+    # ---------------progressive files over byte ranges-------------------------
+    def _download_ranges(
+        self, params: "DownloadParams", reserve: Callable[[int | None], None]
+    ) -> Path | None:
+        total_size, content_type = probe(self.client, params.url, params.headers)
+        if "mpegurl" in content_type.lower():
+            return self._download_hls(params, reserve)
+        if not total_size:
+            return None
+
+        extension = Path(urllib.parse.urlparse(params.url).path).suffix or ".mp4"
+        output_path = self.get_output_path(params, extension)
+        if output_path.exists() and output_path.stat().st_size == total_size:
+            logger.info(f"File already exists: {output_path}")
+            return output_path
+
+        part_path = output_path.with_name(output_path.name + ".part")
+        reserve(total_size)
+        preallocate(part_path, total_size)
+
+        reporter = _ProgressReporter(
+            params.progress_hooks, output_path.name, total_size
+        )
+        reporter.preallocated_bytes = total_size
+        scheduler = _ChunkScheduler(total_size)
+
+        def _worker(stop: threading.Event):
+            chunk_size = INITIAL_CHUNK_SIZE
+            with open(part_path, "r+b") as f:
+                while not stop.is_set() and (
+                    byte_range := scheduler.next_range(chunk_size)
+                ):
+                    started_at = time.monotonic()
+                    self._fetch_into(
+                        f, params.url, params.headers, byte_range, reporter
+                    )
+                    chunk_size = next_chunk_size(
+                        chunk_size,
+                        byte_range[1] - byte_range[0] + 1,
+                        time.monotonic() - started_at,
+                    )
+
+        self._run_workers(_worker, self.connections, reporter)
+        os.replace(part_path, output_path)
+        reporter.report("finished", filename=str(output_path))
+        return output_path
+
+    def _fetch_into(
+        self,
+        f,
+        url: str,
+        headers: dict,
+        byte_range: tuple[int, int],
+        reporter: _ProgressReporter,
+    ):
+        """Streams a byte range straight to its final offset in the output file."""
+        start, end = byte_range
+        attempts = self.config.max_retry_attempts + 1
+        for attempt in range(attempts):
+            offset = start
+            try:
+                with self.client.stream(
+                    "GET", url, headers={**headers, "Range": f"bytes={offset}-{end}"}
+                ) as response:
+                    response.raise_for_status()
+                    if response.status_code != 206:
+                        raise ValueError("Server stopped honouring range requests")
+                    f.seek(offset)
+                    for data in response.iter_bytes(READ_SIZE):
+                        f.write(data)
+                        offset += len(data)
+                        reporter.advance(len(data))
+                if offset != end + 1:
+                    raise ValueError(f"Incomplete range {start}-{end}")
+                return
+            except Exception as e:
+                # discount the partial range so the progress stays truthful
+                reporter.advance(start - offset)
+                if attempt + 1 == attempts:
+                    raise
+                logger.warning(f"Retrying range {start}-{end}: {e}")
+                time.sleep(self.config.retry_delay)
+
+    # ---------------hls playlists over parallel segment fetches-------------------------
+    def _fetch_segment(self, segment: HlsSegment, headers: dict) -> bytes:
+        if segment.byte_range:
+            start, end = segment.byte_range
+            headers = {**headers, "Range": f"bytes={start}-{end}"}
+        attempts = self.config.max_retry_attempts + 1
+        for attempt in range(attempts):
+            try:
+                response = self.client.get(segment.url, headers=headers)
+                response.raise_for_status()
+                return response.content
+            except Exception as e:
+                if attempt + 1 == attempts:
+                    raise
+                logger.warning(f"Retrying segment {segment.url}: {e}")
+                time.sleep(self.config.retry_delay)
+        raise RuntimeError("unreachable")
+
+    def _download_hls(
+        self, params: "DownloadParams", reserve: Callable[[int | None], None]
+    ) -> Path | None:
+        playlist, _ = resolve_playlist(self.client, params.url, params.headers)
+        if playlist.encrypted or not playlist.segments:
+            return None
+
+        output_path = self.get_output_path(params, playlist.extension)
+        if output_path.exists():
+            logger.info(f"File already exists: {output_path}")
+            return output_path
+        part_path = output_path.with_name(output_path.name + ".part")
+        reserve(playlist.estimated_size)
+
+        segments = list(playlist.segments)
+        if playlist.init_segment:
+            segments.insert(0, playlist.init_segment)
+        reporter = _ProgressReporter(
+            params.progress_hooks, output_path.name, playlist.estimated_size
+        )
+        # the estimate from the advertised bandwidth is close enough to reserve the
+        # space in one piece, the file is trimmed to what was written at the end
+        if estimated_size := playlist.estimated_size:
+            preallocate(part_path, estimated_size)
+            reporter.preallocated_bytes = estimated_size
+        else:
+            part_path.write_bytes(b"")
+
+        # segments finish out of order, each one is written as soon as every
+        # segment before it is on disk so the file never needs a separate merge pass;
+        # no connection runs more than `window` segments ahead, which bounds what
+        # waits in memory behind a slow segment
+        pending: dict[int, bytes] = {}
+        next_index = 0
+        write_lock = threading.Condition()
+        index_lock = threading.Lock()
+        next_segment = iter(range(len(segments)))
+        connections = min(self.connections, len(segments))
+        window = connections * SEGMENTS_AHEAD_PER_CONNECTION
+
+        with open(part_path, "r+b") as f:
+
+            def _worker(stop: threading.Event):
+                nonlocal next_index
+                while not stop.is_set():
+                    with index_lock:
+                        index = next(next_segment, None)
+                    if index is None:
+                        return
+                    with write_lock:
+                        # the segment at next_index is always inside the window,
+                        # so whoever fetches it keeps the others moving
+                        while index >= next_index + window and not stop.is_set():
+                            write_lock.wait(PROGRESS_INTERVAL)
+                    if stop.is_set():
+                        return
+                    data = self._fetch_segment(segments[index], params.headers)
+                    reporter.advance(len(data))
+                    with write_lock:
+                        pending[index] = data
+                        while next_index in pending:
+                            f.write(pending.pop(next_index))
+                            next_index += 1
+                        write_lock.notify_all()
+                        # estimate the final size from the average segment so far
+                        reporter.total_bytes = round(
+                            reporter.downloaded_bytes
+                            / (next_index + len(pending))
+                            * len(segments)
+                        )
+
+            self._run_workers(_worker, connections, reporter)
+            f.truncate(f.tell())
+
+        os.replace(part_path, output_path)
+        reporter.total_bytes = reporter.downloaded_bytes
+        reporter.report("finished", filename=str(output_path))
+        return output_path
+
+    def _run_workers(
+        self,
+        worker: Callable[[threading.Event], None],
+        count: int,
+        reporter: _ProgressReporter,
+    ):
+        stop = threading.Event()
+        with ThreadPoolExecutor(
+            max_workers=count, thread_name_prefix="segmented-download"
+        ) as executor:
+            futures = [executor.submit(worker, stop) for _ in range(count)]
+            done, _ = wait(futures, return_when=FIRST_EXCEPTION)
+            for future in done:
+                if error := future.exception():
+                    # let the remaining connections finish their current request and quit
+                    stop.set()
+                    reporter.report("error", error=str(error))
+                    raise error
+
+
+def preallocate(path: Path, size: int):
+    """Reserves `size` bytes for `path` up front so the file is not grown piecemeal."""
+    with open(path, "wb") as f:
+        if hasattr(os, "posix_fallocate"):
+            try:
+                os.posix_fallocate(f.fileno(), 0, size)
+                return
+            except OSError:
+                # not every filesystem supports it (e.g. some fuse mounts)
+                pass
+        f.truncate(size)
+
+
+__all__ = [
+    "SegmentedDownloader",
+    "is_hls_url",
+    "preallocate",
+    "probe",
+    "resolve_playlist",
+]
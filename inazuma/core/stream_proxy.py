@@ -0,0 +1,533 @@
+"""
+A caching streaming proxy on localhost for the in-app player.
+
+ffmpeg (behind kivy's VideoPlayer) cannot send the headers some servers
+require, and everything it buffered is thrown away on a seek back or a
+server switch. The player is therefore pointed at this proxy instead:
+
+- every proxied url carries a token for the headers of its server, which
+  are added to each request sent to the origin
+- hls playlists are rewritten so their segments, keys and variants are
+  fetched through the proxy as well
+- responses are stored as fixed size chunks in a size bounded disk cache,
+  so seeking back (or replaying later) is served without the origin
+- the chunks after the one being played, and the segments after the one
+  being played, are fetched ahead in the background
+- the time every origin fetch takes is reported to the bandwidth estimator
+  that adaptive quality selection is based on
+"""
+
+import base64
+import hashlib
+import http.server
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+import urllib.parse
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import httpx
+
+    from .bandwidth import BandwidthEstimator
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 1024 * 1024
+URI_ATTRIBUTE = re.compile(r'URI="([^"]+)"')
+# what the proxy learned about the urls it served is kept for the most recent
+# tokens, and for the most recent urls of each; anything dropped is relearned
+# from the disk cache or the origin
+MAX_SESSIONS = 8
+MAX_URLS_PER_SESSION = 2048
+
+
+@dataclass
+class _ResourceInfo:
+    size: int
+    content_type: str
+    ranged: bool
+    """whether the origin honours range requests"""
+
+
+@dataclass
+class _Session:
+    """The sizes and segment lists of the urls played with one token."""
+
+    infos: OrderedDict[str, _ResourceInfo] = field(default_factory=OrderedDict)
+    next_segments: OrderedDict[str, tuple[list[str], int]] = field(
+        default_factory=OrderedDict
+    )
+    """the playlist of each segment, and where the segment is in it"""
+
+
+def _remember(mapping: OrderedDict, key: str, value):
+    mapping[key] = value
+    mapping.move_to_end(key)
+    while len(mapping) > MAX_URLS_PER_SESSION:
+        mapping.popitem(last=False)
+
+
+class DiskCache:
+    """A least recently used store of byte blobs, bounded by their total size."""
+
+    def __init__(self, directory: Path, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict[str, int] = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self._load()
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    def _path(self, key: str) -> Path:
+        digest = hashlib.sha1(key.encode()).hexdigest()
+        return self.directory / digest[:2] / digest
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            return self._path(key).name in self._entries
+
+    def get(self, key: str) -> bytes | None:
+        path = self._path(key)
+        with self._lock:
+            if path.name not in self._entries:
+                return None
+            self._entries.move_to_end(path.name)
+        try:
+            return path.read_bytes()
+        except OSError:
+            self._forget(path)
+            return None
+
+    def put(self, key: str, data: bytes):
+        path = self._path(key)
+        temp_path = None
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            # the read ahead and the player may store the same chunk at once
+            fd, temp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(temp_path, path)
+        except OSError as e:
+            logger.warning(f"Could not cache {key}: {e}")
+            if temp_path:
+                Path(temp_path).unlink(missing_ok=True)
+            return
+        with self._lock:
+            self._size += len(data) - self._entries.pop(path.name, 0)
+            self._entries[path.name] = len(data)
+            evicted = []
+            while self._size > self.max_bytes and len(self._entries) > 1:
+                name, size = self._entries.popitem(last=False)
+                self._size -= size
+                evicted.append(name)
+        for name in evicted:
+            (self.directory / name[:2] / name).unlink(missing_ok=True)
+
+    def _forget(self, path: Path):
+        with self._lock:
+            self._size -= self._entries.pop(path.name, 0)
+
+    def _load(self):
+        if not self.directory.exists():
+            return
+        files = [path for path in self.directory.glob("*/*") if path.suffix != ".tmp"]
+        for path in sorted(files, key=lambda path: path.stat().st_mtime):
+            size = path.stat().st_size
+            self._entries[path.name] = size
+            self._size += size
+
+
+class StreamProxy:
+    """Serves origin streams to the player through a local caching http server."""
+
+    def __init__(
+        self,
+        cache_dir: Path,
+        max_cache_bytes: int,
+        read_ahead: int,
+        client: "httpx.Client | None" = None,
+        bandwidth: "BandwidthEstimator | None" = None,
+    ):
+        self.cache = DiskCache(cache_dir, max_cache_bytes)
+        self.read_ahead = read_ahead
+        self.bandwidth = bandwidth
+        self._client = client
+        self._headers: dict[str, dict] = {}
+        self._sessions: OrderedDict[str, _Session] = OrderedDict()
+        self._in_flight: dict[str, Future] = {}
+        # chunks handed to the read ahead that it has not fetched yet
+        self._queued: set[str] = set()
+        self._lock = threading.Lock()
+        self._server: http.server.ThreadingHTTPServer | None = None
+        self._prefetcher = ThreadPoolExecutor(
+            max_workers=2, thread_name_prefix="stream-read-ahead"
+        )
+
+    @property
+    def client(self) -> "httpx.Client":
+        if not self._client:
+            import httpx
+
+            self._client = httpx.Client(
+                follow_redirects=True, timeout=httpx.Timeout(15.0, connect=30.0)
+            )
+        return self._client
+
+    # ---------------lifecycle-------------------------
+    def start(self):
+        with self._lock:
+            if self._server:
+                return
+            self._server = http.server.ThreadingHTTPServer(
+                ("127.0.0.1", 0), _make_handler(self)
+            )
+            self._server.daemon_threads = True
+        threading.Thread(
+            target=self._server.serve_forever, daemon=True, name="stream-proxy"
+        ).start()
+        logger.info(f"Stream proxy listening on port {self._server.server_port}")
+
+    def stop(self):
+        with self._lock:
+            server, self._server = self._server, None
+        if server:
+            server.shutdown()
+            server.server_close()
+        self._prefetcher.shutdown(wait=False, cancel_futures=True)
+
+    # ---------------urls-------------------------
+    def url_for(self, url: str, headers: dict | None = None) -> str:
+        """Returns the local url the player should open for `url`."""
+        self.start()
+        headers = dict(headers or {})
+        digest = hashlib.sha1(json.dumps(headers, sort_keys=True).encode())
+        token = digest.hexdigest()[:12]
+        with self._lock:
+            self._headers[token] = headers
+        return self._local_url(token, url)
+
+    def _local_url(self, token: str, url: str) -> str:
+        encoded = base64.urlsafe_b64encode(url.encode()).decode().rstrip("=")
+        # ffmpeg picks demuxers (and vets hls segments) by the file extension
+        name = Path(urllib.parse.urlparse(url).path).name or "stream"
+        port = self._server.server_port if self._server else 0
+        return f"http://127.0.0.1:{port}/{token}/{encoded}/{urllib.parse.quote(name)}"
+
+    def _parse_local_path(self, path: str) -> tuple[str, str] | None:
+        parts = path.lstrip("/").split("/")
+        if len(parts) < 2:
+            return None
+        token, encoded = parts[0], parts[1]
+        try:
+            url = base64.urlsafe_b64decode(encoded + "=" * (-len(encoded) % 4)).decode()
+        except ValueError:
+            return None
+        return token, url
+
+    def _session(self, token: str) -> _Session:
+        # called with the lock held
+        if not (session := self._sessions.get(token)):
+            session = self._sessions[token] = _Session()
+            while len(self._sessions) > MAX_SESSIONS:
+                self._sessions.popitem(last=False)
+        self._sessions.move_to_end(token)
+        return session
+
+    def _info(self, token: str, url: str) -> _ResourceInfo | None:
+        with self._lock:
+            infos = self._session(token).infos
+            if info := infos.get(url):
+                infos.move_to_end(url)
+            return info
+
+    # ---------------playlists-------------------------
+    def get_playlist(self, token: str, url: str) -> bytes:
+        """Fetches a playlist and points all of its uris back at the proxy."""
+        key = f"playlist:{url}"
+        try:
+            response = self.client.get(url, headers=self._headers.get(token, {}))
+            response.raise_for_status()
+            text, base_url = response.text, str(response.url)
+            self.cache.put(key, json.dumps([text, base_url]).encode())
+        except Exception as e:
+            # playlists are refetched so live streams stay current, but a cached
+            # copy still lets an already watched episode play offline
+            if not (cached := self.cache.get(key)):
+                raise
+            logger.warning(f"Serving cached playlist for {url}: {e}")
+            text, base_url = json.loads(cached)
+        return self._rewrite_playlist(token, text, base_url).encode()
+
+    def _rewrite_playlist(self, token: str, text: str, base_url: str) -> str:
+        lines, segments = [], []
+        for line in text.splitlines():
+            stripped = line.strip()
+            if stripped and not stripped.startswith("#"):
+                segment_url = urllib.parse.urljoin(base_url, stripped)
+                segments.append(segment_url)
+                line = self._local_url(token, segment_url)
+            elif stripped.startswith("#") and 'URI="' in stripped:
+                line = URI_ATTRIBUTE.sub(
+                    lambda match: (
+                        'URI="%s"'
+                        % self._local_url(
+                            token, urllib.parse.urljoin(base_url, match[1])
+                        )
+                    ),
+                    line,
+                )
+            lines.append(line)
+        with self._lock:
+            next_segments = self._session(token).next_segments
+            for index, segment_url in enumerate(segments):
+                _remember(next_segments, segment_url, (segments, index))
+        return "\n".join(lines) + "\n"
+
+    # ---------------chunks-------------------------
+    def get_info(self, token: str, url: str) -> _ResourceInfo:
+        if info := self._info(token, url):
+            return info
+        if cached := self.cache.get(f"info:{url}"):
+            info = _ResourceInfo(**json.loads(cached))
+            with self._lock:
+                _remember(self._session(token).infos, url, info)
+            return info
+        # fetching the first chunk is what reveals the size of the resource; it
+        # comes from the origin even if cached, whose info may have been evicted
+        self.get_chunk(token, url, 0, cached=False)
+        if info := self._info(token, url):
+            return info
+        # a Content-Range of bytes a-b/* does not say, so take all of it instead
+        self.get_chunk(token, url, 0, cached=False, ranged=False)
+        if info := self._info(token, url):
+            return info
+        raise ValueError(f"{url} did not say how big it is")
+
+    def get_chunk(
+        self,
+        token: str,
+        url: str,
+        index: int,
+        cached: bool = True,
+        ranged: bool = True,
+    ) -> bytes:
+        """Returns chunk `index` of `url`, from the cache or the origin.
+
+        Concurrent requests for one chunk share a single origin fetch.
+        """
+        key = f"{url}#{index}"
+        if cached and (data := self.cache.get(key)) is not None:
+            return data
+        with self._lock:
+            future = self._in_flight.get(key)
+            owner = future is None
+            if owner:
+                future = self._in_flight[key] = Future()
+        if not owner:
+            # another request or the read ahead is already fetching it
+            return future.result()
+        try:
+            data = self._fetch_chunk(token, url, index, ranged)
+            future.set_result(data)
+            return data
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+
+    def _fetch_chunk(
+        self, token: str, url: str, index: int, ranged: bool = True
+    ) -> bytes:
+        headers = dict(self._headers.get(token, {}))
+        info = self._info(token, url)
+        if ranged and (not info or info.ranged):
+            start = index * CHUNK_SIZE
+            headers["Range"] = f"bytes={start}-{start + CHUNK_SIZE - 1}"
+        started = time.monotonic()
+        response = self.client.get(url, headers=headers)
+        response.raise_for_status()
+        if self.bandwidth:
+            self.bandwidth.add_sample(
+                len(response.content), time.monotonic() - started
+            )
+        content_type = response.headers.get("content-type", "application/octet-stream")
+        if response.status_code == 206:
+            total = response.headers.get("content-range", "").rpartition("/")[2]
+            if not info and total.isdigit():
+                self._set_info(
+                    token, url, _ResourceInfo(int(total), content_type, True)
+                )
+            data = response.content
+            self.cache.put(f"{url}#{index}", data)
+            return data
+
+        # the origin ignored the range and sent everything, keep all of it
+        content = response.content
+        self._set_info(token, url, _ResourceInfo(len(content), content_type, False))
+        for chunk_index in range(0, max(1, -(-len(content) // CHUNK_SIZE))):
+            chunk = content[chunk_index * CHUNK_SIZE : (chunk_index + 1) * CHUNK_SIZE]
+            self.cache.put(f"{url}#{chunk_index}", chunk)
+        return content[index * CHUNK_SIZE : (index + 1) * CHUNK_SIZE]
+
+    def _set_info(self, token: str, url: str, info: _ResourceInfo):
+        with self._lock:
+            _remember(self._session(token).infos, url, info)
+        self.cache.put(f"info:{url}", json.dumps(asdict(info)).encode())
+
+    # ---------------read ahead-------------------------
+    def read_ahead_from(self, token: str, url: str, index: int):
+        """Fetches the chunks after `index` in the background."""
+        info = self._info(token, url)
+        if self.read_ahead <= 0 or not info:
+            return
+        chunk_count = -(-info.size // CHUNK_SIZE)
+        target = min(chunk_count - 1, index + self.read_ahead // CHUNK_SIZE)
+        # the window is checked against the cache every time rather than kept
+        # as a position, so a seek back or evicted chunks are simply refetched
+        self._submit_read_ahead(token, [(url, i) for i in range(index + 1, target + 1)])
+
+    def read_ahead_segments(self, token: str, url: str):
+        """Fetches the hls segments that follow `url` in the background."""
+        info = self._info(token, url)
+        with self._lock:
+            segments, index = self._session(token).next_segments.get(url, ([], 0))
+        if self.read_ahead <= 0 or not info:
+            return
+        count = max(1, self.read_ahead // max(info.size, 1))
+        next_segments = segments[index + 1 : index + 1 + count]
+        self._submit_read_ahead(
+            token, [(segment_url, 0) for segment_url in next_segments]
+        )
+
+    def _submit_read_ahead(self, token: str, chunks: list[tuple[str, int]]):
+        chunks = [
+            chunk for chunk in chunks if f"{chunk[0]}#{chunk[1]}" not in self.cache
+        ]
+        with self._lock:
+            chunks = [
+                chunk
+                for chunk in chunks
+                if (key := f"{chunk[0]}#{chunk[1]}") not in self._queued
+                and key not in self._in_flight
+            ]
+            self._queued.update(f"{url}#{index}" for url, index in chunks)
+        if chunks:
+            self._prefetcher.submit(self._read_ahead, token, chunks)
+
+    def _read_ahead(self, token: str, chunks: list[tuple[str, int]]):
+        try:
+            for url, index in chunks:
+                with self._lock:
+                    self._queued.discard(f"{url}#{index}")
+                if f"{url}#{index}" in self.cache:
+                    continue
+                self.get_chunk(token, url, index)
+                if index == 0:
+                    # a segment bigger than one chunk is read ahead as a whole
+                    self.read_ahead_from(token, url, 0)
+        except Exception as e:
+            logger.debug(f"Read ahead of {url} stopped: {e}")
+        finally:
+            with self._lock:
+                self._queued.difference_update(
+                    f"{url}#{index}" for url, index in chunks
+                )
+
+
+def _parse_range(value: str, size: int) -> tuple[int, int] | None:
+    match = re.fullmatch(r"bytes=(\d*)-(\d*)", value.strip())
+    if not match or not (match[1] or match[2]):
+        return None
+    if not match[1]:
+        # a suffix range, the last n bytes
+        return max(0, size - int(match[2])), size - 1
+    start = int(match[1])
+    end = min(int(match[2]), size - 1) if match[2] else size - 1
+    return start, end
+
+
+def _make_handler(proxy: StreamProxy):
+    class _StreamProxyHandler(http.server.BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            logger.debug(format % args)
+
+        def do_GET(self):
+            if not (parsed := proxy._parse_local_path(self.path)):
+                self.send_error(404)
+                return
+            token, url = parsed
+            try:
+                if urllib.parse.urlparse(url).path.endswith(".m3u8"):
+                    self._send_playlist(proxy.get_playlist(token, url))
+                else:
+                    self._send_resource(token, url)
+            except (BrokenPipeError, ConnectionResetError):
+                # the player dropped the connection, usually because it seeked
+                pass
+            except Exception as e:
+                logger.warning(f"Stream proxy failed for {url}: {e}")
+                try:
+                    self.send_error(502, str(e))
+                except OSError:
+                    pass
+
+        def _send_playlist(self, body: bytes):
+            self.send_response(200)
+            self.send_header("Content-Type", "application/vnd.apple.mpegurl")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _send_resource(self, token: str, url: str):
+            info = proxy.get_info(token, url)
+            byte_range = None
+            if requested := self.headers.get("Range"):
+                byte_range = _parse_range(requested, info.size)
+                if byte_range is None or byte_range[0] >= info.size:
+                    self.send_response(416)
+                    self.send_header("Content-Range", f"bytes */{info.size}")
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+            start, end = byte_range or (0, info.size - 1)
+
+            self.send_response(206 if byte_range else 200)
+            self.send_header("Content-Type", info.content_type)
+            self.send_header("Accept-Ranges", "bytes")
+            self.send_header("Content-Length", str(end - start + 1))
+            if byte_range:
+                self.send_header("Content-Range", f"bytes {start}-{end}/{info.size}")
+            self.end_headers()
+
+            first_index, last_index = start // CHUNK_SIZE, end // CHUNK_SIZE
+            proxy.read_ahead_segments(token, url)
+            for index in range(first_index, last_index + 1):
+                proxy.read_ahead_from(token, url, index)
+                chunk = proxy.get_chunk(token, url, index)
+                chunk_start = index * CHUNK_SIZE
+                self.wfile.write(
+                    chunk[max(start - chunk_start, 0) : end - chunk_start + 1]
+                )
+
+    return _StreamProxyHandler
+
+
+__all__ = ["DiskCache", "StreamProxy"]
@@ -0,0 +1,305 @@
+"""
+Per-call telemetry of the services Viu hands out.
+
+The media api, the anime provider and the auth service are wrapped in a
+proxy that times every public call and, through httpx event hooks on the
+service's client, sees the requests the call made: the bytes received,
+requests repeating one that failed (retries) and error responses. A call
+that returns without making any request was answered from a cache. Trailer
+lookups and extractions are reported by the trailer cache itself.
+
+Calls are aggregated per operation, like ``media_api.search_media[TRENDING_DESC]``
+or ``anime_provider[allanime].episode_streams``, into rolling histograms of
+the last few minutes that the debug panel shows and that can be appended to a
+jsonl file.
+"""
+
+import inspect
+import json
+import logging
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+from collections.abc import Generator
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# upper bounds of the latency buckets, in seconds
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# how far back the rolling histograms reach
+WINDOW = 5 * 60
+# the most calls kept per operation, however many fit in the window
+MAX_SAMPLES = 1000
+
+
+@dataclass
+class CallSample:
+    operation: str
+    elapsed: float
+    started_at: float = field(default_factory=time.time)
+    bytes: int = 0
+    requests: int = 0
+    retries: int = 0
+    cache_hit: bool = False
+    error: str | None = None
+
+
+def _percentile(latencies: list[float], percent: float) -> float:
+    return latencies[min(len(latencies) - 1, int(len(latencies) * percent / 100))]
+
+
+def _bucket_label(bound: float) -> str:
+    return f"<={bound * 1000:g}ms"
+
+
+class OperationStats:
+    """The recent calls of one operation and what they add up to."""
+
+    def __init__(self):
+        self.samples: deque[CallSample] = deque(maxlen=MAX_SAMPLES)
+
+    def add(self, sample: CallSample):
+        self.samples.append(sample)
+
+    def snapshot(self, now: float) -> dict | None:
+        # copying the deque at once keeps calls recorded meanwhile out of the way
+        samples = [s for s in list(self.samples) if now - s.started_at <= WINDOW]
+        if not samples:
+            return None
+        latencies = sorted(sample.elapsed for sample in samples)
+        histogram = [0] * (len(LATENCY_BUCKETS) + 1)
+        for latency in latencies:
+            histogram[bisect_left(LATENCY_BUCKETS, latency)] += 1
+        labels = [_bucket_label(bound) for bound in LATENCY_BUCKETS] + ["slower"]
+        return {
+            "calls": len(samples),
+            "errors": sum(sample.error is not None for sample in samples),
+            "cache_hits": sum(sample.cache_hit for sample in samples),
+            "retries": sum(sample.retries for sample in samples),
+            "bytes": sum(sample.bytes for sample in samples),
+            "p50_ms": round(_percentile(latencies, 50) * 1000, 1),
+            "p95_ms": round(_percentile(latencies, 95) * 1000, 1),
+            "p99_ms": round(_percentile(latencies, 99) * 1000, 1),
+            "histogram": dict(zip(labels, histogram, strict=True)),
+        }
+
+
+class _Call:
+    """The requests made while one instrumented call runs."""
+
+    def __init__(self):
+        self.requests: list[httpx.Request] = []
+        self.responses: list[httpx.Response] = []
+        self.elapsed = 0.0
+        """the time spent in the call, for a generator in all of its steps"""
+
+
+class Telemetry:
+    """Collects call samples per operation, see the module docstring."""
+
+    def __init__(self):
+        self._operations: dict[str, OperationStats] = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        # thread id -> the operation it is running, guarded by the lock
+        self._active: dict[int, str] = {}
+
+    def running(self, thread_id: int) -> str | None:
+        """The operation thread `thread_id` is in, for the profiler's tags."""
+        with self._lock:
+            return self._active.get(thread_id)
+
+    # ---------------collection-------------------------
+    def record(self, sample: CallSample):
+        with self._lock:
+            stats = self._operations.setdefault(sample.operation, OperationStats())
+            stats.add(sample)
+
+    def instrument(self, service: str, target: Any):
+        """Wraps `target` so each of its public calls is recorded under `service`."""
+        client = getattr(target, "http_client", None) or getattr(target, "client", None)
+        if isinstance(client, httpx.Client):
+            self.watch_client(client)
+        return _Instrumented(service, target, self)
+
+    def watch_client(self, client: httpx.Client):
+        """Adds hooks that attribute the client's requests to the running call."""
+        hooks = client.event_hooks
+        if self._on_request in hooks["request"]:
+            return
+        client.event_hooks = {
+            "request": [*hooks["request"], self._on_request],
+            "response": [*hooks["response"], self._on_response],
+        }
+
+    def call(self, operation: str, func, *args, **kwargs):
+        """Calls `func` and records how it went as `operation`."""
+        current = _Call()
+        try:
+            with self._running(operation, current):
+                result = func(*args, **kwargs)
+        except Exception as e:
+            self.record(self._sample(operation, current, f"{type(e).__name__}: {e}"))
+            raise
+        if inspect.isgenerator(result):
+            # generators make their requests while they are consumed, so they
+            # are timed step by step and recorded once they are done
+            return self._consume(operation, current, result)
+        self.record(self._sample(operation, current, None))
+        return result
+
+    def _consume(
+        self, operation: str, current: _Call, generator: Generator
+    ) -> Generator:
+        error = None
+        try:
+            while True:
+                try:
+                    with self._running(operation, current):
+                        item = next(generator)
+                except StopIteration as e:
+                    return e.value
+                yield item
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            # a consumer that stops early closes the service's generator too
+            generator.close()
+            self.record(self._sample(operation, current, error))
+
+    @contextmanager
+    def _running(self, operation: str, current: _Call):
+        """Attributes the requests of the current thread to `current` meanwhile."""
+        calls: list[_Call] = self._local.__dict__.setdefault("calls", [])
+        calls.append(current)
+        thread_id = threading.get_ident()
+        with self._lock:
+            outer = self._active.get(thread_id)
+            self._active[thread_id] = operation
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            current.elapsed += time.perf_counter() - started
+            calls.pop()
+            with self._lock:
+                if outer:
+                    self._active[thread_id] = outer
+                else:
+                    self._active.pop(thread_id, None)
+
+    def _sample(self, operation: str, call: _Call, error: str | None) -> CallSample:
+        responses = {id(response.request): response for response in call.responses}
+        # a request repeating one that failed or got no answer is a retry
+        succeeded: dict[tuple[str, str], bool] = {}
+        retries = 0
+        for request in call.requests:
+            key = (request.method, str(request.url))
+            retries += key in succeeded and not succeeded[key]
+            response = responses.get(id(request))
+            succeeded[key] = response is not None and not response.is_error
+        if error is None and call.responses and call.responses[-1].is_error:
+            error = f"HTTP {call.responses[-1].status_code}"
+        return CallSample(
+            operation,
+            call.elapsed,
+            bytes=sum(_size(response) for response in call.responses),
+            requests=len(call.requests),
+            retries=retries,
+            cache_hit=not call.requests and error is None,
+            error=error,
+        )
+
+    def _on_request(self, request: httpx.Request):
+        if calls := getattr(self._local, "calls", None):
+            calls[-1].requests.append(request)
+
+    def _on_response(self, response: httpx.Response):
+        if calls := getattr(self._local, "calls", None):
+            calls[-1].responses.append(response)
+
+    # ---------------reporting-------------------------
+    def snapshot(self) -> dict[str, dict]:
+        """The rolling statistics of every operation called within the window."""
+        now = time.time()
+        with self._lock:
+            operations = list(self._operations.items())
+        snapshot = {}
+        for operation, stats in sorted(operations):
+            if summary := stats.snapshot(now):
+                snapshot[operation] = summary
+        return snapshot
+
+    def export(self, path: Path):
+        """Appends the current statistics to `path`, one json line per operation."""
+        now = time.time()
+        lines = [
+            json.dumps({"time": now, "operation": operation, **summary})
+            for operation, summary in self.snapshot().items()
+        ]
+        if not lines:
+            return
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with path.open("a", encoding="utf-8") as f:
+                f.write("\n".join(lines) + "\n")
+        except OSError as e:
+            logger.warning(f"Failed to export telemetry to {path}: {e}")
+
+
+def _size(response: httpx.Response) -> int:
+    # responses that were never streamed, like mocked ones, only have a header
+    return response.num_bytes_downloaded or int(
+        response.headers.get("content-length", 0)
+    )
+
+
+def _operation(service: str, method: str, args: tuple) -> str:
+    operation = f"{service}.{method}"
+    # searches differ a lot by what they sort on, so tell them apart
+    if method in ("search_media", "search_media_list") and args:
+        sort = getattr(args[0], "sort", None)
+        if isinstance(sort, list):
+            sort = ",".join(str(getattr(s, "value", s)) for s in sort)
+        if sort is not None:
+            operation += f"[{getattr(sort, 'value', sort)}]"
+    return operation
+
+
+class _Instrumented:
+    _OWN = frozenset({"_service", "_target", "_telemetry"})
+
+    def __init__(self, service: str, target: Any, telemetry: Telemetry):
+        self._service = service
+        self._target = target
+        self._telemetry = telemetry
+
+    def __setattr__(self, name: str, value: Any):
+        # an attribute set on the proxy, like a replaced http client, is meant
+        # for the service; set on the proxy it would shadow the service's own
+        if name in self._OWN:
+            object.__setattr__(self, name, value)
+        else:
+            setattr(self._target, name, value)
+
+    def __getattr__(self, name: str):
+        attribute = getattr(self._target, name)
+        if name.startswith("_") or not callable(attribute):
+            return attribute
+
+        def _call(*args, **kwargs):
+            operation = _operation(self._service, name, args)
+            return self._telemetry.call(operation, attribute, *args, **kwargs)
+
+        return _call
+
+
+__all__ = ["CallSample", "Telemetry"]
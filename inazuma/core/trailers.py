@@ -0,0 +1,469 @@
+"""
+Resolution of youtube trailers to directly playable urls.
+
+Extracting a trailer with yt-dlp costs seconds of cpu and network, so the
+resolved urls are cached by youtube id and persisted across sessions. The
+urls youtube hands out are signed and stop working at the time in their
+``expire`` parameter; entries are refreshed in the background shortly
+before that happens so a cached trailer can always be played right away.
+
+The extraction itself is cpu heavy python that would otherwise compete with
+the kivy main thread for the GIL, so it runs in a long lived worker process
+that keeps one warm YoutubeDL instance around. The worker is a new
+interpreter executing this file as a script, talking json lines over its
+stdin and stdout; it is started with the first extraction, not before.
+"""
+
+import json
+import logging
+import math
+import queue
+import subprocess
+import sys
+import threading
+import time
+import urllib.parse
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Callable
+
+if TYPE_CHECKING:
+    from inazuma.core.telemetry import Telemetry
+
+TrailerCallback = Callable[[str | None], None]
+
+logger = logging.getLogger(__name__)
+
+# refresh entries this long before their signature expires
+REFRESH_MARGIN = 30 * 60
+# how long to trust a url that does not say when it expires
+DEFAULT_LIFETIME = 5 * 60 * 60
+# how often the gui side checks that the worker process is still alive
+WORKER_POLL_INTERVAL = 1.0
+
+
+def youtube_id(url: str) -> str | None:
+    """Returns the video id of a youtube watch or short link."""
+    parsed = urllib.parse.urlparse(url)
+    if parsed.hostname == "youtu.be":
+        return parsed.path.strip("/") or None
+    return urllib.parse.parse_qs(parsed.query).get("v", [None])[0]
+
+
+def trailer_format(max_frame_bytes: int, ytdlp_format: str = "best") -> str:
+    """The user's yt-dlp format, limited to decoded frames that fit in `max_frame_bytes`.
+
+    The player keeps frames as rgba textures, so a 16:9 frame of height h
+    takes h * h * 16 / 9 * 4 bytes. It plays a single url, so the alternatives
+    that merge separate video and audio streams are left out.
+    """
+    max_height = int(math.sqrt(max_frame_bytes / 4 * 9 / 16))
+    selector = ytdlp_format
+    if "(" not in selector:
+        alternatives = [a.strip() for a in selector.split("/") if "+" not in a]
+        selector = "/".join(filter(None, alternatives)) or "best"
+    # a filter after a group applies to every selector in it
+    return f"({selector})[height<=?{max_height}]/worst"
+
+
+def parse_expiry(url: str) -> float:
+    """Returns when a signed stream url stops working, as a unix timestamp."""
+    parsed = urllib.parse.urlparse(url)
+    expire = urllib.parse.parse_qs(parsed.query).get("expire", [""])[0]
+    if not expire:
+        # some urls carry their parameters in the path, /expire/<ts>/...
+        parts = parsed.path.split("/")
+        if "expire" in parts and parts.index("expire") + 1 < len(parts):
+            expire = parts[parts.index("expire") + 1]
+    try:
+        return float(expire)
+    except ValueError:
+        return time.time() + DEFAULT_LIFETIME
+
+
+@dataclass
+class TrailerEntry:
+    url: str
+    expires_at: float
+    format: str
+
+    def is_valid(self, margin: float = 0) -> bool:
+        return self.expires_at - margin > time.time()
+
+
+# ---------------the worker, this runs in its own process-------------------------
+def _serve(requests, results):
+    """Resolves batches of video ids until told to stop.
+
+    Every message waiting on `requests` is handled before the next extraction,
+    so a cancel drops an id that is still queued. An extraction that already
+    started runs to completion.
+    """
+    ydl, ydl_format = None, None
+    backlog: dict[str, str] = {}
+    # the results of the extraction that just ran: an id cancelled while it
+    # was extracted and asked for again meanwhile is answered from here
+    recent: dict[tuple[str, str], tuple] = {}
+    try:
+        while True:
+            try:
+                message = requests.get(block=False)
+            except queue.Empty:
+                recent.clear()
+                message = None if backlog else requests.get()
+            if message is not None:
+                match message:
+                    case ("resolve", video_ids, format):
+                        for video_id in video_ids:
+                            if result := recent.get((video_id, format)):
+                                results.put(result)
+                            else:
+                                backlog.setdefault(video_id, format)
+                    case ("cancel", video_ids):
+                        for video_id in video_ids:
+                            backlog.pop(video_id, None)
+                    case ("stop",):
+                        return
+                continue
+
+            video_id, format = next(iter(backlog.items()))
+            del backlog[video_id]
+            if ydl is None or format != ydl_format:
+                if ydl is not None:
+                    ydl.close()
+                ydl, ydl_format = _create_ydl(format), format
+            try:
+                info_dict = ydl.extract_info(
+                    f"https://www.youtube.com/watch?v={video_id}", download=False
+                )
+                url = info_dict.get("url") if info_dict else None
+                result = (video_id, url, None if url else "no playable url")
+            except Exception as e:
+                result = (video_id, None, str(e))
+            recent[(video_id, format)] = result
+            results.put(result)
+    finally:
+        if ydl is not None:
+            ydl.close()
+
+
+def _create_ydl(format: str):
+    import yt_dlp
+
+    ydl_opts = {
+        "format": format,
+        "logger": logger,
+        "remote_components": ("ejs:github", "ejs:npm"),
+    }
+    return yt_dlp.YoutubeDL(ydl_opts)  # type: ignore
+
+
+class _Output:
+    """The results side of `_serve` in the worker process: json lines on stdout."""
+
+    def __init__(self, stream):
+        self._stream = stream
+
+    def put(self, result: tuple):
+        self._stream.write(json.dumps(result) + "\n")
+        self._stream.flush()
+
+
+def _serve_stdio():
+    output = _Output(sys.stdout)
+    # anything else printed must not end up between the results
+    sys.stdout = sys.stderr
+    requests: queue.Queue = queue.Queue()
+
+    def _read():
+        for line in sys.stdin:
+            requests.put(tuple(json.loads(line)))
+        # the gui process is gone
+        requests.put(("stop",))
+
+    threading.Thread(target=_read, daemon=True).start()
+    _serve(requests, output)
+
+
+# ---------------the gui side of the worker-------------------------
+class _WorkerProcess:
+    """This file run as a script, with the queue-like ends `_collect` expects."""
+
+    def __init__(self):
+        self.requests = self
+        self.results: queue.Queue = queue.Queue()
+        self._process: subprocess.Popen | None = None
+
+    def start(self):
+        # -P keeps inazuma/core, this file's directory, off the worker's sys.path
+        self._process = subprocess.Popen(
+            [sys.executable, "-P", __file__],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            text=True,
+            bufsize=1,
+        )
+        threading.Thread(
+            target=self._read, daemon=True, name="trailer-worker-output"
+        ).start()
+
+    def _read(self):
+        assert self._process and self._process.stdout
+        for line in self._process.stdout:
+            try:
+                self.results.put(tuple(json.loads(line)))
+            except ValueError:
+                logger.debug(f"Ignoring trailer worker output: {line!r}")
+
+    def put(self, message: tuple):
+        assert self._process and self._process.stdin
+        try:
+            self._process.stdin.write(json.dumps(message) + "\n")
+            self._process.stdin.flush()
+        except (BrokenPipeError, ValueError):
+            # the worker died, `_collect` notices and fails what it had
+            pass
+
+    def is_alive(self) -> bool:
+        return self._process is not None and self._process.poll() is None
+
+
+class TrailerWorker:
+    """Feeds trailer extractions to the worker process and collects the results."""
+
+    def __init__(self, on_result: Callable[[str, str | None, str | None], None]):
+        self.on_result = on_result
+        self._requests = None
+        self._results = None
+        self._worker = None
+        self._in_flight: set[str] = set()
+        self._lock = threading.Lock()
+
+    def submit(self, video_ids: list[str], format: str):
+        """Queues a batch of ids, skipping the ones that are already being resolved."""
+        with self._lock:
+            batch = [id for id in dict.fromkeys(video_ids) if id not in self._in_flight]
+            if not batch:
+                return
+            self._ensure_started()
+            self._in_flight.update(batch)
+            self._requests.put(("resolve", batch, format))
+
+    def cancel(self, video_ids: list[str]):
+        with self._lock:
+            if self._requests is None:
+                return
+            cancelled = [id for id in video_ids if id in self._in_flight]
+            if cancelled:
+                self._in_flight.difference_update(cancelled)
+                self._requests.put(("cancel", cancelled))
+
+    def stop(self):
+        with self._lock:
+            if self._requests is not None:
+                self._requests.put(("stop",))
+            self._requests = self._results = self._worker = None
+            self._in_flight.clear()
+
+    def _ensure_started(self):
+        if self._worker is not None and self._worker.is_alive():
+            return
+        self._requests, self._results, self._worker = self._create_worker()
+        self._worker.start()
+        threading.Thread(
+            target=self._collect,
+            args=(self._results, self._worker),
+            daemon=True,
+            name="trailer-results",
+        ).start()
+
+    def _create_worker(self):
+        # like the post processor, the worker is a fresh interpreter running this
+        # file rather than a fork of the threaded gui process or a multiprocessing
+        # child, which would import the app; where no process can be started, in
+        # frozen and android builds, the worker loop runs on a thread
+        from inazuma.core.postprocess import can_isolate
+
+        if can_isolate():
+            worker = _WorkerProcess()
+            return worker.requests, worker.results, worker
+        requests, results = queue.Queue(), queue.Queue()
+        worker = threading.Thread(
+            target=_serve, args=(requests, results), daemon=True, name="trailer-worker"
+        )
+        return requests, results, worker
+
+    def _collect(self, results, worker):
+        while True:
+            try:
+                video_id, url, error = results.get(timeout=WORKER_POLL_INTERVAL)
+            except queue.Empty:
+                if worker.is_alive():
+                    continue
+                with self._lock:
+                    if worker is not self._worker:
+                        return
+                    # the worker died (or was stopped), fail whatever it still had
+                    failed = list(self._in_flight)
+                    self._in_flight.clear()
+                    self._worker = None
+                for video_id in failed:
+                    self.on_result(video_id, None, "trailer worker exited")
+                return
+            with self._lock:
+                self._in_flight.discard(video_id)
+            self.on_result(video_id, url, error)
+
+
+class TrailerCache:
+    """Resolves youtube trailers through the worker, caching the results on disk."""
+
+    def __init__(
+        self, cache_path: Path, format: str, telemetry: "Telemetry | None" = None
+    ):
+        self.cache_path = cache_path
+        self.format = format
+        self.telemetry = telemetry
+        self._entries: dict[str, TrailerEntry] = {}
+        self._callbacks: dict[str, list[TrailerCallback]] = {}
+        # when each pending extraction was asked for
+        self._requested: dict[str, float] = {}
+        self._expiring: list[str] = []
+        self._lock = threading.Lock()
+        self._worker = TrailerWorker(self._on_resolved)
+        self._load()
+
+    def get(self, video_id: str) -> str | None:
+        """Returns a playable url if one is cached, refreshing it when it is about to expire."""
+        with self._lock:
+            entry = self._entries.get(video_id)
+        hit = bool(entry and entry.format == self.format and entry.is_valid())
+        self._report("trailers.get", 0.0, cache_hit=hit)
+        if not entry or not hit:
+            return None
+        if not entry.is_valid(REFRESH_MARGIN):
+            self._submit([video_id])
+        return entry.url
+
+    def resolve(self, video_id: str, callback: TrailerCallback):
+        """Resolves a trailer in the worker and caches the url.
+
+        `callback` is called from a background thread with the url, or None on
+        failure. Several callers asking for the same id share one extraction.
+        """
+        self.resolve_many([video_id], callback)
+
+    def resolve_many(
+        self, video_ids: list[str], callback: TrailerCallback | None = None
+    ):
+        """Sends every id that is not cached yet to the worker as one batch."""
+        with self._lock:
+            now = time.perf_counter()
+            for video_id in video_ids:
+                self._requested.setdefault(video_id, now)
+                if callback:
+                    self._callbacks.setdefault(video_id, []).append(callback)
+        self._submit(video_ids)
+
+    def cancel(self, video_id: str, callback: TrailerCallback):
+        """Drops `callback`, and the extraction if nobody else is waiting for it."""
+        with self._lock:
+            callbacks = self._callbacks.get(video_id, [])
+            if callback in callbacks:
+                callbacks.remove(callback)
+            if callbacks:
+                return
+            self._callbacks.pop(video_id, None)
+            self._requested.pop(video_id, None)
+        self._worker.cancel([video_id])
+
+    def warm(self):
+        """Finds the entries about to expire, they are refreshed with the first extraction.
+
+        The worker is not started here: warmup runs at a lowered priority, which
+        a process or thread started from it would inherit.
+        """
+        with self._lock:
+            self._expiring = [
+                video_id
+                for video_id, entry in self._entries.items()
+                if entry.format == self.format and not entry.is_valid(REFRESH_MARGIN)
+            ]
+
+    def stop(self):
+        self._worker.stop()
+
+    def _on_resolved(self, video_id: str, url: str | None, error: str | None):
+        if url:
+            self._store(video_id, url)
+        else:
+            logger.warning(f"Failed to resolve trailer {video_id}: {error}")
+        with self._lock:
+            callbacks = self._callbacks.pop(video_id, [])
+            requested = self._requested.pop(video_id, None)
+        if requested is not None:
+            elapsed = time.perf_counter() - requested
+            error = None if url else error or "no url"
+            self._report("trailers.resolve", elapsed, error=error)
+        for callback in callbacks:
+            try:
+                callback(url)
+            except Exception as e:
+                logger.warning(f"Trailer callback failed: {e}")
+
+    def _report(self, operation: str, elapsed: float, **details):
+        if self.telemetry:
+            from inazuma.core.telemetry import CallSample
+
+            self.telemetry.record(CallSample(operation, elapsed, **details))
+
+    def _submit(self, video_ids: list[str]):
+        # the first extraction starts the worker, the expiring entries ride along
+        with self._lock:
+            expiring, self._expiring = self._expiring, []
+        self._worker.submit(video_ids + expiring, self.format)
+
+    def _store(self, video_id: str, url: str):
+        with self._lock:
+            self._entries[video_id] = TrailerEntry(url, parse_expiry(url), self.format)
+            self._save()
+
+    # ---------------persistence-------------------------
+    def _load(self):
+        try:
+            data = json.loads(self.cache_path.read_text(encoding="utf-8"))
+            entries = {id: TrailerEntry(**entry) for id, entry in data.items()}
+            self._entries = {
+                id: entry for id, entry in entries.items() if entry.is_valid()
+            }
+        except FileNotFoundError:
+            pass
+        except (ValueError, TypeError, AttributeError) as e:
+            logger.warning(f"Ignoring corrupt trailer cache: {e}")
+
+    def _save(self):
+        from viu_media.core.utils.file import AtomicWriter
+
+        # expired entries are useless, drop them so the file does not grow forever
+        entries = {
+            id: asdict(entry) for id, entry in self._entries.items() if entry.is_valid()
+        }
+        try:
+            self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+            with AtomicWriter(self.cache_path, mode="w", encoding="utf-8") as f:
+                json.dump(entries, f)
+        except OSError as e:
+            logger.warning(f"Could not save the trailer cache: {e}")
+
+
+__all__ = [
+    "TrailerCache",
+    "TrailerWorker",
+    "parse_expiry",
+    "trailer_format",
+    "youtube_id",
+]
+
+
+if __name__ == "__main__":
+    _serve_stdio()
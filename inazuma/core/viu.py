@@ -1,7 +1,9 @@
 from dataclasses import dataclass
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Literal
 
 if TYPE_CHECKING:
+    import httpx
+    from pathlib import Path
     from viu_media.core.config import AppConfig
     from viu_media.libs.media_api.base import BaseApiClient
     from viu_media.libs.provider.anime.base import BaseAnimeProvider
@@ -11,6 +13,61 @@ if TYPE_CHECKING:
     from viu_media.core.downloader.base import BaseDownloader
     from viu_media.libs.player.base import BasePlayer
     from viu_media.cli.service.auth import AuthService
+    from inazuma.core.library import Library
+    from inazuma.core.postprocess import PostProcessor
+    from inazuma.core.disk_space import DiskSpaceGuard
+    from inazuma.core.trailers import TrailerCache
+    from inazuma.core.stream_proxy import StreamProxy
+    from inazuma.core.bandwidth import BandwidthEstimator
+    from inazuma.core.fake_backend import FakeBackend
+    from inazuma.core.telemetry import Telemetry
+    from inazuma.core.http_pool import HttpPool
+    from inazuma.core.config_writer import ConfigWriter
+    from inazuma.core.media_index import MediaIndex
+
+
+# what each service is built from: a viu config section, one of its fields, or
+# one of Viu's own options; "auth_profile" is the saved login. Sections handed
+# to a service by reference, like the media api's, apply their changes live and
+# are left out, as are the services the app updates in place: the stream
+# proxy, the trailer cache, the disk space guard and the media index
+SERVICE_INPUTS: dict[str, set[str]] = {
+    "auth": {"general.media_api"},
+    "media_api": {"general.media_api", "auth_profile"},
+    "anime_provider": {"general.provider"},
+    "registry_service": {"general.media_api", "media_registry"},
+    "player": {"stream.player"},
+    "player_service": {"stream.player"},
+    "downloader": {"downloads.downloader", "downloader_engine", "download_connections"},
+    "download_service": {"downloads.downloader"},
+    "post_processor": {"post_processing_workers"},
+    "library": {"downloads.downloads_dir"},
+}
+# the services each service is built on, and that it has to be rebuilt with
+SERVICE_DEPENDENCIES: dict[str, set[str]] = {
+    "media_api": {"auth"},
+    "player_service": {"anime_provider", "registry_service"},
+    "download_service": {"registry_service", "media_api", "anime_provider"},
+}
+
+
+def affected_services(*changed: str) -> set[str]:
+    """The services built from the `changed` inputs, and the ones built on them."""
+    affected = {
+        service
+        for service, inputs in SERVICE_INPUTS.items()
+        for input in inputs
+        for key in changed
+        if key == input or key.startswith(f"{input}.")
+    }
+    pending = list(affected)
+    while pending:
+        service = pending.pop()
+        for dependent, dependencies in SERVICE_DEPENDENCIES.items():
+            if service in dependencies and dependent not in affected:
+                affected.add(dependent)
+                pending.append(dependent)
+    return affected
 
 
 @dataclass
@@ -24,24 +81,85 @@ class Viu:
     _player_service: "PlayerService | None" = None
     _downloader: "BaseDownloader | None" = None
     _download_service: "DownloadService | None" = None
+    _library: "Library | None" = None
+    _post_processor: "PostProcessor | None" = None
+    _disk_space: "DiskSpaceGuard | None" = None
+    _trailers: "TrailerCache | None" = None
+    _stream_proxy: "StreamProxy | None" = None
+    _bandwidth: "BandwidthEstimator | None" = None
+    _fake_backend: "FakeBackend | None" = None
+    _telemetry: "Telemetry | None" = None
+    _http_pool: "HttpPool | None" = None
+    _config_writer: "ConfigWriter | None" = None
+    _media_index: "MediaIndex | None" = None
+    # "fake" swaps the media api, provider, downloader and player for the
+    # stand-ins of inazuma.core.fake_backend, described by the profile
+    backend: Literal["viu", "fake"] = "viu"
+    fake_backend_profile: "Path | None" = None
+    # inazuma specific download options, these are not part of viu's AppConfig
+    downloader_engine: Literal["viu", "segmented"] = "viu"
+    download_connections: int = 4
+    post_processing_workers: int = 1
+    min_free_space: int = 512 * 1024 * 1024
+    stream_cache_size: int = 1024 * 1024 * 1024
+    stream_read_ahead: int = 16 * 1024 * 1024
+    quality_mode: Literal["fixed", "adaptive"] = "fixed"
+    trailer_frame_memory: int = 4 * 1024 * 1024
+
+    def invalidate(self, *changed: str) -> set[str]:
+        """Drops the services affected by the `changed` inputs, to be rebuilt on use.
+
+        The others, with their connections, logins and caches, are kept.
+        """
+        affected = affected_services(*changed)
+        for name in affected:
+            service = getattr(self, f"_{name}")
+            setattr(self, f"_{name}", None)
+            if service:
+                self._retire(name, service)
+        return affected
+
+    def _retire(self, name: str, service):
+        import weakref
+
+        import httpx
 
-    def reset(self):
-        self._media_api = None
-        self._anime_provider = None
-        self._registry_service = None
-        self._player = None
-        self._player_service = None
-        self._downloader = None
-        self._download_service = None
+        if name == "post_processor":
+            service.shutdown()
+        elif name == "library":
+            service.stop()
+            # the screens listen to the library, so its successor takes over now
+            library = self.library
+            for listener in service.listeners:
+                library.add_listener(listener)
+            library.start()
+        # the instrumented services are proxies, their calls hold the service
+        service = getattr(service, "_target", service)
+        client = getattr(service, "http_client", None) or getattr(
+            service, "client", None
+        )
+        pool = self._http_pool
+        if not isinstance(client, httpx.Client) or (
+            pool and client._transport in (pool.transport, pool._uncapped)
+        ):
+            # a client of the shared pool has nothing of its own to close, its
+            # connections stay in the pool for the successor
+            return
+        # closed once the calls still running on the old service are done
+        weakref.finalize(service, client.close)
 
     @property
     def media_api(self) -> "BaseApiClient":
+        if not self._media_api and self.backend == "fake":
+            self._media_api = self.telemetry.instrument(
+                "media_api", self.fake_backend.media_api()
+            )
         if not self._media_api:
             from viu_media.libs.media_api.api import create_api_client
 
-            self._media_api = create_api_client(
-                self.config.general.media_api, self.config
-            )
+            media_api = create_api_client(self.config.general.media_api, self.config)
+            media_api.http_client = self._pooled(media_api.http_client)
+            self._media_api = self.telemetry.instrument("media_api", media_api)
             # authenticate if we have credentials
             auth_service = self.auth
             auth_profile = auth_service.get_auth()
@@ -51,10 +169,19 @@ class Viu:
 
     @property
     def anime_provider(self) -> "BaseAnimeProvider":
+        if not self._anime_provider and self.backend == "fake":
+            self._anime_provider = self.telemetry.instrument(
+                "anime_provider[fake]", self.fake_backend.anime_provider()
+            )
         if not self._anime_provider:
             from viu_media.libs.provider.anime.provider import create_provider
 
-            self._anime_provider = create_provider(self.config.general.provider)
+            provider = self.config.general.provider
+            anime_provider = create_provider(provider)
+            anime_provider.client = self._pooled(anime_provider.client)
+            self._anime_provider = self.telemetry.instrument(
+                f"anime_provider[{provider.value}]", anime_provider
+            )
         return self._anime_provider
 
     @property
@@ -62,11 +189,15 @@ class Viu:
         if not self._auth:
             from viu_media.cli.service.auth import AuthService
 
-            self._auth = AuthService(self.config.general.media_api)
+            self._auth = self.telemetry.instrument(
+                "auth", AuthService(self.config.general.media_api)
+            )
         return self._auth
 
     @property
     def player(self) -> "BasePlayer":
+        if not self._player and self.backend == "fake":
+            self._player = self.fake_backend.player(self.config)
         if not self._player:
             from viu_media.libs.player import create_player
 
@@ -96,10 +227,22 @@ class Viu:
 
     @property
     def downloader(self) -> "BaseDownloader":
+        if not self._downloader and self.backend == "fake":
+            self._downloader = self.fake_backend.downloader(self.config)
         if not self._downloader:
             from viu_media.core.downloader import create_downloader
 
-            self._downloader = create_downloader(self.config.downloads)
+            if self.downloader_engine == "segmented":
+                from inazuma.core.segmented_downloader import SegmentedDownloader
+
+                self._downloader = SegmentedDownloader(
+                    self.config.downloads, self.download_connections
+                )
+            else:
+                self._downloader = create_downloader(self.config.downloads)
+            self._downloader.client = self._pooled(
+                self._downloader.client, capped=False
+            )
         return self._downloader
 
     @property
@@ -111,3 +254,175 @@ class Viu:
                 self.config, self.registry_service, self.media_api, self.anime_provider
             )
         return self._download_service
+
+    @property
+    def library(self) -> "Library":
+        if not self._library:
+            from viu_media.core.constants import APP_DATA_DIR
+            from inazuma.core.library import Library
+
+            self._library = Library(
+                self.config.downloads.downloads_dir,
+                APP_DATA_DIR / "library.json",
+                known_titles=self._registry_titles,
+            )
+        return self._library
+
+    def _registry_titles(self) -> dict[str, int]:
+        """Download directory name -> media id, from viu's media registry."""
+        from viu_media.core.utils.file import sanitize_filename
+
+        titles: dict[str, int] = {}
+        for record in self.registry_service.get_all_media_records():
+            media_item = record.media_item
+            for episode in record.media_episodes:
+                if episode.file_path:
+                    titles[episode.file_path.parent.name] = media_item.id
+            # viu names the directory after the english title, sanitized
+            for title in (media_item.title.english, media_item.title.romaji):
+                if title:
+                    titles.setdefault(sanitize_filename(title), media_item.id)
+        return titles
+
+    @property
+    def post_processor(self) -> "PostProcessor":
+        if not self._post_processor:
+            from inazuma.core.postprocess import PostProcessor
+
+            self._post_processor = PostProcessor(self.post_processing_workers)
+        return self._post_processor
+
+    @property
+    def disk_space(self) -> "DiskSpaceGuard":
+        if not self._disk_space:
+            from inazuma.core.disk_space import DiskSpaceGuard
+
+            self._disk_space = DiskSpaceGuard(self.min_free_space)
+        return self._disk_space
+
+    @property
+    def trailers(self) -> "TrailerCache":
+        from inazuma.core.trailers import trailer_format
+
+        format = trailer_format(
+            self.trailer_frame_memory, self.config.downloads.ytdlp_format
+        )
+        if not self._trailers:
+            from viu_media.core.constants import APP_DATA_DIR
+            from inazuma.core.trailers import TrailerCache
+
+            self._trailers = TrailerCache(
+                APP_DATA_DIR / "trailers.json", format, telemetry=self.telemetry
+            )
+        # the cache outlives config changes, so follow the frame memory cap
+        self._trailers.format = format
+        return self._trailers
+
+    @property
+    def stream_proxy(self) -> "StreamProxy":
+        if not self._stream_proxy:
+            import httpx
+            from viu_media.core.constants import APP_CACHE_DIR
+            from inazuma.core.stream_proxy import StreamProxy
+
+            self._stream_proxy = StreamProxy(
+                APP_CACHE_DIR / "streams",
+                self.stream_cache_size,
+                self.stream_read_ahead,
+                client=self.http_pool.client(
+                    capped=False,
+                    follow_redirects=True,
+                    timeout=httpx.Timeout(15.0, connect=30.0),
+                ),
+                bandwidth=self.bandwidth,
+            )
+        return self._stream_proxy
+
+    @property
+    def fake_backend(self) -> "FakeBackend":
+        if not self._fake_backend:
+            from inazuma.core.fake_backend import FakeBackend
+
+            if not self.fake_backend_profile:
+                raise ValueError("The fake backend needs a profile")
+            self._fake_backend = FakeBackend.load(self.fake_backend_profile)
+        return self._fake_backend
+
+    @property
+    def bandwidth(self) -> "BandwidthEstimator":
+        if not self._bandwidth:
+            from inazuma.core.bandwidth import BandwidthEstimator
+
+            self._bandwidth = BandwidthEstimator()
+        return self._bandwidth
+
+    @property
+    def telemetry(self) -> "Telemetry":
+        if not self._telemetry:
+            from inazuma.core.telemetry import Telemetry
+
+            self._telemetry = Telemetry()
+        return self._telemetry
+
+    @property
+    def http_pool(self) -> "HttpPool":
+        if not self._http_pool:
+            from inazuma.core.http_pool import HttpPool
+
+            self._http_pool = HttpPool()
+        return self._http_pool
+
+    @property
+    def config_writer(self) -> "ConfigWriter":
+        """Saves `config` to viu's config file, in the background."""
+        if not self._config_writer:
+            from viu_media.cli.config.generate import (
+                generate_config_toml_from_app_model,
+            )
+            from viu_media.core.constants import USER_CONFIG
+            from inazuma.core.config_writer import ConfigWriter
+
+            self._config_writer = ConfigWriter(
+                USER_CONFIG, lambda: generate_config_toml_from_app_model(self.config)
+            )
+        return self._config_writer
+
+    @property
+    def media_index(self) -> "MediaIndex":
+        """Every media item received so far, for the search screen's local matches."""
+        if not self._media_index:
+            from viu_media.core.constants import APP_CACHE_DIR
+            from inazuma.core.media_index import MediaIndex
+
+            self._media_index = MediaIndex(APP_CACHE_DIR / "media_index.json")
+        return self._media_index
+
+    def _pooled(self, client: "httpx.Client", capped: bool = True) -> "httpx.Client":
+        """A client like `client` that sends through the shared pool instead.
+
+        A client that does not verify certificates, or that goes through
+        proxies, keeps its own transport: the pool verifies and connects directly.
+        """
+        import ssl
+
+        pool = getattr(client._transport, "_pool", None)
+        context = getattr(pool, "_ssl_context", None)
+        if (context and context.verify_mode == ssl.CERT_NONE) or any(
+            client._mounts.values()
+        ):
+            return client
+        pooled = self.http_pool.client(
+            capped=capped,
+            auth=client.auth,
+            params=client.params,
+            headers=client.headers,
+            cookies=client.cookies,
+            timeout=client.timeout,
+            follow_redirects=client.follow_redirects,
+            max_redirects=client.max_redirects,
+            event_hooks=client.event_hooks,
+            base_url=client.base_url,
+            trust_env=client.trust_env,
+        )
+        client.close()
+        return pooled
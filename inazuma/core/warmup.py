@@ -0,0 +1,119 @@
+"""
+Warming the services up in the background once the app is on screen.
+
+Viu creates its services on first access, which is always in the middle of
+something the user did: the first carousel fetch logs in to the media api,
+the first anime opened loads the provider. Started right after the first
+frame, the warmup does that work ahead of time on a thread of its own, at a
+lower scheduling priority where the platform allows it: it creates and
+authenticates the services, opens connections to their hosts in the shared
+http pool and loads the on-disk caches and the local media index.
+
+Each step is timed and recorded in the telemetry as ``warmup.<step>``. A
+step that fails is logged and skipped; the service is then created on first
+access as before.
+"""
+
+import logging
+import os
+import sys
+import threading
+import time
+from typing import TYPE_CHECKING, Callable
+
+from .telemetry import CallSample
+
+if TYPE_CHECKING:
+    from .viu import Viu
+
+logger = logging.getLogger(__name__)
+
+# the niceness of the warmup thread, on platforms that schedule threads apart
+WARMUP_NICENESS = 10
+
+# where the first requests of each media api and provider go
+MEDIA_API_URLS = {
+    "anilist": "https://graphql.anilist.co",
+    "jikan": "https://api.jikan.moe/v4",
+}
+PROVIDER_URLS = {
+    "allanime": "https://api.allanime.day/api/",
+    "animepahe": "https://animepahe.pw",
+    "animeunity": "https://www.animeunity.so",
+}
+
+
+def _lower_priority():
+    # linux schedules every thread on its own, so only the warmup is niced;
+    # the threads and processes it starts inherit the niceness
+    if not sys.platform.startswith("linux"):
+        return
+    try:
+        os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), WARMUP_NICENESS)
+    except OSError as e:
+        logger.debug(f"Could not lower the warmup priority: {e}")
+
+
+class Warmup:
+    """Creates the services of `viu` ahead of their first use, see the module docstring."""
+
+    def __init__(self, viu: "Viu"):
+        self.viu = viu
+        self.done = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def steps(self) -> list[tuple[str, Callable[[], object]]]:
+        viu = self.viu
+        steps: list[tuple[str, Callable[[], object]]] = [
+            # the media api logs in as it is created
+            ("media_api", lambda: viu.media_api),
+            ("anime_provider", lambda: viu.anime_provider),
+        ]
+        if viu.backend == "viu":
+            urls = {
+                "media_api": MEDIA_API_URLS.get(viu.config.general.media_api),
+                "anime_provider": PROVIDER_URLS.get(viu.config.general.provider.value),
+            }
+            for service, url in urls.items():
+                if url:
+                    steps.append(
+                        (
+                            f"connect.{service}",
+                            lambda url=url: viu.http_pool.preconnect(url),
+                        )
+                    )
+        steps += [
+            ("registry_service", lambda: viu.registry_service),
+            ("media_index", lambda: viu.media_index.load()),
+            ("trailers", lambda: viu.trailers.warm()),
+            ("stream_proxy", lambda: viu.stream_proxy),
+        ]
+        return steps
+
+    def start(self):
+        if self._thread:
+            return
+        self._thread = threading.Thread(target=self._run, name="warmup", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        _lower_priority()
+        started = time.perf_counter()
+        for name, step in self.steps():
+            step_started = time.perf_counter()
+            error = None
+            try:
+                step()
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}"
+                logger.warning(f"Warming up {name} failed: {error}")
+            self.viu.telemetry.record(
+                CallSample(
+                    f"warmup.{name}", time.perf_counter() - step_started, error=error
+                )
+            )
+        logger.info(f"Warmed the services up in {time.perf_counter() - started:.2f}s")
+        self.done.set()
+
+
+__all__ = ["Warmup"]
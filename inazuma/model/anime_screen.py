@@ -12,6 +12,7 @@ from typing import TYPE_CHECKING
 from dataclasses import dataclass
 
 if TYPE_CHECKING:
+    from pathlib import Path
     from viu_media.libs.media_api.types import MediaItem
     from viu_media.libs.provider.anime.types import Anime, Server, EpisodeStream
     from inazuma.core.viu import Viu
@@ -27,6 +28,15 @@ class CurrentState:
     episode_stream: "EpisodeStream | None" = None
 
 
+@dataclass
+class EpisodeStreams:
+    """The servers found for an episode of the anime of `state`."""
+
+    state: CurrentState
+    episode: str
+    servers: list["Server"]
+
+
 class AnimeScreenModel(BaseScreenModel):
     """the Anime screen model"""
 
@@ -44,6 +54,10 @@ class AnimeScreenModel(BaseScreenModel):
         self.viu = viu
         self.current_state = CurrentState()
 
+    def open(self, media_item: "MediaItem"):
+        """Starts over with `media_item`, dropping what was found for the previous one."""
+        self.current_state = CurrentState(media_item=media_item)
+
     def get_anime_data_from_provider(self, media_item: "MediaItem") -> "Anime | None":
         from viu_media.libs.provider.anime.params import SearchParams, AnimeParams
         from viu_media.cli.utils.search import find_best_match_title
@@ -73,45 +87,55 @@ class AnimeScreenModel(BaseScreenModel):
                 media_item,
             )
             provider_anime = provider_results_map[result]
-            initial_state = self.current_state
-            self.current_state.provider_anime = (
-                anime_provider.get(
-                    AnimeParams(
-                        query=media_item.title.romaji or media_item.title.english,
-                        id=provider_anime.id,
-                    )
+            anime = anime_provider.get(
+                AnimeParams(
+                    query=media_item.title.romaji or media_item.title.english,
+                    id=provider_anime.id,
                 )
-                or initial_state.provider_anime
             )
-
-            if (
-                initial_state.provider_anime != self.current_state.provider_anime
-                and self.current_state.provider_anime
-            ):
+            if self.current_state.media_item is not media_item:
+                # another anime was opened while this one was looked up
+                return anime
+            if anime:
                 Logger.debug(
                     f"Got data of {provider_anime.title} from {self.viu.config.general.provider} provider"
                 )
-
-            self.current_state.media_item = media_item
-            return self.current_state.provider_anime
+            self.current_state.provider_anime = anime
+            if anime:
+                self.changed("provider_anime", anime)
+            return anime
         except Exception as e:
             Logger.info("anime_screen error: %s" % e)
             return
 
-    def get_episode_streams(self, episode: str) -> list["Server"]:
+    def get_episode_streams(self, episode: str, preload=False) -> list["Server"]:
+        """Fetches the servers of `episode` and publishes them to the views.
+
+        They are published as `preloaded_streams` for a `preload`, and only if
+        there are any, otherwise as `episode_streams`; in both cases only if no
+        other anime was opened meanwhile.
+        """
+        state = self.current_state
+        servers = self._fetch_episode_streams(state, episode)
+        if self.current_state is state and (servers or not preload):
+            change = "preloaded_streams" if preload else "episode_streams"
+            self.changed(change, EpisodeStreams(state, episode, servers))
+        return servers
+
+    def _fetch_episode_streams(
+        self, state: CurrentState, episode: str
+    ) -> list["Server"]:
         from viu_media.libs.provider.anime.params import EpisodeStreamsParams
 
         try:
-            if not (
-                self.current_state.provider_anime and self.current_state.media_item
-            ):
+            if not (state.provider_anime and state.media_item):
                 return []
 
             streams = self.viu.anime_provider.episode_streams(
                 EpisodeStreamsParams(
-                    query=self.current_state.media_item.title.romaji
-                    or self.current_state.media_item.title.english,
-                    anime_id=self.current_state.provider_anime.id,
+                    query=state.media_item.title.romaji
+                    or state.media_item.title.english,
+                    anime_id=state.provider_anime.id,
                     episode=episode,
                     translation_type=self.viu.config.stream.translation_type,
                     quality=self.viu.config.stream.quality,
@@ -127,8 +151,22 @@ class AnimeScreenModel(BaseScreenModel):
             Logger.error("anime_screen error: %s" % e)
             return []
 
+    def get_local_episode(self, media_id: int, episode: str) -> "Path | None":
+        return self.viu.library.get(media_id, episode)
+
+    def get_local_episodes(self, media_id: int) -> list[str]:
+        """The downloaded episodes of a media in episode order."""
+
+        def _episode_number(episode: str):
+            try:
+                return (0, float(episode), episode)
+            except ValueError:
+                return (1, 0.0, episode)
+
+        return sorted(self.viu.library.episodes(media_id), key=_episode_number)
+
     # def get_anime_data(self, id: int):
     #     return AniList.get_anime(id)
 
 
-__all__ = ["AnimeScreenModel"]
+__all__ = ["AnimeScreenModel", "CurrentState", "EpisodeStreams"]
@@ -5,32 +5,64 @@
 # model when they are notified (in this case, it is the `model_is_changed`
 # method). For this, observers must be descendants of an abstract class,
 # inheriting which, the `model_is_changed` method must be overridden.
+#
+# The observers are subscribed on the event bus to the `ModelChanged` events
+# of their screen, so the bus holds them weakly and notifying one is a lookup
+# delivered on the next frame, whichever thread the model changed on. Views
+# are named after they are created, so an observer's subscription follows its
+# name as it changes. Models publish what they fetched with `changed`, from
+# the thread that fetched it, and each of their views gets it on the next frame.
+
+import weakref
+
+from inazuma.utility.events import ModelChanged, bus
+
+# observer -> the name it is subscribed under
+_subscribed: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
 
 
 class BaseScreenModel:
     """Implements a base class for model modules."""
 
-    _observers = []
+    def __init__(self) -> None:
+        # the views of this model, to publish its changes to
+        self._observers: weakref.WeakSet = weakref.WeakSet()
 
     def add_observer(self, observer) -> None:
-        self._observers.append(observer)
+        self._observers.add(observer)
+        self._on_observer_name(observer, observer.name)
+        observer.fbind("name", self._on_observer_name)
 
     def remove_observer(self, observer) -> None:
-        self._observers.remove(observer)
+        self._observers.discard(observer)
+        observer.funbind("name", self._on_observer_name)
+        if (name := _subscribed.pop(observer, None)) is not None:
+            bus.unsubscribe(ModelChanged, observer.model_is_changed, key=name)
 
-    def notify_observers(self, name_screen: str) -> None:
+    def _on_observer_name(self, observer, name: str) -> None:
+        if (previous := _subscribed.get(observer)) is not None:
+            bus.unsubscribe(ModelChanged, observer.model_is_changed, key=previous)
+        _subscribed[observer] = name
+        bus.subscribe(ModelChanged, observer.model_is_changed, key=name)
+
+    def notify_observers(self, name_screen: str, change: str = "", data=None) -> None:
         """
         Method that will be called by the observer when the model data changes.
 
         :param name_screen:
             name of the view for which the method should be called
             :meth:`model_is_changed`.
+        :param change: what changed, see :class:`ModelChanged`.
+        :param data: the new data.
         """
 
-        for observer in self._observers:
-            if observer.name == name_screen:
-                observer.model_is_changed()
-                break
+        bus.publish(ModelChanged(name_screen, change, data))
+
+    def changed(self, change: str, data=None) -> None:
+        """Publishes `change` of this model, with its `data`, to all of its views."""
+        for observer in list(self._observers):
+            if (name := _subscribed.get(observer)) is not None:
+                self.notify_observers(name, change, data)
 
 
 __all__ = ["BaseScreenModel"]
@@ -16,36 +16,45 @@ class HomeScreenModel(BaseScreenModel):
         super().__init__()
         self.viu = viu
 
+    def search_media(self, list_name: str, params: MediaSearchParams):
+        """Fetches the list `list_name` and publishes it to the views."""
+        result = self.viu.media_api.search_media(params)
+        if result:
+            self.viu.media_index.add(result.media)
+            self.changed("anime_list", (list_name, result))
+        return result
+
     def get_trending_anime(self):
-        return self.viu.media_api.search_media(
-            MediaSearchParams(sort=MediaSort.TRENDING_DESC)
+        return self.search_media(
+            "Trending", MediaSearchParams(sort=MediaSort.TRENDING_DESC)
         )
 
     def get_most_favourite_anime(self):
-        return self.viu.media_api.search_media(
-            MediaSearchParams(sort=MediaSort.FAVOURITES_DESC)
+        return self.search_media(
+            "Most Favourite", MediaSearchParams(sort=MediaSort.FAVOURITES_DESC)
         )
 
     def get_most_recently_updated_anime(self):
-        return self.viu.media_api.search_media(
-            MediaSearchParams(sort=MediaSort.UPDATED_AT_DESC)
+        return self.search_media(
+            "Recently Updated", MediaSearchParams(sort=MediaSort.UPDATED_AT_DESC)
         )
 
     def get_most_popular_anime(self):
-        return self.viu.media_api.search_media(
-            MediaSearchParams(sort=MediaSort.POPULARITY_DESC)
+        return self.search_media(
+            "Most Popular", MediaSearchParams(sort=MediaSort.POPULARITY_DESC)
         )
 
     def get_most_scored_anime(self):
-        return self.viu.media_api.search_media(
-            MediaSearchParams(sort=MediaSort.SCORE_DESC)
+        return self.search_media(
+            "Most Scored", MediaSearchParams(sort=MediaSort.SCORE_DESC)
         )
 
     def get_upcoming_anime(self):
-        return self.viu.media_api.search_media(
+        return self.search_media(
+            "Upcoming",
             MediaSearchParams(
                 status=MediaStatus.NOT_YET_RELEASED, sort=MediaSort.POPULARITY_DESC
-            )
+            ),
         )
 
 
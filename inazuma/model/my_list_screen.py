@@ -16,32 +16,46 @@ class MyListScreenModel(BaseScreenModel):
         super().__init__()
         self.viu = viu
 
+    def search_media_list(self, list_name: str, params: UserMediaListSearchParams):
+        """Fetches the list `list_name` of the user and publishes it to the views."""
+        result = self.viu.media_api.search_media_list(params)
+        if result:
+            self.viu.media_index.add(result.media)
+            self.changed("anime_list", (list_name, result))
+        return result
+
     def get_watching(self):
-        return self.viu.media_api.search_media_list(
-            UserMediaListSearchParams(status=UserMediaListStatus.WATCHING)
+        return self.search_media_list(
+            "Watching",
+            UserMediaListSearchParams(status=UserMediaListStatus.WATCHING),
         )
 
     def get_paused(self):
-        return self.viu.media_api.search_media_list(
-            UserMediaListSearchParams(status=UserMediaListStatus.PAUSED)
+        return self.search_media_list(
+            "Paused",
+            UserMediaListSearchParams(status=UserMediaListStatus.PAUSED),
         )
 
     def get_planning(self):
-        return self.viu.media_api.search_media_list(
-            UserMediaListSearchParams(status=UserMediaListStatus.PLANNING)
+        return self.search_media_list(
+            "Planning",
+            UserMediaListSearchParams(status=UserMediaListStatus.PLANNING),
         )
 
     def get_completed(self):
-        return self.viu.media_api.search_media_list(
-            UserMediaListSearchParams(status=UserMediaListStatus.COMPLETED)
+        return self.search_media_list(
+            "Completed",
+            UserMediaListSearchParams(status=UserMediaListStatus.COMPLETED),
         )
 
     def get_dropped(self):
-        return self.viu.media_api.search_media_list(
-            UserMediaListSearchParams(status=UserMediaListStatus.DROPPED)
+        return self.search_media_list(
+            "Dropped",
+            UserMediaListSearchParams(status=UserMediaListStatus.DROPPED),
         )
 
     def get_repeating(self):
-        return self.viu.media_api.search_media_list(
-            UserMediaListSearchParams(status=UserMediaListStatus.REPEATING)
+        return self.search_media_list(
+            "Repeating",
+            UserMediaListSearchParams(status=UserMediaListStatus.REPEATING),
         )
@@ -12,8 +12,13 @@ from viu_media.libs.media_api.types import (
 from .base_model import BaseScreenModel
 
 if TYPE_CHECKING:
+    from viu_media.libs.media_api.types import MediaItem
     from inazuma.core.viu import Viu
 
+# the filters the local index cannot apply; with any of them set only the
+# remote results are shown
+NARROWING_FILTERS = ("status", "genre", "tag", "format", "season", "year")
+
 
 class SearchScreenModel(BaseScreenModel):
     viu: "Viu"
@@ -22,14 +27,47 @@ class SearchScreenModel(BaseScreenModel):
         super().__init__()
         self.viu = viu
 
+    def search_media(self, params: MediaSearchParams):
+        result = self.viu.media_api.search_media(params)
+        if result:
+            # everything received is searchable locally from then on
+            self.viu.media_index.add(result.media)
+        return result
+
     def get_trending(self):
-        return self.viu.media_api.search_media(
+        result = self.search_media(
             MediaSearchParams(
                 sort=MediaSort.TRENDING_DESC, per_page=self.viu.config.anilist.per_page
             )
         )
-
-    def search_for_anime(self, anime_title, filters={}):
+        if result:
+            self.changed("trending", result)
+        return result
+
+    def search_for_anime(
+        self, anime_title, filters=None, local_matches=None, generation=None
+    ):
+        """Searches for `anime_title` and publishes the results to the views.
+
+        The `local_matches` shown while searching and the `generation` of the
+        search ride along, for the view to keep the former and tell whether
+        something newer was shown meanwhile.
+        """
+        result = self.search_media(self._search_params(anime_title, filters or {}))
+        if result:
+            self.changed("search_results", (result, local_matches, generation))
+        return result
+
+    def search_locally(self, anime_title, filters=None) -> list["MediaItem"]:
+        """The anime seen before that match `anime_title`, best first."""
+        filters = filters or {}
+        if any(
+            filters.get(name) not in (None, "DISABLED") for name in NARROWING_FILTERS
+        ):
+            return []
+        return self.viu.media_index.search(anime_title)
+
+    def _search_params(self, anime_title, filters) -> MediaSearchParams:
         # Filter out disabled/None values
         filters = {k: v for k, v in filters.items() if v not in [None, "DISABLED"]}
 
@@ -74,7 +112,7 @@ class SearchScreenModel(BaseScreenModel):
         if "year" in filters:
             search_params["seasonYear"] = int(filters["year"])
 
-        return self.viu.media_api.search_media(MediaSearchParams(**search_params))
+        return MediaSearchParams(**search_params)
 
 
 __all__ = ["SearchScreenModel"]
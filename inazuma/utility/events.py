@@ -0,0 +1,163 @@
+"""
+A typed publish/subscribe event bus delivering on the kivy main thread.
+
+Events are dataclasses and their type is the topic: handlers subscribe to an
+event type, optionally only to the events of it with a given `key`, like the
+name of a screen or the id of a download. Anything can publish from any
+thread; the events are queued and delivered together once per frame, in the
+order they were published. Events of a type that sets `coalesce` replace a
+pending one with the same key, so a download reporting progress dozens of
+times a frame is delivered once with its latest figures.
+
+Bound methods are held by weak reference, so subscribing does not keep a view
+alive and a collected view drops out of the bus by itself; other callables
+are held strongly until unsubscribed.
+"""
+
+import threading
+import weakref
+from dataclasses import dataclass
+from typing import Any, Callable, ClassVar, TypeVar
+
+from kivy.clock import Clock
+from kivy.logger import Logger
+
+E = TypeVar("E", bound="Event")
+Handler = Callable[[Any], None]
+Topic = tuple[type, Any]
+
+
+@dataclass(frozen=True)
+class Event:
+    # later events with the same key replace an undelivered one
+    coalesce: ClassVar[bool] = False
+
+    @property
+    def key(self) -> Any:
+        return None
+
+
+@dataclass(frozen=True)
+class ModelChanged(Event):
+    """A screen's model has new data for its view.
+
+    `change` names what changed, like a fetched list, and `data` carries it.
+    """
+
+    screen: str
+    change: str = ""
+    data: Any = None
+
+    @property
+    def key(self) -> str:
+        return self.screen
+
+
+@dataclass(frozen=True)
+class DownloadProgress(Event):
+    """A progress report of a running download, as viu's hooks give it."""
+
+    coalesce: ClassVar[bool] = True
+    task_id: str
+    data: dict
+
+    @property
+    def key(self) -> str:
+        return self.task_id
+
+
+@dataclass(frozen=True)
+class AuthChanged(Event):
+    """The user logged in, as `username`, or out."""
+
+    username: str | None
+
+
+def _reference(handler: Handler, on_collected) -> Callable[[], Handler | None]:
+    if hasattr(handler, "__self__") and hasattr(handler, "__func__"):
+        return weakref.WeakMethod(handler, on_collected)  # type: ignore
+    return lambda: handler
+
+
+class EventBus:
+    """Routes events to their subscribers, see the module docstring."""
+
+    def __init__(self):
+        self._subscribers: dict[Topic, dict[Any, Callable[[], Handler | None]]] = {}
+        self._pending: dict[Any, Event] = {}
+        # reentrant: a collected handler drops out from a gc run, which may
+        # happen on a thread that holds the lock already
+        self._lock = threading.RLock()
+        self._trigger = Clock.create_trigger(self._deliver)
+        self._sequence = 0
+
+    def subscribe(
+        self, event_type: type[E], handler: Callable[[E], None], key: Any = None
+    ):
+        """Calls `handler` with the events of `event_type`, or only those with `key`."""
+        topic = (event_type, key)
+
+        def _on_collected(reference):
+            with self._lock:
+                self._subscribers.get(topic, {}).pop(reference, None)
+
+        reference = _reference(handler, _on_collected)
+        identity = reference if isinstance(reference, weakref.ref) else handler
+        with self._lock:
+            self._subscribers.setdefault(topic, {})[identity] = reference
+
+    def unsubscribe(self, event_type: type[Event], handler: Handler, key: Any = None):
+        with self._lock:
+            subscribers = self._subscribers.get((event_type, key), {})
+            for identity, reference in list(subscribers.items()):
+                if reference() == handler:
+                    del subscribers[identity]
+
+    def subscriber_count(self, event_type: type[Event], key: Any = None) -> int:
+        with self._lock:
+            references = list(self._subscribers.get((event_type, key), {}).values())
+        return sum(reference() is not None for reference in references)
+
+    def publish(self, event: Event):
+        """Queues `event` for the next frame; safe to call from any thread."""
+        with self._lock:
+            if event.coalesce:
+                slot = (type(event), event.key)
+                # a replaced event keeps its place in the order
+                self._pending[slot] = event
+            else:
+                self._sequence += 1
+                self._pending[self._sequence] = event
+        self._trigger()
+
+    def _deliver(self, *_):
+        with self._lock:
+            events, self._pending = list(self._pending.values()), {}
+        for event in events:
+            topics = [(type(event), None)]
+            if event.key is not None:
+                topics.append((type(event), event.key))
+            for topic in topics:
+                with self._lock:
+                    references = list(self._subscribers.get(topic, {}).values())
+                for reference in references:
+                    if (handler := reference()) is None:
+                        continue
+                    try:
+                        handler(event)
+                    except Exception as e:
+                        Logger.exception(
+                            f"Events: {type(event).__name__} handler failed: {e}"
+                        )
+
+
+bus = EventBus()
+
+__all__ = [
+    "AuthChanged",
+    "DownloadProgress",
+    "Event",
+    "EventBus",
+    "ModelChanged",
+    "bus",
+]
@@ -0,0 +1,176 @@
+"""
+Memory accounting of the running app and a leak check across screen visits
+
+A snapshot counts the widgets each screen holds, the bytes of the textures
+alive, the MediaItems still referenced, the observers registered on each
+model and the open video decoders. The monitor takes one periodically so
+growth shows up over time. The leak check counts live objects by type every
+time a screen is entered and flags the types that grew on each of the last
+few visits of the same screen, since a screen that is left and entered again
+should end up holding about what it held before.
+
+Both walk every object the gc tracks on the main thread, at about 70ms per
+million objects, so a snapshot or a check drops a few frames. That is why
+the monitor only samples once a minute, and only while it is enabled in the
+debug settings.
+"""
+
+import gc
+import json
+import time
+from collections import Counter, deque
+from itertools import pairwise
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from kivy.clock import Clock
+from kivy.logger import Logger
+
+from .events import ModelChanged, bus
+from .video import live_decoders
+
+if TYPE_CHECKING:
+    from kivy.uix.screenmanager import ScreenManager
+
+    from inazuma import Inazuma
+
+# bytes per pixel of the texture color formats, with one byte per component
+_PIXEL_BYTES = {"rgba": 4, "bgra": 4, "rgb": 3, "bgr": 3, "luminance_alpha": 2}
+# how many snapshots the monitor keeps
+HISTORY_SIZE = 120
+# visits of a screen a type has to grow on in a row to be flagged
+LEAK_VISITS = 3
+# and how many objects it has to have gained over them
+LEAK_MIN_GROWTH = 20
+# how long after entering a screen the objects are counted, so what it loads is in
+LEAK_CHECK_DELAY = 2.0
+
+
+def take_snapshot(app: "Inazuma") -> dict:
+    """What the app holds in memory right now, see the module docstring.
+
+    Runs on the main thread, which the walk of the gc's objects stalls.
+    """
+    from kivy.core.window import Window
+    from kivy.graphics.texture import Texture, TextureRegion
+    from viu_media.libs.media_api.types import MediaItem
+
+    objects = gc.get_objects()
+    texture_bytes = 0
+    media_items = 0
+    for obj in objects:
+        # regions share the memory of the texture they are cut from
+        if isinstance(obj, Texture) and not isinstance(obj, TextureRegion):
+            width, height = obj.size
+            texture_bytes += width * height * _PIXEL_BYTES.get(obj.colorfmt, 1)
+        elif isinstance(obj, MediaItem):
+            media_items += 1
+    screens = app.manager_screens.screens
+    return {
+        "time": time.time(),
+        "widgets": {
+            screen.name: sum(1 for _ in screen.walk(restrict=True))
+            for screen in screens
+        },
+        # popups and modals live on the window, outside any screen
+        "window_widgets": len(Window.children) - 1,
+        "texture_bytes": texture_bytes,
+        "media_items": media_items,
+        "observers": {
+            screen.name: bus.subscriber_count(ModelChanged, screen.name)
+            for screen in screens
+        },
+        "video_decoders": live_decoders(),
+        "gc_objects": len(objects),
+    }
+
+
+class MemoryMonitor:
+    """Takes a snapshot every `interval` seconds while started."""
+
+    def __init__(self, app: "Inazuma", interval: float = 60):
+        self.app = app
+        self.interval = interval
+        self.history: deque[dict] = deque(maxlen=HISTORY_SIZE)
+        self._exported = 0.0
+        self._event = None
+
+    def start(self):
+        if not self._event:
+            self.sample()
+            self._event = Clock.schedule_interval(self.sample, self.interval)
+
+    def stop(self):
+        if self._event:
+            self._event.cancel()
+            self._event = None
+
+    def sample(self, *_) -> dict:
+        snapshot = take_snapshot(self.app)
+        self.history.append(snapshot)
+        return snapshot
+
+    def export(self, path: Path):
+        """Appends the snapshots taken since the last export to `path`."""
+        snapshots = [s for s in list(self.history) if s["time"] > self._exported]
+        if not snapshots:
+            return
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with path.open("a", encoding="utf-8") as f:
+                f.writelines(json.dumps(snapshot) + "\n" for snapshot in snapshots)
+            self._exported = snapshots[-1]["time"]
+        except OSError as e:
+            Logger.warning(f"Memory: Failed to export to {path}: {e}")
+
+
+class LeakDetector:
+    """Flags object types that grow across repeated visits of a screen."""
+
+    def __init__(self, manager: "ScreenManager"):
+        self.manager = manager
+        self.suspects: dict[str, dict[str, list[int]]] = {}
+        """screen name -> type name -> its counts on the last visits"""
+        self._visits: dict[str, deque[Counter]] = {}
+        self._event = None
+
+    def start(self):
+        self.manager.unbind(current=self._on_screen_changed)
+        self.manager.bind(current=self._on_screen_changed)
+
+    def stop(self):
+        self.manager.unbind(current=self._on_screen_changed)
+        if self._event:
+            self._event.cancel()
+            self._event = None
+
+    def _on_screen_changed(self, manager, name: str):
+        if self._event:
+            self._event.cancel()
+        self._event = Clock.schedule_once(lambda _: self.check(name), LEAK_CHECK_DELAY)
+
+    def check(self, name: str) -> dict[str, list[int]]:
+        """Counts the live objects for a visit of screen `name` and compares."""
+        self._event = None
+        gc.collect()
+        counts = Counter(type(obj).__qualname__ for obj in gc.get_objects())
+        visits = self._visits.setdefault(name, deque(maxlen=LEAK_VISITS + 1))
+        visits.append(counts)
+        if len(visits) <= LEAK_VISITS:
+            return {}
+        growing = {}
+        for type_name in counts:
+            history = [visit[type_name] for visit in visits]
+            grew = all(a < b for a, b in pairwise(history))
+            if grew and history[-1] - history[0] >= LEAK_MIN_GROWTH:
+                growing[type_name] = history
+        if growing:
+            Logger.warning(
+                f"Memory: {name} keeps growing "
+                + ", ".join(f"{t} {h[0]}->{h[-1]}" for t, h in growing.items())
+            )
+        self.suspects[name] = growing
+        return growing
+
+
+__all__ = ["LeakDetector", "MemoryMonitor", "take_snapshot"]
@@ -10,7 +10,9 @@
 class Observer:
     """Abstract superclass for all observers."""
 
-    def model_is_changed(self):
+    def model_is_changed(self, event=None):
         """
         The method that will be called on the observer when the model changes.
+
+        :param event: the `ModelChanged` event delivered by the event bus.
         """
@@ -0,0 +1,136 @@
+"""
+The settings panel entries of viu's config, generated once per config schema.
+
+Walking every pydantic section and field of viu's AppConfig only depends on
+the schema, so the result is kept in memory and in a json file keyed by the
+viu_media version and a hash of the modules the config models are defined
+in. Only the values are read from the live config: the defaults written to
+the ini and whether a field without a value is shown.
+"""
+
+import functools
+import hashlib
+import importlib.metadata
+import itertools
+import json
+import logging
+from enum import Enum
+from pathlib import Path
+from typing import TYPE_CHECKING, Literal, get_args, get_origin
+
+if TYPE_CHECKING:
+    from viu_media.core.config import AppConfig
+
+logger = logging.getLogger(__name__)
+
+# sections that only configure viu's terminal menus
+SKIPPED_SECTIONS = ("fzf", "rofi")
+
+_schema: dict | None = None
+
+
+@functools.cache
+def schema_key() -> str:
+    import viu_media.core.config
+
+    digest = hashlib.sha1()
+    for module in sorted(Path(viu_media.core.config.__file__).parent.glob("*.py")):
+        digest.update(module.read_bytes())
+    return f"{importlib.metadata.version('viu_media')}-{digest.hexdigest()[:16]}"
+
+
+def setting_type(field_type) -> tuple[str, list | None]:
+    """Map Pydantic field type to Kivy setting type and options."""
+    # Check for Enum
+    if (
+        field_type is not None
+        and isinstance(field_type, type)
+        and issubclass(field_type, Enum)
+    ):
+        return ("scrolloptions", [member.value for member in field_type])
+
+    # Check for Literal
+    if get_origin(field_type) is Literal:
+        if args := get_args(field_type):
+            return ("scrolloptions", list(args))
+
+    # Basic types
+    if field_type is bool:
+        return ("bool", None)
+    if field_type in (int, float):
+        return ("numeric", None)
+    if field_type is Path or (
+        hasattr(field_type, "__origin__") and field_type.__origin__ is Path
+    ):
+        return ("path", None)
+
+    # Default to string
+    return ("string", None)
+
+
+def build_schema(config: "AppConfig") -> list[dict]:
+    """Every section of `config` with the settings entry of each of its fields."""
+    sections = []
+    for section_name, section_model in config:
+        if section_name in SKIPPED_SECTIONS:
+            continue
+        model = type(section_model)
+        fields = []
+        for field_name, field_info in itertools.chain(
+            model.model_fields.items(), model.model_computed_fields.items()
+        ):
+            field_type = getattr(field_info, "annotation", None) or getattr(
+                field_info, "return_type", None
+            )
+            kind, options = setting_type(field_type)
+            entry = {
+                "type": kind,
+                "title": field_name.replace("_", " ").title(),
+                "desc": field_info.description or "",
+                "section": "Viu",
+                "key": f"{section_name}_{field_name}",
+            }
+            if options:
+                entry["options"] = options
+            fields.append(
+                {
+                    "name": field_name,
+                    "computed": field_name in model.model_computed_fields,
+                    "entry": entry,
+                }
+            )
+        sections.append(
+            {
+                "name": section_name,
+                "title": model.model_config.get(
+                    "title", section_name.replace("_", " ").title()
+                ),
+                "fields": fields,
+            }
+        )
+    return sections
+
+
+def load_schema(config: "AppConfig", cache_path: Path) -> list[dict]:
+    """The schema of `config`, from memory, from `cache_path` or built anew."""
+    global _schema
+    key = schema_key()
+    if _schema and _schema["key"] == key:
+        return _schema["sections"]
+    try:
+        cached = json.loads(cache_path.read_text(encoding="utf-8"))
+        if cached["key"] == key:
+            _schema = cached
+            return cached["sections"]
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+    _schema = {"key": key, "sections": build_schema(config)}
+    try:
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        cache_path.write_text(json.dumps(_schema), encoding="utf-8")
+    except (OSError, TypeError, ValueError) as e:
+        logger.warning(f"Failed to cache the settings schema: {e}")
+    return _schema["sections"]
+
+
+__all__ = ["build_schema", "load_schema", "schema_key", "setting_type"]
@@ -0,0 +1,27 @@
+"""
+Keeps count of the video decoders the app has open
+"""
+
+import weakref
+
+from kivy.logger import Logger
+from kivy.uix.video import Video
+
+_videos: "weakref.WeakSet[Video]" = weakref.WeakSet()
+
+
+def track_video(video: Video) -> Video:
+    """Counts `video` towards live_decoders for as long as it exists."""
+    if video not in _videos:
+        _videos.add(video)
+        video.fbind("loaded", _report_decoders)
+    return video
+
+
+def live_decoders() -> int:
+    """How many of the tracked videos hold an open decoder."""
+    return sum(1 for video in list(_videos) if video._video is not None)
+
+
+def _report_decoders(*_):
+    Logger.debug(f"Video: {live_decoders()} live decoders")
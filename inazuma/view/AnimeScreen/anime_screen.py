@@ -1,12 +1,21 @@
 import logging
-
-from kivy.properties import ListProperty, ObjectProperty, StringProperty
+import time
+from threading import Thread
+
+from kivy.clock import Clock
+from kivy.properties import (
+    BooleanProperty,
+    ListProperty,
+    ObjectProperty,
+    StringProperty,
+)
 from kivy.uix.widget import Factory
 from kivymd.uix.button import MDButton
 from kivymd.uix.menu import MDDropdownMenu
 
 
 from ...view.base_screen import BaseScreenView
+from .components import PreloadingVideoPlayer
 from typing import TYPE_CHECKING, Literal
 
 if TYPE_CHECKING:
@@ -15,12 +24,20 @@ if TYPE_CHECKING:
 
     from viu_media.libs.provider.anime.types import Server, Anime
     from inazuma.controller.anime_screen import AnimeScreenController
+    from inazuma.model.anime_screen import EpisodeStreams
 logger = logging.getLogger((__name__))
 
+# how often adaptive quality looks at the measured bandwidth while playing
+QUALITY_CHECK_INTERVAL = 10
+# the least time between two quality switches, so a noisy estimate does not
+# make the player reopen the stream over and over
+QUALITY_SWITCH_COOLDOWN = 30
+
 
 class EpisodeButton(MDButton):
     text = StringProperty()
     change_episode_callback = ObjectProperty()
+    is_local = BooleanProperty(False)
 
 
 Factory.register("EpisodeButton", cls=EpisodeButton)
@@ -33,6 +50,8 @@ class AnimeScreenView(BaseScreenView):
     current_media_item: "MediaItem | None" = None
     current_server = ObjectProperty()
     current_link = StringProperty()
+    # what the player opens, current_link or its url on the stream proxy
+    player_source = StringProperty()
     current_servers: "list[Server]" = ListProperty([])
     current_anime_data = ObjectProperty()
     caller_screen_name = ObjectProperty()
@@ -47,6 +66,18 @@ class AnimeScreenView(BaseScreenView):
     current_server_name = StringProperty("sharepoint")
     current_translation_type = StringProperty("sub")
     current_provider = StringProperty("allanime")
+    is_playing_local = BooleanProperty(False)
+    # the quality current_link was picked in, empty for downloaded files
+    current_quality = StringProperty()
+    # where to seek to once a stream reopened in another quality has loaded
+    _resume_position: float | None = None
+    _quality_switched_at = 0.0
+    # the episode whose stream sits in the player's preload, and its servers
+    # (None when it is a downloaded file)
+    _preloaded_episode = None
+    _preloaded_servers: "list[Server] | None" = None
+    _preloaded_link = None
+    _preload_requested_for = None
 
     _translation_menu: MDDropdownMenu | None = None
     _provider_menu: MDDropdownMenu | None = None
@@ -57,15 +88,35 @@ class AnimeScreenView(BaseScreenView):
         self.current_provider = self.app.viu.config.general.provider.value
         self.current_translation_type = self.app.viu.config.stream.translation_type
         self.current_server_name = self.app.viu.config.stream.server.value
+        self.app.viu.library.add_listener(self._on_library_changed)
+        Clock.schedule_interval(self._check_stream_quality, QUALITY_CHECK_INTERVAL)
+
+    def _on_library_changed(self, media_id: int, episode: str, path):
+        """Refresh the local markers when an episode of the shown anime changes on disk."""
+        if self.current_media_item and self.current_media_item.id == media_id:
+            Clock.schedule_once(lambda dt: self.update_episodes(self.episodes_list))
+
+    def on_video_player(self, instance, video_player: PreloadingVideoPlayer):
+        video_player.bind(
+            position=self._on_playback_position,
+            state=self._on_playback_state,
+            duration=self._on_playback_duration,
+        )
 
     def update_episodes(self, episodes_list):
         self.episodes_container.data = []
         self.episodes_list = episodes_list
+        local_episodes = (
+            self.app.viu.library.episodes(self.current_media_item.id)
+            if self.current_media_item
+            else set()
+        )
         for episode in episodes_list:
             self.episodes_container.data.append(
                 {
                     "viewclass": "EpisodeButton",
                     "text": str(episode),
+                    "is_local": str(episode) in local_episodes,
                     "change_episode_callback": lambda x=episode: self.update_current_episode(
                         x
                     ),
@@ -84,6 +135,38 @@ class AnimeScreenView(BaseScreenView):
             previous_episode = self.episodes_list[previous_index]
             self.update_current_episode(previous_episode)
 
+    def model_is_changed(self, event=None):
+        if event.change == "provider_anime":
+            # dropped if another anime was opened since
+            if event.data is self.model.current_state.provider_anime:
+                self.current_anime_data = event.data
+        elif event.change == "episode_streams":
+            self._on_episode_streams(event.data)
+        elif event.change == "preloaded_streams":
+            streams = event.data
+            if streams.state is not self.model.current_state:
+                return
+            if link := self.select_stream_link(streams.servers[0]):
+                self.on_episode_streams_preloaded(
+                    streams.episode, streams.servers, link
+                )
+
+    def _on_episode_streams(self, streams: "EpisodeStreams"):
+        if streams.state is not self.model.current_state:
+            return
+        if streams.servers:
+            logger.debug(
+                f"current servers {[server.name for server in streams.servers]}"
+            )
+            self.current_servers = streams.servers
+        else:
+            logger.warning(
+                f"No servers found for {streams.state.provider_anime.title}"
+            )
+        if self.current_episode == streams.episode:
+            self.update_current_video_stream(self.current_server_name)
+            self.video_player.state = "play"
+
     def on_current_anime_data(self, instance, anime: "Anime"):
         self.anime_title_label.text = (
             self.current_media_item.title.english
@@ -92,19 +175,211 @@ class AnimeScreenView(BaseScreenView):
         )
         episodes = anime.episodes.sub if True else anime.episodes.dub
         self.update_episodes(episodes)
+        if self.is_playing_local and self.current_episode in self.episodes_list:
+            # a downloaded episode is already playing, the provider only filled in the list
+            self.current_episode_index = self.episodes_list.index(self.current_episode)
+            return
+        self.reset_preload()
         if self.episodes_list:
             self.current_episode_index = 0
             self.current_episode = self.episodes_list[0]
-        self.update_current_video_stream(self.current_server_name)
+        if not self.play_local_episode(self.current_episode):
+            self.update_current_video_stream(self.current_server_name)
         self.video_player.state = "play"
 
+    def show_local_episodes(self, episodes: list[str]):
+        """Lists the downloaded episodes and plays the first one without the provider."""
+        self.anime_title_label.text = (
+            self.current_media_item.title.english if self.current_media_item else ""
+        )
+        self.update_episodes(episodes)
+        self.reset_preload()
+        self.current_episode_index = 0
+        self.current_episode = episodes[0]
+        self.play_local_episode(self.current_episode)
+
     def update_current_episode(self, episode):
         self.current_episode = episode
+        self._resume_position = None
         if episode in self.episodes_list:
             self.current_episode_index = self.episodes_list.index(episode)
+        if self._play_preloaded_episode(episode):
+            return
+        if self.play_local_episode(episode):
+            return
         self.controller.fetch_streams(episode)
-        self.update_current_video_stream(self.current_server_name)
+
+    def play_local_episode(self, episode) -> bool:
+        """Plays a downloaded episode straight from disk, returns False if there is none."""
+        if not self.current_media_item:
+            return False
+        local_path = self.model.get_local_episode(self.current_media_item.id, episode)
+        if not local_path:
+            return False
+        self.current_server = None
+        self.current_quality = ""
+        self._resume_position = None
+        self.current_link = str(local_path)
+        self.is_playing_local = True
+        self.video_player.state = "play"
+        logger.debug(f"playing {self.current_link} from the library")
+        return True
+
+    # ---------------gapless preloading of the next episode-------------------------
+    def _on_playback_position(self, video_player: PreloadingVideoPlayer, position):
+        config = self.app.config
+        if not config.getboolean("Player", "preload_next_episode"):
+            return
+        if self._preload_requested_for == self.current_episode:
+            return
+        remaining = video_player.duration - position
+        if video_player.duration <= 0 or remaining > config.getint(
+            "Player", "preload_lookahead"
+        ):
+            return
+        next_index = self.current_episode_index + 1
+        if next_index < len(self.episodes_list):
+            self._preload_requested_for = self.current_episode
+            self.preload_episode(self.episodes_list[next_index])
+
+    def _on_playback_state(self, video_player: PreloadingVideoPlayer, state):
+        # the player stops by itself at the end of an episode, roll straight on
+        # into the preloaded one
+        if (
+            state == "stop"
+            and self._preloaded_episode is not None
+            and video_player.duration > 0
+            and video_player.duration - video_player.position < 2
+        ):
+            self.next_episode()
+
+    def preload_episode(self, episode):
+        if self.current_media_item and (
+            local_path := self.model.get_local_episode(
+                self.current_media_item.id, episode
+            )
+        ):
+            self.on_episode_streams_preloaded(episode, None, str(local_path))
+            return
+        self.controller.preload_episode_streams(episode)
+
+    def on_episode_streams_preloaded(
+        self, episode, servers: "list[Server] | None", link: str
+    ):
+        """Opens a resolved upcoming episode in the hidden player."""
+        if self._preload_requested_for != self.current_episode:
+            # the user moved on while the streams were being fetched
+            return
+        self._preloaded_episode = episode
+        self._preloaded_servers = servers
+        self._preloaded_link = link
+        self.video_player.preload(
+            self.player_url(link, servers[0] if servers else None)
+        )
+        logger.debug(f"preloading episode {episode} from {link}")
+
+    def _play_preloaded_episode(self, episode) -> bool:
+        if self._preloaded_episode != episode or not self.video_player.preloaded_source:
+            self.reset_preload()
+            return False
+        servers, link = self._preloaded_servers, self._preloaded_link
+        self._preloaded_episode = self._preloaded_servers = self._preloaded_link = None
+        if servers is None:
+            self.current_server = None
+            self.current_quality = ""
+            self.is_playing_local = True
+        else:
+            # rebuilding the server buttons selects the first server, which is
+            # the one the preload was resolved from
+            self.current_servers = servers
+            self.current_server = servers[0]
+            self.current_server_name = servers[0].name
+            self.current_quality = next(
+                (sl.quality for sl in servers[0].links if sl.link == link), ""
+            )
+            self.is_playing_local = False
+        self.current_link = link
         self.video_player.state = "play"
+        return True
+
+    def reset_preload(self):
+        self._preloaded_episode = self._preloaded_servers = self._preloaded_link = None
+        self._preload_requested_for = None
+        if self.video_player:
+            self.video_player.discard_preload()
+
+    def on_current_link(self, instance, link: str):
+        self.player_source = self.player_url(link, self.current_server)
+
+    def player_url(self, link: str, server: "Server | None") -> str:
+        """Routes a remote link through the caching stream proxy when it is enabled."""
+        if not link.startswith(("http://", "https://")):
+            return link
+        if not self.app.config.getboolean("Player", "stream_proxy"):
+            return link
+        return self.app.viu.stream_proxy.url_for(link, server.headers if server else {})
+
+    def pick_quality(self, server: "Server") -> str | None:
+        """The quality to play a server in.
+
+        In adaptive mode this is the best of the server's qualities, up to the
+        configured one, that the measured bandwidth sustains.
+        """
+        from inazuma.core.bandwidth import choose_quality
+
+        viu = self.app.viu
+        if viu.quality_mode != "adaptive":
+            return viu.config.stream.quality
+        return choose_quality(
+            [server_link.quality for server_link in server.links],
+            viu.bandwidth.estimate(),
+            viu.config.stream.quality,
+        )
+
+    def select_stream_link(
+        self, server: "Server", quality: str | None = None
+    ) -> str | None:
+        """The link of a server in `quality`, or the one pick_quality chooses."""
+        quality = quality or self.pick_quality(server)
+        for server_link in server.links:
+            if server_link.quality == quality:
+                return server_link.link
+        return None
+
+    # ---------------adaptive quality-------------------------
+    def _check_stream_quality(self, dt):
+        if (
+            self.app.viu.quality_mode != "adaptive"
+            or self.is_playing_local
+            or not self.current_server
+            or not self.video_player
+            or self.video_player.state != "play"
+            or self._resume_position is not None
+            or time.monotonic() - self._quality_switched_at < QUALITY_SWITCH_COOLDOWN
+        ):
+            return
+        quality = self.pick_quality(self.current_server)
+        if not quality or quality == self.current_quality:
+            return
+        if link := self.select_stream_link(self.current_server, quality):
+            self.switch_stream_quality(quality, link)
+
+    def switch_stream_quality(self, quality: str, link: str):
+        """Reopens the current episode in another quality at the current position."""
+        logger.info(f"switching from {self.current_quality}p to {quality}p")
+        self._quality_switched_at = time.monotonic()
+        self._resume_position = self.video_player.position
+        self.current_quality = quality
+        self.current_link = link
+        self.video_player.state = "play"
+
+    def _on_playback_duration(self, video_player: PreloadingVideoPlayer, duration):
+        # a freshly opened video reports a placeholder duration of 1 until
+        # ffmpeg has read the real one, which seek needs
+        if self._resume_position is None or duration <= 1:
+            return
+        position, self._resume_position = self._resume_position, None
+        video_player.seek(min(position / duration, 1), precise=False)
 
     def update_current_video_stream(self, server_name: str):
         for server in self.current_servers:
@@ -113,10 +388,12 @@ class AnimeScreenView(BaseScreenView):
             if server.name == server_name:
                 self.current_server = server
                 self.current_server_name = server.name
-                for server_link in server.links:
-                    if server_link.quality == self.app.viu.config.stream.quality:
-                        self.current_link = server_link.link
-                        break
+                self._resume_position = None
+                quality = self.pick_quality(server)
+                if link := self.select_stream_link(server, quality):
+                    self.current_quality = quality or ""
+                    self.current_link = link
+                    self.is_playing_local = False
                 self.video_player.state = "play"
                 logger.debug(f"found {self.current_server_name} server")
                 logger.debug(f"found {self.current_link} link")
@@ -222,8 +499,13 @@ class AnimeScreenView(BaseScreenView):
 
         self.app.viu.config.general.provider = provider
         self.current_provider = provider.value
-        self.app.viu._anime_provider = None  # Reset the cached provider
-        self.model.get_anime_data_from_provider(self.current_media_item)
+        self.app.viu.invalidate("general.provider")
+        self.model.open(self.current_media_item)
+        Thread(
+            target=self.model.get_anime_data_from_provider,
+            args=(self.current_media_item,),
+            daemon=True,
+        ).start()
         if self._provider_menu:
             self._provider_menu.dismiss()
         logger.info(f"Provider set to: {provider.value}, viu services reset")
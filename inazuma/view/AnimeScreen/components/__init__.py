@@ -0,0 +1,3 @@
+from .video_player import PreloadingVideoPlayer
+
+__all__ = ["PreloadingVideoPlayer"]
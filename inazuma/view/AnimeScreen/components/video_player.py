@@ -0,0 +1,86 @@
+from kivy.clock import Clock
+from kivy.factory import Factory
+from kivy.properties import StringProperty
+from kivy.uix.video import Video
+from kivy.uix.videoplayer import VideoPlayer
+
+from inazuma.utility.video import track_video
+
+
+class PreloadingVideoPlayer(VideoPlayer):
+    """A VideoPlayer that can open its next source ahead of time.
+
+    The preloaded source is opened in a hidden, muted Video that is paused
+    before it starts playing; ffmpeg still opens the stream, probes the codecs
+    and reads ahead. Setting `source` to the preloaded source swaps that Video
+    in instead of starting a cold open.
+    """
+
+    preloaded_source = StringProperty("")
+    _preloaded: Video | None = None
+
+    def preload(self, source: str):
+        if not source or source in (self.source, self.preloaded_source):
+            return
+        self.discard_preload()
+        video = track_video(
+            Video(
+                source=source,
+                state="play",
+                volume=0,
+                pos_hint={"x": 0, "y": 0},
+                **self.options,
+            )
+        )
+        # the video opens on the next frame, pausing it in that limbo state lets
+        # ffmpeg set the stream up without ever playing it
+        Clock.schedule_once(lambda dt: self._pause_preload(video))
+        self._preloaded = video
+        self.preloaded_source = source
+
+    def _pause_preload(self, video: Video):
+        if video is self._preloaded:
+            video.state = "pause"
+
+    def discard_preload(self):
+        if self._preloaded is not None:
+            self._preloaded.unload()
+            self._preloaded = None
+        self.preloaded_source = ""
+
+    def _do_video_load(self, *largs):
+        super()._do_video_load(*largs)
+        track_video(self._video)
+
+    def on_source(self, instance, value):
+        if self._preloaded is not None and value and value == self.preloaded_source:
+            self._swap_in_preload()
+            return
+        super().on_source(instance, value)
+
+    def _swap_in_preload(self):
+        # an intermediate source may have scheduled a cold load, drop it
+        if self._video_load_ev is not None:
+            self._video_load_ev.cancel()
+        if self._video is not None:
+            self._video.unload()
+        video, self._preloaded = self._preloaded, None
+        self.preloaded_source = ""
+        video.volume = self.volume
+        # mirrors VideoPlayer._do_video_load for the already open video
+        video.bind(
+            texture=self._play_started,
+            duration=self.setter("duration"),
+            position=self.setter("position"),
+            volume=self.setter("volume"),
+            state=self._set_state,
+        )
+        self._video = video
+        video.state = self.state
+        Clock.schedule_once(self._try_load_default_thumbnail, -1)
+        Clock.schedule_once(self._try_load_default_annotations, -1)
+
+
+Factory.register("PreloadingVideoPlayer", cls=PreloadingVideoPlayer)
+
+__all__ = ["PreloadingVideoPlayer"]
@@ -12,6 +12,7 @@ from typing import TYPE_CHECKING
 if TYPE_CHECKING:
     from viu_media.libs.provider.anime.types import Server
     from viu_media.libs.media_api.types import MediaItem
+    from inazuma.core.postprocess import StepResult
 
 
 class TaskCard(MDBoxLayout):
@@ -21,8 +22,9 @@ class TaskCard(MDBoxLayout):
     episode: str = StringProperty()
     server: "Server" = ObjectProperty()
     progress = NumericProperty(0)
-    status = StringProperty("downloading")  # downloading, completed, error
+    status = StringProperty("downloading")  # queued, downloading, processing, completed, error
     progress_text = StringProperty("")
+    steps_text = StringProperty("")
 
     def __init__(
         self, media_item: "MediaItem", episode: str, server: "Server", *args, **kwargs
@@ -32,6 +34,7 @@ class TaskCard(MDBoxLayout):
         self.server = server
         super().__init__(*args, **kwargs)
         self.status = "downloading"
+        self._step_states = {}
 
     def update_progress(self, percentage: int, text: str):
         """Update the progress of this task (thread-safe)"""
@@ -42,6 +45,56 @@ class TaskCard(MDBoxLayout):
 
         Clock.schedule_once(_update)
 
+    def mark_queued(self, text: str):
+        """Mark this task as waiting for disk space (thread-safe)"""
+
+        def _queued(dt):
+            self.status = "queued"
+            self.progress_text = text
+
+        Clock.schedule_once(_queued)
+
+    def mark_downloading(self):
+        """Mark a queued task as downloading again (thread-safe)"""
+
+        def _downloading(dt):
+            self.status = "downloading"
+            self.progress_text = ""
+
+        Clock.schedule_once(_downloading)
+
+    def mark_processing(self, steps: list[str]):
+        """Mark this task as post processing (thread-safe)"""
+
+        def _processing(dt):
+            self.status = "processing"
+            self.progress_text = "Post processing"
+            self._step_states = {name: "waiting" for name in steps}
+            self._update_steps_text()
+
+        Clock.schedule_once(_processing)
+
+    def update_step(self, result: "StepResult"):
+        """Record the status and timing of a post processing step (thread-safe)"""
+
+        def _update(dt):
+            match result.status:
+                case "done":
+                    state = f"done in {result.seconds:.1f}s"
+                case "skipped":
+                    state = f"skipped ({result.message})"
+                case _:
+                    state = f"failed ({result.message})"
+            self._step_states[result.name] = state
+            self._update_steps_text()
+
+        Clock.schedule_once(_update)
+
+    def _update_steps_text(self):
+        self.steps_text = " • ".join(
+            f"{name}: {state}" for name, state in self._step_states.items()
+        )
+
     def mark_complete(self, result=None):
         """Mark this task as completed (thread-safe)"""
 
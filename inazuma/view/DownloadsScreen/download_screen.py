@@ -14,6 +14,20 @@ class DownloadsScreenView(BaseScreenView):
     main_container = ObjectProperty()
     progress_bar = ObjectProperty()
     download_progress_label = ObjectProperty()
+    free_space_label = ObjectProperty()
+    _free_space_event = None
+
+    def on_enter(self, *args):
+        self.controller.refresh_free_space()
+        # other apps may fill the disk too, so keep it current while visible
+        self._free_space_event = Clock.schedule_interval(
+            lambda _: self.controller.refresh_free_space(), 5
+        )
+
+    def on_leave(self, *args):
+        if self._free_space_event:
+            self._free_space_event.cancel()
+            self._free_space_event = None
 
     def add_task_card(self, media_item: "MediaItem", episode: str, server: "Server"):
         task_card = TaskCard(media_item, episode, server)
@@ -29,6 +43,14 @@ class DownloadsScreenView(BaseScreenView):
 
         Clock.schedule_once(_update)
 
+    def update_free_space(self, text: str):
+        """Update the free disk space shown in the status bar (thread-safe)"""
+
+        def _update(dt):
+            self.free_space_label.text = text
+
+        Clock.schedule_once(_update)
+
     def update_layout(self, widget):
         self.user_anime_list_container.add_widget(widget)
 
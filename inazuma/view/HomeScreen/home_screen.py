@@ -14,13 +14,28 @@ if TYPE_CHECKING:
 class HomeScreenView(BaseScreenView):
     main_container = ObjectProperty()
 
+    def __init__(self, **kw):
+        super().__init__(**kw)
+        self._anime_lists: dict[str, MediaCardsContainer] = {}
+
     def add_new_anime_list(self, list_name: str, anime_list: "MediaSearchResult"):
         cards_container = MediaCardsContainer()
         cards_container.list_name = list_name.upper()
         for anime in anime_list.media:
             card = MediaCard(anime, self)
             cards_container.container.add_widget(card)
-        self.main_container.add_widget(cards_container)
+        # a list that is fetched again replaces the old one in its place
+        index = 0
+        if old := self._anime_lists.pop(list_name, None):
+            index = self.main_container.children.index(old)
+            self.main_container.remove_widget(old)
+            old.release()
+        self._anime_lists[list_name] = cards_container
+        self.main_container.add_widget(cards_container, index=index)
+
+    def model_is_changed(self, event=None):
+        if event.change == "anime_list":
+            self.add_new_anime_list(*event.data)
 
     def on_pre_enter(self, *args):
         self.controller.get_all_anime_lists()
@@ -1,4 +1,5 @@
 from kivy.clock import Clock
+from kivy.logger import Logger
 from kivy.properties import ObjectProperty, StringProperty
 
 from ...view.base_screen import BaseScreenView
@@ -26,13 +27,42 @@ class SearchScreenView(BaseScreenView):
     current_page = 0
     total_pages = 0
 
-    def add_or_update_search_results(self, media_list: "MediaSearchResult"):
+    def model_is_changed(self, event=None):
+        if event.change == "trending":
+            self.add_or_update_trending(event.data)
+        elif event.change == "search_results":
+            media_list, local_matches, generation = event.data
+            if generation is not None and generation != self.controller.generation:
+                Logger.debug("Search Screen:Dropping stale search results")
+                return
+            self.add_or_update_search_results(media_list, local_matches)
+
+    def add_or_update_search_results(
+        self,
+        media_list: "MediaSearchResult",
+        local_matches: "list[MediaItem] | None" = None,
+    ):
         self.update_pagination(media_list.page_info)
+        # the local matches shown while searching stay, after the remote results
+        remote_ids = {anime.id for anime in media_list.media}
+        media = media_list.media + [
+            anime for anime in local_matches or [] if anime.id not in remote_ids
+        ]
         self.search_results_container.data = []
-        for anime in media_list.media:
+        for anime in media:
             anime_card = self._build_anime_card_data(anime)
             self.search_results_container.data.append(anime_card)
 
+    def show_local_matches(self, media_items: "list[MediaItem]"):
+        """Shows the matches of the local index until the remote results arrive."""
+        # the pages are those of the remote results, there are none to turn yet
+        self.search_results_pagination.current_page = self.current_page = 1
+        self.search_results_pagination.total_pages = self.total_pages = 1
+        self.has_next_page = False
+        self.search_results_container.data = [
+            self._build_anime_card_data(anime) for anime in media_items
+        ]
+
     def add_or_update_trending(self, media_list: "MediaSearchResult"):
         self.trending_anime_sidebar.data = []
         for anime in media_list.media:
@@ -13,6 +13,8 @@ from kivymd.uix.behaviors import (
     StencilBehavior,
 )
 
+from inazuma.utility.events import AuthChanged, bus
+
 if TYPE_CHECKING:
     from inazuma import Inazuma
 
@@ -37,6 +39,7 @@ class AuthPopup(
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
         self.app = MDApp.get_running_app()  # type: ignore[assignment]
+        bus.subscribe(AuthChanged, self._on_auth_changed)
 
     def on_open(self):
         """Check auth status when popup opens."""
@@ -115,10 +118,10 @@ class AuthPopup(
                 auth_service = self.app.viu.auth
                 auth_service.save_user_profile(profile, token)
 
-                # Reset viu services to pick up new auth
-                self.app.viu.reset()
+                # Rebuild the viu services that use the login
+                self.app.viu.invalidate("auth_profile")
 
-                Clock.schedule_once(lambda dt: self._on_login_success(profile.name))
+                bus.publish(AuthChanged(profile.name))
             else:
                 Clock.schedule_once(
                     lambda dt: self._show_error("Invalid or expired token.")
@@ -127,6 +130,12 @@ class AuthPopup(
             error_msg = f"Login failed: {str(e)}"
             Clock.schedule_once(lambda dt: self._show_error(error_msg))
 
+    def _on_auth_changed(self, event: AuthChanged):
+        if event.username:
+            self._on_login_success(event.username)
+        else:
+            self._on_logout_success()
+
     def _on_login_success(self, username: str):
         """Handle successful login."""
         self.is_logged_in = True
@@ -148,10 +157,10 @@ class AuthPopup(
             auth_service = self.app.viu.auth
             auth_service.clear_user_profile()
 
-            # Reset viu services
-            self.app.viu.reset()
+            # Rebuild the viu services that use the login
+            self.app.viu.invalidate("auth_profile")
 
-            Clock.schedule_once(lambda dt: self._on_logout_success())
+            bus.publish(AuthChanged(None))
         except Exception as e:
             error_msg = f"Logout failed: {str(e)}"
             Clock.schedule_once(lambda dt: self._show_error(error_msg))
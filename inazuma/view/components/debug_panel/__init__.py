@@ -0,0 +1,3 @@
+from .debug_panel import DebugPanel
+
+__all__ = ["DebugPanel"]
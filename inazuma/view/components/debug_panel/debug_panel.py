@@ -0,0 +1,127 @@
+from typing import TYPE_CHECKING
+
+from kivy.clock import Clock
+from kivy.properties import StringProperty
+from kivy.uix.modalview import ModalView
+from kivymd.app import MDApp
+from kivymd.theming import ThemableBehavior
+from kivymd.uix.behaviors import (
+    BackgroundColorBehavior,
+    CommonElevationBehavior,
+    StencilBehavior,
+)
+
+if TYPE_CHECKING:
+    from inazuma import Inazuma
+
+# how often the open panel refreshes its figures, in seconds
+REFRESH_INTERVAL = 1.0
+
+
+def _format_bytes(size: float) -> str:
+    for unit in ("B", "KB", "MB"):
+        if size < 1024:
+            return f"{size:.0f}{unit}"
+        size /= 1024
+    return f"{size:.1f}GB"
+
+
+class DebugPanel(
+    ThemableBehavior,
+    StencilBehavior,
+    CommonElevationBehavior,
+    BackgroundColorBehavior,
+    ModalView,
+):
+    """What the service calls of the last few minutes cost, and what the app holds."""
+
+    report = StringProperty("")
+    app: "Inazuma"
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.app = MDApp.get_running_app()  # type: ignore[assignment]
+        self._refresh_event = None
+
+    def on_open(self):
+        # counting the objects takes a moment, so memory is sampled once per opening
+        self.app.memory_monitor.sample()
+        self.refresh()
+        self._refresh_event = Clock.schedule_interval(self.refresh, REFRESH_INTERVAL)
+
+    def on_dismiss(self):
+        if self._refresh_event:
+            self._refresh_event.cancel()
+            self._refresh_event = None
+
+    def refresh(self, *_):
+        reports = (
+            self._telemetry_report(),
+            self._network_report(),
+            self._memory_report(),
+        )
+        self.report = "\n\n".join(report for report in reports if report)
+
+    def _telemetry_report(self) -> str:
+        snapshot = self.app.viu.telemetry.snapshot()
+        if not snapshot:
+            return "No service calls in the last few minutes"
+        width = max(len(operation) for operation in snapshot)
+        header = (
+            f"{'operation':<{width}} {'calls':>6} {'errors':>6} {'cached':>6} "
+            f"{'retries':>7} {'bytes':>8} {'p50':>8} {'p95':>8} {'p99':>8}"
+        )
+        lines = [header]
+        for operation, stats in snapshot.items():
+            lines.append(
+                f"{operation:<{width}} {stats['calls']:>6} {stats['errors']:>6} "
+                f"{stats['cache_hits']:>6} {stats['retries']:>7} "
+                f"{_format_bytes(stats['bytes']):>8} {stats['p50_ms']:>6.0f}ms "
+                f"{stats['p95_ms']:>6.0f}ms {stats['p99_ms']:>6.0f}ms"
+            )
+        return "\n".join(lines)
+
+    def _network_report(self) -> str:
+        snapshot = self.app.viu.http_pool.snapshot()
+        if not snapshot["requests"]:
+            return ""
+        summary = (
+            f"{snapshot['requests']} requests over {snapshot['connections']} "
+            f"connections, {snapshot['reuse_ratio']:.0%} reused, "
+            f"{snapshot['tls_handshakes']} tls handshakes, "
+            f"{snapshot['dns_lookups']} dns lookups"
+            + (", http/2" if snapshot["http2"] else "")
+        )
+        lines = [summary]
+        for host, stats in sorted(snapshot["hosts"].items()):
+            lines.append(
+                f"{host:<40} {stats['requests']:>6} requests "
+                f"{stats['connections']:>4} connections "
+                f"{stats['tls_handshakes']:>4} handshakes"
+            )
+        return "\n".join(lines)
+
+    def _memory_report(self) -> str:
+        history = list(self.app.memory_monitor.history)
+        if not history:
+            return ""
+        first, latest = history[0], history[-1]
+        summary = (
+            f"textures {_format_bytes(latest['texture_bytes'])}, "
+            f"{latest['media_items']} anime, {latest['video_decoders']} decoders, "
+            f"{latest['window_widgets']} popups, {latest['gc_objects']} objects "
+            f"({latest['gc_objects'] - first['gc_objects']:+} over "
+            f"{len(history)} samples)"
+        )
+        lines = [summary]
+        for name, widgets in latest["widgets"].items():
+            lines.append(
+                f"{name:<20} {widgets:>6} widgets {latest['observers'][name]:>3} observers"
+            )
+        for name, growing in self.app.leak_detector.suspects.items():
+            for type_name, counts in growing.items():
+                lines.append(f"growing on {name}: {type_name} {counts}")
+        return "\n".join(lines)
+
+
+__all__ = ["DebugPanel"]
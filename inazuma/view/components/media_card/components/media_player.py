@@ -1,7 +1,22 @@
+from kivy.clock import Clock
+from kivy.properties import NumericProperty
 from kivy.uix.videoplayer import VideoPlayer
 
+from inazuma.utility.video import track_video
+
 
 class MediaPopupVideoPlayer(VideoPlayer):
+    """The trailer player of the app wide MediaPopup.
+
+    Its Video is kept from one popup to the next, a new trailer only changes
+    the source and hovering back over the card that was playing resumes it.
+    Once the player has been paused or stopped for `idle_timeout` seconds the
+    video and its decoder are released; pressing play opens it again.
+    """
+
+    idle_timeout = NumericProperty(30)
+    _idle_ev = None
+
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
         # FIXME: find way to make fullscreen stable
@@ -11,3 +26,49 @@ class MediaPopupVideoPlayer(VideoPlayer):
     def on_fullscreen(self, instance, value):
         super().on_fullscreen(instance, value)
         # self.state = "pause"
+
+    def on_source(self, instance, value):
+        if self._video is None:
+            if value:
+                self._trigger_video_load()
+            return
+        # the video reloads its decoder for the new source, drop the old
+        # trailer's last frame meanwhile
+        self._video.texture = None
+        self._video.source = value
+
+    def _do_video_load(self, *largs):
+        super()._do_video_load(*largs)
+        track_video(self._video)
+
+    def on_state(self, instance, value):
+        if value == "play":
+            self._cancel_idle_release()
+            if self._video is None and self.source:
+                self._trigger_video_load()
+                return
+        else:
+            self._schedule_idle_release()
+        super().on_state(instance, value)
+
+    def release(self):
+        """Unloads the video and frees its decoder and textures."""
+        self._cancel_idle_release()
+        if self._video_load_ev is not None:
+            self._video_load_ev.cancel()
+        if self._video is not None:
+            self._video.unload()
+            self._video = None
+        if self.container:
+            self.container.clear_widgets()
+
+    def _schedule_idle_release(self):
+        self._cancel_idle_release()
+        self._idle_ev = Clock.schedule_once(
+            lambda dt: self.release(), max(0, self.idle_timeout)
+        )
+
+    def _cancel_idle_release(self):
+        if self._idle_ev is not None:
+            self._idle_ev.cancel()
+            self._idle_ev = None
@@ -81,9 +81,10 @@ class MediaPopup(
 
     def on_leave(self, *args):
         def _leave(dt):
-            self.player.state = "stop"
-            # if self.player._video:
-            # self.player._video.unload()
+            # paused rather than stopped, so coming back resumes the trailer;
+            # the player releases its decoder once it has been idle a while
+            if self.player.state == "play":
+                self.player.state = "pause"
 
             if not self.hovering:
                 self.dismiss()
@@ -92,12 +93,7 @@ class MediaPopup(
 
     def handle_clean_fullscreen_transition(self, instance, fullscreen):
         if not fullscreen:
-            if not self._is_open:
-                instance.state = "stop"
-                if vid := instance._video:
-                    vid.unload()
-            else:
-                instance.state = "stop"
-                if vid := instance._video:
-                    vid.unload()
+            instance.state = "stop"
+            instance.release()
+            if self._is_open:
                 self.dismiss()
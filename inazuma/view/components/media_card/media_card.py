@@ -1,4 +1,3 @@
-from threading import Thread
 from kivy.clock import Clock
 from kivy.factory import Factory
 from kivy.properties import (
@@ -48,6 +47,7 @@ class MediaCard(HoverBehavior, MDBoxLayout):
     _popup_opened = False
     _title = ()
     attempted_trailer_fetch = BooleanProperty(False)
+    _pending_trailer: str | None = None
 
     def __init__(self, media_item: "MediaItem | None" = None, screen=None, **kwargs):
         super().__init__(**kwargs)
@@ -157,41 +157,55 @@ class MediaCard(HoverBehavior, MDBoxLayout):
 
         # Clock.schedule_once(_open_popup, 5)
 
+    def on_leave(self):
+        # the hovered card changed, so its trailer is no longer needed right away
+        if self._pending_trailer and not self._popup_opened:
+            self.screen.model.viu.trailers.cancel(
+                self._pending_trailer, self._on_trailer_resolved
+            )
+            self._pending_trailer = None
+
     def _fetch_trailer(self):
+        from inazuma.core.trailers import youtube_id
+
         if not self._trailer_url or self.attempted_trailer_fetch:
             return None
         if self.trailer_url:
             return self.trailer_url
-        trailer_url = self._trailer_url
-
-        def _get():
-            import yt_dlp
-
-            ydl_opts = {
-                "format": self.screen.model.viu.config.downloads.ytdlp_format,
-                "logger": Logger,
-                "remote_components": ("ejs:github", "ejs:npm"),
-            }
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl: # type: ignore
-                info_dict = ydl.extract_info(trailer_url, download=False)
-                video_url = info_dict.get("url", None)
-                if video_url:
-                    Clock.schedule_once(lambda dt: self.set_trailer_url(video_url))
-                    Logger.info(f"Trailer URL fetched: {video_url}")
-                else:
-                    Logger.warning(f"Failed to fetch trailer URL for {trailer_url}")
-                self.attempted_trailer_fetch = True
-
-        Thread(target=_get, daemon=True).start()
+        if not (video_id := youtube_id(self._trailer_url)):
+            return None
+
+        # trailers resolved before, by any card or in an earlier session, play at once
+        trailers = self.screen.model.viu.trailers
+        if video_url := trailers.get(video_id):
+            self.set_trailer_url(video_url)
+            return video_url
+
+        if self._pending_trailer != video_id:
+            self._pending_trailer = video_id
+            trailers.resolve(video_id, self._on_trailer_resolved)
+
+    def _on_trailer_resolved(self, video_url: str | None):
+        def _resolved(dt):
+            if video_url:
+                self.set_trailer_url(video_url)
+                Logger.info(f"Trailer URL fetched: {video_url}")
+            else:
+                Logger.warning(f"Failed to fetch trailer URL for {self._trailer_url}")
+            self._pending_trailer = None
+            self.attempted_trailer_fetch = True
+
+        Clock.schedule_once(_resolved)
 
     def on_popup_open(self, popup: MediaPopup):
         popup.center = self.center
 
     def on_dismiss(self, popup: MediaPopup):
-        popup.player.state = "stop"
+        if popup.player.state == "play":
+            popup.player.state = "pause"
         self._popup_opened = False
-        #   if popup.player._video:
-        #       popup.player._video.unload()
+        # the popup is shared by every card, stop listening once it is not ours
+        popup.unbind(on_dismiss=self.on_dismiss, on_open=self.on_popup_open)
 
     def set_preview_image(self, image):
         self.preview_image = image
@@ -205,6 +219,7 @@ class MediaCard(HoverBehavior, MDBoxLayout):
             # self.popup.caller = self
             popup.update_caller(self)
             popup.title = self.title
+            popup.unbind(on_dismiss=self.on_dismiss, on_open=self.on_popup_open)
             popup.bind(on_dismiss=self.on_dismiss, on_open=self.on_popup_open)
             popup.open(self)
 
@@ -221,6 +236,15 @@ class MediaCard(HoverBehavior, MDBoxLayout):
     def on_trailer_url(self, *args):
         pass
 
+    def release(self):
+        """Lets go of the anime and the pending trailer of a card being thrown away."""
+        if self._pending_trailer:
+            self.screen.model.viu.trailers.cancel(
+                self._pending_trailer, self._on_trailer_resolved
+            )
+            self._pending_trailer = None
+        self.media_item = None
+
 
 Factory.register("MediaCard", MediaCard)
 
@@ -228,3 +252,9 @@ Factory.register("MediaCard", MediaCard)
 class MediaCardsContainer(MDBoxLayout):
     container = ObjectProperty()
     list_name = StringProperty()
+
+    def release(self):
+        for card in self.container.children:
+            if isinstance(card, MediaCard):
+                card.release()
+        self.container.clear_widgets()